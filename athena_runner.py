@@ -0,0 +1,148 @@
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import boto3
+from botocore.exceptions import ClientError
+
+logger = logging.getLogger(__name__)
+
+# Athena's default active DDL query quota per account and region; the workgroup can only lower it
+DEFAULT_MAX_CONCURRENCY = 20
+BATCH_GET_LIMIT = 50
+SUBMIT_WORKERS = 8
+POLL_INITIAL_DELAY_SECONDS = 0.25
+POLL_MAX_DELAY_SECONDS = 5.0
+QUERY_TIMEOUT_SECONDS = 900
+TERMINAL_STATES = ("SUCCEEDED", "FAILED", "CANCELLED")
+THROTTLING_CODES = ("TooManyRequestsException", "ThrottlingException")
+
+athena_clients = {}
+athena_clients_lock = threading.Lock()
+
+
+def get_athena_client(region=None):
+    # Clients are thread-safe and expensive to build; one per region for the whole process
+    with athena_clients_lock:
+        client = athena_clients.get(region)
+        if client is None:
+            client = athena_clients[region] = boto3.client("athena", region_name=region)
+        return client
+
+
+def query_result(query, execution):
+    status = execution["Status"]
+    statistics = execution.get("Statistics", {})
+    return {
+        "query": query,
+        "query_execution_id": execution["QueryExecutionId"],
+        "state": status["State"],
+        "error": status.get("StateChangeReason"),
+        "queue_ms": statistics.get("QueryQueueTimeInMillis", 0),
+        "engine_ms": statistics.get("EngineExecutionTimeInMillis", 0),
+        "total_ms": statistics.get("TotalExecutionTimeInMillis", 0),
+        "scanned_bytes": statistics.get("DataScannedInBytes", 0),
+    }
+
+
+def stop_queries(athena_client, in_flight):
+    for query_execution_id in list(in_flight):
+        try:
+            athena_client.stop_query_execution(QueryExecutionId=query_execution_id)
+        except ClientError as e:
+            logger.warning("Could not stop Athena query %s: %s", query_execution_id, e)
+
+
+def run_queries(queries, database, workgroup, output_location=None, athena_client=None, max_concurrency=DEFAULT_MAX_CONCURRENCY, timeout=QUERY_TIMEOUT_SECONDS, sleep=time.sleep):
+    # Runs `queries` with at most `max_concurrency` in flight and returns one result per query,
+    # in input order. Free slots are filled concurrently, all in-flight queries are polled
+    # together with batch_get_query_execution, and the poll interval backs off exponentially
+    # while nothing finishes. Queries still running after `timeout` seconds are stopped.
+    if athena_client is None:
+        athena_client = get_athena_client()
+    params = {"QueryExecutionContext": {"Database": database}, "WorkGroup": workgroup}
+    if output_location:
+        params["ResultConfiguration"] = {"OutputLocation": output_location}
+
+    def start(index):
+        # Returns (index, execution id, error); throttled statements get neither and are requeued
+        try:
+            response = athena_client.start_query_execution(QueryString=queries[index], **params)
+        except ClientError as e:
+            if e.response["Error"]["Code"] in THROTTLING_CODES:
+                return index, None, None
+            return index, None, e
+        return index, response["QueryExecutionId"], None
+
+    results = [None] * len(queries)
+    pending = list(range(len(queries) - 1, -1, -1))
+    in_flight = {}
+    deadline = time.monotonic() + timeout
+    delay = POLL_INITIAL_DELAY_SECONDS
+    with ThreadPoolExecutor(max_workers=SUBMIT_WORKERS) as executor:
+        try:
+            while pending or in_flight:
+                free = min(max_concurrency - len(in_flight), len(pending))
+                futures = [executor.submit(start, pending.pop()) for _ in range(free)]
+                unexpected = None
+                for future in futures:
+                    # Every started query is tracked before an unexpected error is raised, so it gets stopped
+                    try:
+                        index, query_execution_id, error = future.result()
+                    except Exception as e:
+                        unexpected = unexpected or e
+                        continue
+                    if error is not None:
+                        # Rejected outright (bad SQL, missing permissions); the other statements still run
+                        results[index] = query_result(queries[index], {
+                            "QueryExecutionId": None,
+                            "Status": {"State": "FAILED", "StateChangeReason": str(error)}
+                        })
+                    elif query_execution_id is None:
+                        # Throttled; goes back to the front of the queue for the next round
+                        pending.append(index)
+                    else:
+                        in_flight[query_execution_id] = index
+                if unexpected is not None:
+                    raise unexpected
+
+                finished = 0
+                ids = list(in_flight)
+                for offset in range(0, len(ids), BATCH_GET_LIMIT):
+                    response = athena_client.batch_get_query_execution(QueryExecutionIds=ids[offset:offset + BATCH_GET_LIMIT])
+                    for execution in response["QueryExecutions"]:
+                        if execution["Status"]["State"] in TERMINAL_STATES:
+                            index = in_flight.pop(execution["QueryExecutionId"])
+                            results[index] = query_result(queries[index], execution)
+                            finished += 1
+
+                if time.monotonic() > deadline:
+                    stop_queries(athena_client, in_flight)
+                    for query_execution_id, index in in_flight.items():
+                        results[index] = query_result(queries[index], {
+                            "QueryExecutionId": query_execution_id,
+                            "Status": {"State": "CANCELLED", "StateChangeReason": f"Timed out after {timeout}s"}
+                        })
+                    for index in pending:
+                        results[index] = query_result(queries[index], {
+                            "QueryExecutionId": None,
+                            "Status": {"State": "CANCELLED", "StateChangeReason": "Not started before the timeout"}
+                        })
+                    in_flight.clear()
+                    break
+
+                if not pending and not in_flight:
+                    break
+                # Completions free slots for waiting queries, so poll again promptly after progress
+                delay = POLL_INITIAL_DELAY_SECONDS if finished else min(delay * 2, POLL_MAX_DELAY_SECONDS)
+                sleep(delay)
+        except BaseException:
+            # Nothing will poll these any more; stop them rather than leave them running unseen
+            stop_queries(athena_client, in_flight)
+            raise
+
+    failed = [result for result in results if result["state"] != "SUCCEEDED"]
+    if failed:
+        logger.warning("%d of %d Athena queries did not succeed: %s", len(failed), len(results), [result["error"] for result in failed[:5]])
+    return results
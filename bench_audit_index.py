@@ -0,0 +1,83 @@
+import argparse
+import random
+import time
+from datetime import datetime, timedelta, timezone
+
+import boto3
+from moto import mock_aws
+
+from insert_update import AUDIT_TABLE_DEFINITION, JobAuditTable, AuditWriteBatcher, status_time, version_key
+
+STATUSES = ["WAITING", "DEPS_COMPLETE", "RUNNING", "COMPLETED", "FAILED"]
+
+
+def populate(audit_table, jobs, days, versions):
+    start = datetime.now(timezone.utc) - timedelta(days=days)
+    with AuditWriteBatcher(audit_table) as batcher:
+        for day in range(days):
+            snapshot_date = (start + timedelta(days=day)).strftime("%Y-%m-%d")
+            for job in range(jobs):
+                for version in range(1, versions + 1):
+                    batcher.put({
+                        "job_name": f"view_{job}",
+                        "snapshot_date": version_key(snapshot_date, version),
+                        "job_status": random.choice(STATUSES),
+                        "status_tm": status_time(start + timedelta(days=day, minutes=random.randint(0, 1440)))
+                    })
+                batcher.put({
+                    "job_name": f"view_{job}",
+                    "snapshot_date": f"{snapshot_date}#latest",
+                    "latest_version": versions,
+                    "snapshot_day": snapshot_date
+                })
+
+
+def timed(label, fn, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        rows = fn()
+    elapsed_ms = (time.perf_counter() - start) * 1000 / repeat
+    print(f"{label:<40} {elapsed_ms:10.2f} ms  {rows:8d} rows")
+
+
+def scan_count(audit_table, filter_expression, values):
+    dynamodb = audit_table.dynamodb
+    params = {"TableName": audit_table.table_name, "FilterExpression": filter_expression, "ExpressionAttributeValues": values}
+    rows = 0
+    while True:
+        response = dynamodb.scan(**params)
+        rows += len(response["Items"])
+        if "LastEvaluatedKey" not in response:
+            return rows
+        params["ExclusiveStartKey"] = response["LastEvaluatedKey"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare audit-table GSI queries with scans on a local DynamoDB stand-in")
+    parser.add_argument("--jobs", type=int, default=200)
+    parser.add_argument("--days", type=int, default=7)
+    parser.add_argument("--versions", type=int, default=2)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    with mock_aws():
+        dynamodb = boto3.client("dynamodb", region_name="us-east-1")
+        dynamodb.create_table(TableName="data_dstr_job_audit-bench", **AUDIT_TABLE_DEFINITION)
+        audit_table = JobAuditTable("data_dstr_job_audit-bench", dynamodb)
+        populate(audit_table, args.jobs, args.days, args.versions)
+
+        snapshot_date = (datetime.now(timezone.utc) - timedelta(days=1)).strftime("%Y-%m-%d")
+        week_ago = status_time(datetime.now(timezone.utc) - timedelta(days=7))
+        print(f"{args.jobs} jobs x {args.days} days x {args.versions} versions")
+        timed("FAILED this week (StatusDateIndex)", lambda: sum(1 for _ in audit_table.get_jobs_by_status("FAILED", since=week_ago)), args.repeat)
+        timed("FAILED this week (scan)", lambda: scan_count(audit_table, "job_status = :s AND status_tm >= :t", {":s": {"S": "FAILED"}, ":t": {"S": week_ago}}), args.repeat)
+        timed("WAITING older than 24h (StatusDateIndex)", lambda: sum(1 for _ in audit_table.get_stuck_jobs(24)), args.repeat)
+        timed("WAITING older than 24h (scan)", lambda: scan_count(audit_table, "job_status = :s AND status_tm <= :t", {":s": {"S": "WAITING"}, ":t": {"S": status_time(datetime.now(timezone.utc) - timedelta(hours=24))}}), args.repeat)
+        timed("latest versions (SnapshotLatestIndex)", lambda: len(audit_table.get_latest_versions(snapshot_date)), args.repeat)
+        timed("latest versions (scan)", lambda: scan_count(audit_table, "snapshot_day = :d", {":d": {"S": snapshot_date}}), args.repeat)
+        for operation, stats in sorted(audit_table.get_stats().items()):
+            print(f"{operation:<40} {stats['calls']:6d} calls {stats['total_ms']:10.2f} ms {stats['capacity_units']:10.1f} capacity units")
+
+
+if __name__ == "__main__":
+    main()
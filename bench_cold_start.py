@@ -0,0 +1,91 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+import boto3
+from moto import mock_aws
+
+from bench_orchestration import ENVIRONMENT, generate_jobs, percentile, provision, sqs_record
+from lambda_package import load_lambda_module
+
+BRANCHES = ("check_job_status", "emr_job", "invoke_step_function", "sqs_batch")
+COLD_SNAPSHOT_DATE = "2024-06-27"
+WARM_SNAPSHOT_DATE = "2024-06-28"
+
+
+def branch_event(branch, jobs, snapshot_date, step_id):
+    view = next(job["name"] for job in jobs if job["dependencies"])
+    upstream = next(job["name"] for job in jobs if not job["dependencies"])
+    if branch == "check_job_status":
+        return {"Payload": {"next_step": "check_job_status", "StepIds": [step_id], "job_name": view, "snapshot_date": snapshot_date, "job_version": "1"}}
+    if branch == "emr_job":
+        return {"Payload": {"next_step": "emr_job", "job_name": view, "snapshot_date": snapshot_date, "job_version": "1", "dependencies": {upstream: {"runId": "run-1"}}}}
+    if branch == "invoke_step_function":
+        return {"Payload": {"next_step": "invoke_step_function", "job_name": upstream, "snapshot_date": snapshot_date, "edp_run_id": "run-1", "refined_dataset_path": f"s3://refined/{upstream}/"}}
+    return {"Records": [sqs_record("m-1", upstream, snapshot_date)]}
+
+
+def run_child(branch):
+    # One fresh interpreter per sample. Setup goes through its own session so the Lambda's
+    # session starts with cold service-model caches, as it would in a new container.
+    for name, value in ENVIRONMENT.items():
+        os.environ.setdefault(name, value)
+    jobs = generate_jobs(4, 2, 2, COLD_SNAPSHOT_DATE, 7)
+    with mock_aws():
+        setup_session = boto3.session.Session()
+        provision(jobs, setup_session)
+        emr = setup_session.client("emr")
+        cluster_id = emr.list_clusters()["Clusters"][0]["Id"]
+        step_id = emr.add_job_flow_steps(JobFlowId=cluster_id, Steps=[{
+            "Name": "cold-start-probe",
+            "ActionOnFailure": "CONTINUE",
+            "HadoopJarStep": {"Jar": "command-runner.jar", "Args": ["true"]}
+        }])["StepIds"][0]
+
+        start = time.perf_counter()
+        lambda_module = load_lambda_module("bench_lambda")
+        import_ms = (time.perf_counter() - start) * 1000
+        lambda_module.api_metrics.emit = lambda line: None
+
+        start = time.perf_counter()
+        lambda_module.execute(branch_event(branch, jobs, COLD_SNAPSHOT_DATE, step_id), None)
+        first_ms = (time.perf_counter() - start) * 1000
+
+        start = time.perf_counter()
+        lambda_module.execute(branch_event(branch, jobs, WARM_SNAPSHOT_DATE, step_id), None)
+        warm_ms = (time.perf_counter() - start) * 1000
+
+        clients = sorted(lambda_module.boto_clients)
+        if lambda_module.job_audit_table._dynamodb is not None:
+            clients.append("dynamodb")
+    print(json.dumps({"import_ms": import_ms, "first_ms": first_ms, "warm_ms": warm_ms, "clients": clients}))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cold-start import and first-invocation latency of lambda_code per handler branch")
+    parser.add_argument("--runs", type=int, default=10, help="fresh interpreters per branch")
+    parser.add_argument("--branch", choices=BRANCHES, action="append", help="limit to these branches")
+    parser.add_argument("--child", choices=BRANCHES, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        run_child(args.child)
+        return
+
+    # boto3 and moto are already imported by the harness, so import_ms is lambda_code's own cost
+    print(f"{'branch':<24}{'import p50':>12}{'first p50':>12}{'first p99':>12}{'warm p50':>12}  clients")
+    for branch in args.branch or BRANCHES:
+        samples = []
+        for _ in range(args.runs):
+            output = subprocess.run([sys.executable, os.path.abspath(__file__), "--child", branch], capture_output=True, text=True, check=True)
+            samples.append(json.loads(output.stdout.strip().splitlines()[-1]))
+        import_ms = [sample["import_ms"] for sample in samples]
+        first_ms = [sample["first_ms"] for sample in samples]
+        warm_ms = [sample["warm_ms"] for sample in samples]
+        print(f"{branch:<24}{percentile(import_ms, 50):>12.1f}{percentile(first_ms, 50):>12.1f}{percentile(first_ms, 99):>12.1f}{percentile(warm_ms, 50):>12.1f}  {','.join(samples[-1]['clients'])}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,220 @@
+import argparse
+import json
+import os
+import random
+import threading
+import time
+from collections import Counter, defaultdict
+
+import boto3
+from moto import mock_aws
+
+from insert_update import AUDIT_TABLE_DEFINITION
+from lambda_package import load_lambda_module
+
+ACCOUNT_ID = "123456789012"
+CONFIG_BUCKET = "app-id-89055-dep-id-109792-uu-id-rlclefdkc5by"
+CONFIG_PREFIX = "dias/ais/views script/view-phyzn-ldr/job config/"
+VIEWS_CONFIG = "views_config.json"
+# Rough round-trip times (ms) of each service from a Lambda in the same region
+SERVICE_LATENCY_MS = {"dynamodb": 6, "s3": 20, "emr": 60, "sfn": 35}
+
+ENVIRONMENT = {
+    "AWS_DEFAULT_REGION": "us-east-1",
+    "AWS_ACCESS_KEY_ID": "testing",
+    "AWS_SECRET_ACCESS_KEY": "testing",
+    "ANS_ACCOUNT": ACCOUNT_ID,
+    "STEP_FUNCTION_NAME": "view-orchestration-bench",
+    "CLUSTER_NAME": "view-cluster-bench",
+    "VIEWS_CONFIG": VIEWS_CONFIG,
+    "AUDIT_TABLE_NAME": "data_dstr_job_audit-bench",
+    "ENVIRONMENT": "bench"
+}
+
+
+class ApiRecorder:
+    # botocore hooks on the default session: before-call counts the call, request-created sleeps
+    # for the service's injected latency so it lands inside the Lambda's own call timings
+    def __init__(self, latency_scale, jitter):
+        self.latency_scale = latency_scale
+        self.jitter = jitter
+        self.counts = Counter()
+        self.lock = threading.Lock()
+        self.enabled = True
+
+    def register(self, events):
+        events.register("before-call", self.before_call)
+        events.register("request-created", self.request_created)
+
+    def before_call(self, model, **kwargs):
+        if self.enabled:
+            with self.lock:
+                self.counts[f"{model.service_model.endpoint_prefix}.{model.name}"] += 1
+
+    def request_created(self, operation_name=None, **kwargs):
+        service = kwargs["event_name"].split(".")[1]
+        latency_ms = SERVICE_LATENCY_MS.get(service, 10) * self.latency_scale
+        if latency_ms:
+            time.sleep(latency_ms * random.uniform(1 - self.jitter, 1 + self.jitter) / 1000)
+
+
+class PhaseTimer:
+    def __init__(self):
+        self.samples = defaultdict(list)
+
+    def time(self, phase, fn, *args):
+        start = time.perf_counter()
+        try:
+            return fn(*args)
+        finally:
+            self.samples[phase].append((time.perf_counter() - start) * 1000)
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[index]
+
+
+def generate_jobs(width, depth, fan_in, snapshot_date, seed):
+    # Same shape as jobs.json: layer 0 holds the upstream datasets, every later layer holds
+    # views depending on up to fan_in jobs of the layer above
+    rng = random.Random(seed)
+    jobs = []
+    previous = []
+    for layer in range(depth + 1):
+        current = []
+        for index in range(width):
+            name = f"refined_{index}" if layer == 0 else f"view_{layer}_{index}"
+            dependencies = sorted(rng.sample(previous, min(fan_in, len(previous)))) if previous else []
+            jobs.append({"name": name, "completed": False, "snapshot_date": snapshot_date, "job_frequency": "Daily", "dependencies": dependencies})
+            current.append(name)
+        previous = current
+    return jobs
+
+
+def views_config(jobs):
+    return {job["name"]: {"active": True, "job_dependencies": job["dependencies"]} for job in jobs if job["dependencies"]}
+
+
+def provision(jobs, session=boto3):
+    dynamodb = session.client("dynamodb")
+    dynamodb.create_table(TableName=ENVIRONMENT["AUDIT_TABLE_NAME"], **AUDIT_TABLE_DEFINITION)
+
+    s3 = session.client("s3")
+    s3.create_bucket(Bucket=CONFIG_BUCKET)
+    s3.put_object(Bucket=CONFIG_BUCKET, Key=CONFIG_PREFIX + VIEWS_CONFIG, Body=json.dumps(views_config(jobs)))
+    for job in jobs:
+        if job["dependencies"]:
+            spark_conf = {"spark_conf": ["--executor-memory 4g", "--conf spark.sql.shuffle.partitions=200"]}
+            s3.put_object(Bucket=CONFIG_BUCKET, Key=f"{CONFIG_PREFIX}{job['name']}.json", Body=json.dumps(spark_conf))
+
+    emr = session.client("emr")
+    emr.run_job_flow(
+        Name=ENVIRONMENT["CLUSTER_NAME"],
+        ReleaseLabel="emr-6.15.0",
+        Instances={"MasterInstanceType": "m5.xlarge", "SlaveInstanceType": "m5.xlarge", "InstanceCount": 3, "KeepJobFlowAliveWhenNoSteps": True},
+        JobFlowRole="EMR_EC2_DefaultRole",
+        ServiceRole="EMR_DefaultRole"
+    )
+
+    sfn = session.client("stepfunctions")
+    sfn.create_state_machine(
+        name=ENVIRONMENT["STEP_FUNCTION_NAME"],
+        definition=json.dumps({"StartAt": "Done", "States": {"Done": {"Type": "Succeed"}}}),
+        roleArn=f"arn:aws:iam::{ACCOUNT_ID}:role/bench"
+    )
+
+
+def sqs_record(message_id, dataset_name, snapshot_date):
+    message = {
+        "task_configuration": {
+            "job_params": {"output_datasets": [dataset_name], "job_params": {"edp_run_id": f"run-{message_id}"}},
+            "parsed_datasets": [{"refined_dataset_path": f"s3://refined/{dataset_name}/{snapshot_date}/"}],
+            "job_info": {"SNAPSHOT_DATE": snapshot_date}
+        }
+    }
+    return {"messageId": message_id, "body": json.dumps({"Message": json.dumps(message)})}
+
+
+def run_benchmark(args):
+    for name, value in ENVIRONMENT.items():
+        os.environ.setdefault(name, value)
+    random.seed(args.seed)
+    jobs = generate_jobs(args.width, args.depth, args.fan_in, args.snapshot_date, args.seed)
+
+    with mock_aws():
+        provision(jobs)
+        # Every client and resource the Lambda creates from here on inherits the hook
+        recorder = ApiRecorder(args.latency_scale, args.jitter)
+        boto3.setup_default_session()
+        recorder.register(boto3.DEFAULT_SESSION.events)
+        lambda_module = load_lambda_module("bench_lambda")
+        emf_lines = []
+        lambda_module.api_metrics.emit = emf_lines.append
+
+        timer = PhaseTimer()
+        launch_dependent_jobs = lambda_module.launch_dependent_jobs
+
+        def timed_launch(*launch_args):
+            return timer.time("fan-out per upstream", launch_dependent_jobs, *launch_args)
+        lambda_module.launch_dependent_jobs = timed_launch
+
+        upstreams = [job["name"] for job in jobs if not job["dependencies"]]
+        launched_total = 0
+        wall_start = time.perf_counter()
+        for layer in range(1, args.depth + 1):
+            records = [sqs_record(f"{layer}-{i}", name, args.snapshot_date) for i, name in enumerate(upstreams)]
+            launched = []
+            for i in range(0, len(records), args.batch_size):
+                result = timer.time("execute (SQS batch)", lambda_module.execute, {"Records": records[i:i + args.batch_size]}, None)
+                if result["batchItemFailures"]:
+                    print(f"layer {layer}: {len(result['batchItemFailures'])} failed records")
+                for report in result["results"].values():
+                    for job_name in report.get("launched", []):
+                        launched.append((job_name, report["jobs"][job_name]["job_version"]))
+            if not launched:
+                break
+            launched_total += len(launched)
+
+            # The launched executions would each carry their dependencies into emr_job; read them back untimed
+            recorder.enabled = False
+            bulk_jobs = []
+            for job_name, job_version in launched:
+                record = lambda_module.job_audit_table.get_audit_record_by_version(job_name, args.snapshot_date, job_version)
+                bulk_jobs.append({"job_name": job_name, "snapshot_date": args.snapshot_date, "job_version": str(job_version), "dependencies": record["dependencies"]})
+            recorder.enabled = True
+
+            submitted = timer.time("emr_bulk_job", lambda_module.lambda_handler,
+                {"Payload": {"next_step": "emr_bulk_job", "snapshot_date": args.snapshot_date, "jobs": bulk_jobs}}, None)
+            timer.time("check_snapshot_status", lambda_module.lambda_handler,
+                {"Payload": {"next_step": "check_snapshot_status", "snapshot_date": args.snapshot_date, "jobs": submitted["jobs"]}}, None)
+            upstreams = [job_name for job_name, _ in launched]
+        wall_ms = (time.perf_counter() - wall_start) * 1000
+
+    print(f"DAG: width={args.width} depth={args.depth} fan_in={args.fan_in} batch_size={args.batch_size} latency_scale={args.latency_scale}")
+    print(f"{launched_total} jobs launched in {wall_ms:.0f} ms")
+    print(f"{'phase':<28}{'calls':>8}{'total ms':>12}{'p50 ms':>10}{'p99 ms':>10}")
+    for phase, samples in timer.samples.items():
+        print(f"{phase:<28}{len(samples):>8}{sum(samples):>12.1f}{percentile(samples, 50):>10.1f}{percentile(samples, 99):>10.1f}")
+    print(f"{len(emf_lines)} EMF metric lines emitted")
+    print("API calls:")
+    for operation, count in sorted(recorder.counts.items()):
+        print(f"  {operation:<40}{count:>8}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="End-to-end orchestration benchmark against moto with injected service latency")
+    parser.add_argument("--width", type=int, default=20, help="jobs per DAG layer")
+    parser.add_argument("--depth", type=int, default=3, help="view layers below the upstream datasets")
+    parser.add_argument("--fan-in", type=int, default=2, help="upstreams per view")
+    parser.add_argument("--batch-size", type=int, default=10, help="SQS records per execute invocation")
+    parser.add_argument("--latency-scale", type=float, default=1.0, help="multiplier on SERVICE_LATENCY_MS, 0 disables it")
+    parser.add_argument("--jitter", type=float, default=0.3)
+    parser.add_argument("--snapshot-date", default="2024-06-27")
+    parser.add_argument("--seed", type=int, default=7)
+    run_benchmark(parser.parse_args())
+
+
+if __name__ == "__main__":
+    main()
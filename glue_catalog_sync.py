@@ -0,0 +1,164 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from botocore.exceptions import ClientError
+
+from athena_runner import run_queries
+
+logger = logging.getLogger(__name__)
+
+# BatchCreatePartition and BatchUpdatePartition both take at most 100 partitions per call
+GLUE_BATCH_SIZE = 100
+SYNC_MAX_WORKERS = 4
+# Athena accepts several PARTITION clauses in one ALTER TABLE ADD; keeps the fallback to a few queries
+ATHENA_PARTITIONS_PER_STATEMENT = 100
+# Catalog denials (e.g. Lake Formation grants that only cover Athena) need the DDL path
+FALLBACK_ERROR_CODES = ("AccessDeniedException",)
+
+
+def partition_key(partition_keys, values):
+    # Partition values in the table's key order; accepts a {name: value} dict or a sequence
+    if isinstance(values, dict):
+        return tuple(str(values[name]) for name in partition_keys)
+    return tuple(str(value) for value in values)
+
+
+def get_existing_partitions(glue_client, database, table, expression=None):
+    existing = {}
+    params = {"DatabaseName": database, "TableName": table, "ExcludeColumnSchema": True}
+    if expression:
+        params["Expression"] = expression
+    paginator = glue_client.get_paginator("get_partitions")
+    for page in paginator.paginate(**params):
+        for partition in page["Partitions"]:
+            existing[tuple(partition["Values"])] = partition["StorageDescriptor"]["Location"].rstrip("/")
+    return existing
+
+
+def partition_input(storage_descriptor, values, location):
+    # Partitions inherit the table's formats and serde, so Athena and Spark read them alike
+    descriptor = {
+        name: storage_descriptor[name]
+        for name in ("Columns", "InputFormat", "OutputFormat", "SerdeInfo", "Compressed")
+        if name in storage_descriptor
+    }
+    descriptor["Location"] = location
+    return {"Values": list(values), "StorageDescriptor": descriptor}
+
+
+def diff_partitions(partitions, existing):
+    created, updated, unchanged = {}, {}, 0
+    for values, location in partitions.items():
+        current = existing.get(values)
+        if current is None:
+            created[values] = location
+        elif current != location:
+            updated[values] = location
+        else:
+            unchanged += 1
+    return created, updated, unchanged
+
+
+def batches(items, size=GLUE_BATCH_SIZE):
+    items = list(items)
+    return [items[start:start + size] for start in range(0, len(items), size)]
+
+
+def create_batch(glue_client, database, table, storage_descriptor, batch):
+    response = glue_client.batch_create_partition(
+        DatabaseName=database, TableName=table,
+        PartitionInputList=[partition_input(storage_descriptor, values, location) for values, location in batch]
+    )
+    # A concurrent run may have registered the same partition first; that is not a failure
+    return [
+        (tuple(error["PartitionValues"]), error["ErrorDetail"]["ErrorCode"])
+        for error in response.get("Errors", [])
+        if error["ErrorDetail"]["ErrorCode"] != "AlreadyExistsException"
+    ]
+
+
+def update_batch(glue_client, database, table, storage_descriptor, batch):
+    response = glue_client.batch_update_partition(
+        DatabaseName=database, TableName=table,
+        Entries=[
+            {"PartitionValueList": list(values), "PartitionInput": partition_input(storage_descriptor, values, location)}
+            for values, location in batch
+        ]
+    )
+    return [(tuple(error["PartitionValueList"]), error["ErrorDetail"]["ErrorCode"]) for error in response.get("Errors", [])]
+
+
+def sql_string(value):
+    escaped = str(value).replace("'", "''")
+    return f"'{escaped}'"
+
+
+def add_partition_statements(table, partition_keys, partitions, per_statement=ATHENA_PARTITIONS_PER_STATEMENT):
+    statements = []
+    for batch in batches(partitions.items(), per_statement):
+        clauses = []
+        for values, location in batch:
+            spec = ", ".join(f"{name} = {sql_string(value)}" for name, value in zip(partition_keys, values))
+            clauses.append(f"PARTITION ({spec}) LOCATION {sql_string(location)}")
+        statements.append(f"ALTER TABLE {table} ADD IF NOT EXISTS " + " ".join(clauses))
+    return statements
+
+
+def sync_partitions(glue_client, database, table, partitions, expression=None, athena_workgroup=None, athena_client=None, max_workers=SYNC_MAX_WORKERS):
+    # Registers `partitions` ((values, location) pairs, values as a dict or sequence) in the Glue
+    # catalog. Only partitions that are missing or whose location moved are sent, 100 per batch
+    # call. `expression` narrows the existing-partition read to the snapshot being loaded.
+    # Athena DDL is only used when Glue refuses the writes and an Athena workgroup is given.
+    descriptor = glue_client.get_table(DatabaseName=database, Name=table)["Table"]
+    partition_keys = [column["Name"] for column in descriptor["PartitionKeys"]]
+    storage_descriptor = descriptor["StorageDescriptor"]
+    wanted = {partition_key(partition_keys, values): location.rstrip("/") for values, location in partitions}
+
+    existing = get_existing_partitions(glue_client, database, table, expression)
+    created, updated, unchanged = diff_partitions(wanted, existing)
+    summary = {"created": len(created), "updated": len(updated), "unchanged": unchanged, "failed": [], "athena_queries": 0}
+    if not created and not updated:
+        return summary
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = [
+            (batch, executor.submit(create_batch, glue_client, database, table, storage_descriptor, batch))
+            for batch in batches(created.items())
+        ] + [
+            (batch, executor.submit(update_batch, glue_client, database, table, storage_descriptor, batch))
+            for batch in batches(updated.items())
+        ]
+        # Errors are collected per batch: a denied call fails only the partitions it carried
+        failed = []
+        for batch, future in futures:
+            try:
+                failed.extend(future.result())
+            except ClientError as e:
+                code = e.response["Error"]["Code"]
+                if code not in FALLBACK_ERROR_CODES or not athena_workgroup:
+                    raise
+                logger.warning("Glue refused %d partition writes for %s.%s (%s); falling back to Athena DDL", len(batch), database, table, e)
+                failed.extend((values, code) for values, _ in batch)
+
+    fallback = {values: wanted[values] for values, code in failed if code in FALLBACK_ERROR_CODES}
+    if fallback and athena_workgroup:
+        # ADD IF NOT EXISTS cannot move a partition, so only missing ones are recovered this way
+        missing = {values: location for values, location in fallback.items() if values in created}
+        statements = add_partition_statements(table, partition_keys, missing)
+        results = run_queries(statements, database, athena_workgroup, athena_client=athena_client)
+        summary["athena_queries"] = len(results)
+        # Statements carry the partitions in batches of ATHENA_PARTITIONS_PER_STATEMENT, in order
+        recovered = {
+            values
+            for batch, result in zip(batches(missing.items(), ATHENA_PARTITIONS_PER_STATEMENT), results)
+            if result["state"] == "SUCCEEDED"
+            for values, _ in batch
+        }
+        failed = [(values, code) for values, code in failed if values not in recovered]
+
+    summary["failed"] = failed
+    summary["created"] -= sum(1 for values, _ in failed if values in created)
+    summary["updated"] -= sum(1 for values, _ in failed if values in updated)
+    if failed:
+        logger.warning("Failed to register %d partitions of %s.%s: %s", len(failed), database, table, failed[:5])
+    return summary
@@ -1,20 +1,357 @@
+import json
+import queue
+import sys
+import threading
+import time
+from array import array
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+from functools import lru_cache
+
 import boto3
+from boto3.dynamodb.types import TypeDeserializer, TypeSerializer
+from botocore.config import Config
+from botocore.exceptions import ClientError
+
+STATUS_DATE_INDEX = "StatusDateIndex"
+SNAPSHOT_LATEST_INDEX = "SnapshotLatestIndex"
+SCAN_SEGMENTS = 4
+BATCH_GET_MAX_KEYS = 100
+BATCH_WRITE_MAX_ITEMS = 25
+BATCH_MAX_RETRIES = 5
+BATCH_BASE_DELAY = 0.05
+TRANSACT_MAX_ITEMS = 100
+TRANSACT_MAX_ATTEMPTS = 3
+UPDATE_MAX_WORKERS = 16
+# A version in one of these states has taken the upstream runs in its slots and been launched
+CONSUMED_STATUSES = ("DEPS_COMPLETE", "COMPLETED")
+# Only the "<date>#latest" version pointer items carry snapshot_day
+POINTER_FILTER = "attribute_not_exists(snapshot_day)"
+LEGACY_VERSION_SEPARATOR = ": "
+
+DYNAMODB_MAX_POOL_CONNECTIONS = 50
+DYNAMODB_MAX_ATTEMPTS = 10
+
+# One client per region for the whole process; boto3 clients are thread-safe and keep their
+# connection pool, so every JobAuditTable shares warm connections instead of opening its own.
+dynamodb_config = Config(
+    max_pool_connections=DYNAMODB_MAX_POOL_CONNECTIONS,
+    retries={"max_attempts": DYNAMODB_MAX_ATTEMPTS, "mode": "adaptive"}
+)
+dynamodb_clients = {}
+dynamodb_clients_lock = threading.Lock()
+
+# StatusDateIndex covers "which jobs are in status X since/before T": every write that sets
+# job_status also stamps status_tm. SnapshotLatestIndex is sparse: only the per job/snapshot
+# version pointer items carry snapshot_day, so one query lists the latest version of every job.
+AUDIT_TABLE_DEFINITION = {
+    "AttributeDefinitions": [
+        {"AttributeName": "job_name", "AttributeType": "S"},
+        {"AttributeName": "snapshot_date", "AttributeType": "S"},
+        {"AttributeName": "job_status", "AttributeType": "S"},
+        {"AttributeName": "status_tm", "AttributeType": "S"},
+        {"AttributeName": "snapshot_day", "AttributeType": "S"}
+    ],
+    "KeySchema": [
+        {"AttributeName": "job_name", "KeyType": "HASH"},
+        {"AttributeName": "snapshot_date", "KeyType": "RANGE"}
+    ],
+    "GlobalSecondaryIndexes": [
+        {
+            "IndexName": STATUS_DATE_INDEX,
+            "KeySchema": [
+                {"AttributeName": "job_status", "KeyType": "HASH"},
+                {"AttributeName": "status_tm", "KeyType": "RANGE"}
+            ],
+            "Projection": {"ProjectionType": "INCLUDE", "NonKeyAttributes": ["step_id", "description"]}
+        },
+        {
+            "IndexName": SNAPSHOT_LATEST_INDEX,
+            "KeySchema": [
+                {"AttributeName": "snapshot_day", "KeyType": "HASH"},
+                {"AttributeName": "job_name", "KeyType": "RANGE"}
+            ],
+            "Projection": {"ProjectionType": "INCLUDE", "NonKeyAttributes": ["latest_version"]}
+        }
+    ],
+    "BillingMode": "PAY_PER_REQUEST"
+}
+
+serializer = TypeSerializer()
+deserializer = TypeDeserializer()
+
+
+def version_key(snapshot_date, version):
+    return f"{snapshot_date}:{version}"
+
+
+def record_version(record):
+    # int() also accepts the legacy "<date>: <version>" keys, whose version starts with a space
+    return int(record["snapshot_date"].split(":")[1])
+
+
+def legacy_version_key(snapshot_date, version):
+    # Key format of the rows the earlier Lambda wrote
+    return f"{snapshot_date}{LEGACY_VERSION_SEPARATOR}{version}"
+
+
+def is_legacy_record(record):
+    return LEGACY_VERSION_SEPARATOR in record["snapshot_date"]
+
+
+def upgrade_legacy_record(record):
+    # Legacy rows also hold dependencies as a JSON string, including an "active" flag that was
+    # never a dependency, and have no pending_dependencies counter
+    snapshot_date = record["snapshot_date"].split(LEGACY_VERSION_SEPARATOR)[0]
+    upgraded = dict(record, snapshot_date=version_key(snapshot_date, record_version(record)))
+    dependencies = record.get("dependencies")
+    if isinstance(dependencies, str):
+        dependencies = json.loads(dependencies)
+        dependencies.pop("active", None)
+        upgraded["dependencies"] = dependencies
+    if isinstance(dependencies, dict) and "pending_dependencies" not in record:
+        upgraded["pending_dependencies"] = sum(1 for value in dependencies.values() if value is None)
+    return upgraded
+
+
+def version_pointer_key(snapshot_date):
+    # Sorts outside the "<date>:" prefix, so version queries never see the pointer item
+    return f"{snapshot_date}#latest"
+
+
+def marshal(value):
+    marshaller = MARSHALLERS.get(type(value))
+    if marshaller is None:
+        # Sets, Decimal, Binary and subclasses keep TypeSerializer's handling and validation
+        return serializer.serialize(value)
+    return marshaller(value)
+
+
+def marshal_string(value):
+    return {"S": value}
+
+
+def marshal_bool(value):
+    return {"BOOL": value}
+
+
+def marshal_int(value):
+    return {"N": str(value)}
+
+
+def marshal_null(value):
+    return {"NULL": True}
+
+
+def marshal_map(value):
+    return {"M": {name: marshal(member) for name, member in value.items()}}
+
+
+def marshal_list(value):
+    return {"L": [marshal(member) for member in value]}
+
+
+MARSHALLERS = {str: marshal_string, bool: marshal_bool, int: marshal_int, type(None): marshal_null, dict: marshal_map, list: marshal_list}
+
+
+@lru_cache(maxsize=512)
+def shape_marshallers(shape):
+    # Audit records come in a handful of shapes (attribute names and value types), so each
+    # attribute's marshaller is looked up once per shape rather than per value
+    return tuple(MARSHALLERS.get(value_type, serializer.serialize) for _, value_type in shape)
+
+
+def to_item(record):
+    marshallers = shape_marshallers(tuple((name, type(value)) for name, value in record.items()))
+    return {name: marshaller(value) for marshaller, (name, value) in zip(marshallers, record.items())}
+
+
+def unmarshal_number(value):
+    # Integral numbers come back as int so records stay JSON-serialisable; the rest keep Decimal precision
+    if "." in value or "e" in value or "E" in value:
+        return Decimal(value)
+    return int(value)
+
+
+UNMARSHALLERS = {
+    "S": lambda value: value,
+    "N": unmarshal_number,
+    "BOOL": lambda value: value,
+    "NULL": lambda value: None,
+    "M": lambda value: {name: unmarshal(member) for name, member in value.items()},
+    "L": lambda value: [unmarshal(member) for member in value]
+}
+
+
+def unmarshal(value):
+    (tag, inner), = value.items()
+    unmarshaller = UNMARSHALLERS.get(tag)
+    if unmarshaller is None:
+        return deserializer.deserialize(value)
+    return unmarshaller(inner)
+
+
+def from_item(item):
+    return {name: unmarshal(value) for name, value in item.items()}
+
+
+def get_dynamodb_client(region_name=None):
+    with dynamodb_clients_lock:
+        if region_name not in dynamodb_clients:
+            dynamodb_clients[region_name] = boto3.client('dynamodb', region_name=region_name, config=dynamodb_config)
+        return dynamodb_clients[region_name]
+
+
+def encode_snapshot_date(snapshot_date):
+    # "2024-06-25" -> 20240625
+    return int(snapshot_date.replace("-", ""))
+
+
+def decode_snapshot_date(value):
+    value = str(value)
+    return f"{value[:4]}-{value[4:6]}-{value[6:]}"
+
+
+def status_time(moment=None):
+    # ISO-8601 UTC, so status_tm sorts chronologically as a string
+    return (moment or datetime.now(timezone.utc)).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+def with_status_time(attributes):
+    if "job_status" in attributes and "status_tm" not in attributes:
+        return dict(attributes, status_tm=status_time())
+    return attributes
+
+
+def projection_expression(attributes):
+    # Each attribute is a top-level name or a path tuple such as ("dependencies", "dep1"),
+    # which projects a single slot of a map attribute
+    placeholders = {}
+    paths = []
+    for attribute in attributes:
+        parts = (attribute,) if isinstance(attribute, str) else attribute
+        for part in parts:
+            if part not in placeholders:
+                placeholders[part] = f"#p{len(placeholders)}"
+        paths.append(".".join(placeholders[part] for part in parts))
+    return ", ".join(paths), {placeholder: name for name, placeholder in placeholders.items()}
+
+
+def update_expression(attributes):
+    names = {f"#a{i}": name for i, name in enumerate(attributes)}
+    values = {f":v{i}": marshal(value) for i, value in enumerate(attributes.values())}
+    expression = "SET " + ", ".join(f"#a{i} = :v{i}" for i in range(len(attributes)))
+    return expression, names, values
+
+
+def is_conditional_check_failure(error):
+    return error.response["Error"]["Code"] == "ConditionalCheckFailedException"
+
+
+def is_lost_race(error):
+    # A transaction cancelled only because a condition failed or a concurrent transaction touched
+    # the same items; anything else (validation, throttling past the retries) is a real error
+    if error.response["Error"]["Code"] != "TransactionCanceledException":
+        return False
+    reasons = {reason.get("Code") for reason in error.response.get("CancellationReasons", [])} - {"None"}
+    return bool(reasons) and reasons <= {"ConditionalCheckFailed", "TransactionConflict"}
+
+
+def holds_runs(record, resolved):
+    # True when every slot being resolved already holds the same upstream run
+    slots = record.get("dependencies") or {}
+    return bool(resolved) and all(
+        isinstance(slots.get(dep), dict) and slots[dep].get("runId") == value.get("runId")
+        for dep, value in resolved.items()
+    )
+
+
+def dependency_record(dependencies):
+    # Each dependency is its own slot in the `dependencies` map (None until its upstream
+    # finishes) and pending_dependencies counts the empty slots.
+    pending = sum(1 for value in dependencies.values() if value is None)
+    return {
+        "dependencies": dependencies,
+        "pending_dependencies": pending,
+        "job_status": "WAITING" if pending else "DEPS_COMPLETE",
+        "status_tm": status_time()
+    }
+
 
 class JobAuditTable:
-    def __init__(self, table_name):
-        self.dynamodb = boto3.client('dynamodb')
+    def __init__(self, table_name, dynamodb=None):
+        self._dynamodb = dynamodb
         self.table_name = table_name
+        # Per-operation totals for this table, for scripts and benchmarks. The Lambda reports
+        # through instrumentation.InvocationMetrics on its session and never logs these.
+        self.stats = {}
+        self.stats_lock = threading.Lock()
+
+    @property
+    def dynamodb(self):
+        # Resolved on first call so constructing a table at import time costs no client
+        if self._dynamodb is None:
+            self._dynamodb = get_dynamodb_client()
+        return self._dynamodb
+
+    @dynamodb.setter
+    def dynamodb(self, client):
+        self._dynamodb = client
+
+    def call(self, operation, **kwargs):
+        kwargs.setdefault("ReturnConsumedCapacity", "TOTAL")
+        start = time.perf_counter()
+        try:
+            response = getattr(self.dynamodb, operation)(**kwargs)
+        except ClientError as e:
+            self.record_call(operation, start, e.response, error=True)
+            raise
+        self.record_call(operation, start, response)
+        return response
+
+    def record_call(self, operation, start, response, error=False):
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        # Single-table calls return one ConsumedCapacity dict, batch and transact calls a list
+        consumed = response.get("ConsumedCapacity") or []
+        if isinstance(consumed, dict):
+            consumed = [consumed]
+        with self.stats_lock:
+            stats = self.stats.setdefault(operation, {"calls": 0, "errors": 0, "retries": 0, "capacity_units": 0.0, "total_ms": 0.0})
+            stats["calls"] += 1
+            stats["errors"] += int(error)
+            stats["retries"] += response.get("ResponseMetadata", {}).get("RetryAttempts", 0)
+            stats["capacity_units"] += sum(entry.get("CapacityUnits", 0.0) for entry in consumed)
+            stats["total_ms"] += elapsed_ms
+
+    def get_stats(self):
+        with self.stats_lock:
+            return {operation: dict(stats) for operation, stats in self.stats.items()}
+
+    def reset_stats(self):
+        with self.stats_lock:
+            self.stats.clear()
+
+    def call_batch(self, operation, request_items, unprocessed_key, max_retries=BATCH_MAX_RETRIES, base_delay=BATCH_BASE_DELAY):
+        # Yields each response of a batch call, resending its unprocessed part with exponential
+        # backoff until nothing is left or the retries run out
+        for attempt in range(max_retries + 1):
+            response = self.call(operation, RequestItems=request_items)
+            yield response
+            request_items = response.get(unprocessed_key) or {}
+            if not request_items:
+                return
+            if attempt < max_retries:
+                time.sleep(base_delay * (2 ** attempt))
+        # BatchGetItem leaves {"Keys": [...]} per table, BatchWriteItem a list of requests
+        left = sum(len(request["Keys"]) if isinstance(request, dict) else len(request) for request in request_items.values())
+        raise RuntimeError(f"{left} audit records left unprocessed by {operation} after {max_retries} retries")
 
     def insert_record(self, run_id, job_id, dependency_job_ids=None):
         try:
-            item = {
-                'run_id': {'S': run_id},
-                'job_id': {'S': job_id},
-                'dependency_job_ids': {'L': [] if dependency_job_ids is None else [{'M': {'dependency_job': {'S': dep_job}, 'job_id': {'S': job}}} for dep_job, job in dependency_job_ids]},
-                'all_dependencies_completed': {'BOOL': False}
-            }
-
-            self.dynamodb.put_item(
+            item = JobAuditRecord(run_id, job_id, dependency_job_ids).to_dynamodb_item()
+
+            self.call("put_item",
                 TableName=self.table_name,
                 Item=item
             )
@@ -23,30 +360,641 @@ class JobAuditTable:
         except Exception as e:
             print("Error inserting job audit:", e)
 
+    def update_audit_record(self, job_name, snapshot_date, attribute, value):
+        return self.update_audit_record_attributes(job_name, snapshot_date, {attribute: value})
+
+    def update_audit_record_attributes(self, job_name, snapshot_date, attributes):
+        # snapshot_date is the full "<date>:<version>" sort key
+        expression, names, values = update_expression(with_status_time(attributes))
+        response = self.call("update_item",
+            TableName=self.table_name,
+            Key={"job_name": {"S": job_name}, "snapshot_date": {"S": snapshot_date}},
+            UpdateExpression=expression,
+            ExpressionAttributeNames=names,
+            ExpressionAttributeValues=values,
+            ReturnValues="ALL_NEW"
+        )
+        return from_item(response["Attributes"])
+
+    def update_audit_records(self, updates, atomic=False):
+        # updates: list of (job_name, "<date>:<version>", {attribute: value}). Updates to the same
+        # record are merged, later attributes winning. Independent records are sent as parallel
+        # UpdateItem calls at 1 WCU each; every update is attempted and the first error is raised
+        # afterwards. atomic=True sends TransactWriteItems instead, so each chunk of
+        # TRANSACT_MAX_ITEMS records is applied all-or-nothing at twice the write cost.
+        merged = {}
+        for job_name, snapshot_date, attributes in updates:
+            merged.setdefault((job_name, snapshot_date), {}).update(attributes)
+        if atomic:
+            keys = list(merged)
+            for i in range(0, len(keys), TRANSACT_MAX_ITEMS):
+                self._transact_updates({key: merged[key] for key in keys[i:i + TRANSACT_MAX_ITEMS]})
+            return
+        if not merged:
+            return
+        with ThreadPoolExecutor(max_workers=min(UPDATE_MAX_WORKERS, len(merged))) as executor:
+            futures = [
+                executor.submit(self.update_audit_record_attributes, job_name, snapshot_date, attributes)
+                for (job_name, snapshot_date), attributes in merged.items()
+            ]
+        errors = [future.exception() for future in futures if future.exception() is not None]
+        if errors:
+            raise errors[0]
+
+    def _transact_updates(self, updates, base_delay=0.05):
+        transact_items = []
+        for (job_name, snapshot_date), attributes in updates.items():
+            expression, names, values = update_expression(with_status_time(attributes))
+            transact_items.append({"Update": {
+                "TableName": self.table_name,
+                "Key": {"job_name": {"S": job_name}, "snapshot_date": {"S": snapshot_date}},
+                "UpdateExpression": expression,
+                "ExpressionAttributeNames": names,
+                "ExpressionAttributeValues": values
+            }})
+        for attempt in range(TRANSACT_MAX_ATTEMPTS):
+            try:
+                self.call("transact_write_items", TransactItems=transact_items)
+                return
+            except ClientError as e:
+                # Conflicts with a concurrent write and throttling cancel the whole transaction but can be retried
+                reasons = {reason.get("Code") for reason in e.response.get("CancellationReasons", [])} - {"None"}
+                # A cancellation without reasons says nothing about why, so it is not retried
+                retryable = e.response["Error"]["Code"] == "TransactionCanceledException" and bool(reasons) and reasons <= {"TransactionConflict", "ThrottlingError"}
+                if not retryable or attempt == TRANSACT_MAX_ATTEMPTS - 1:
+                    raise
+                time.sleep(base_delay * (2 ** attempt))
+
+    def get_audit_record(self, job_name, snapshot_date):
+        return list(self.iter_audit_records(job_name, snapshot_date, consistent=True))
+
+    def iter_audit_records(self, job_name, snapshot_date=None, attributes=None, consistent=False, deserialize=True, page_size=None, include_pointers=False):
+        # Lazily pages through one job's rows (optionally one snapshot), fetching only `attributes`.
+        # The "<date>#latest" version pointers are left out unless include_pointers is set.
+        params = {
+            "TableName": self.table_name,
+            "KeyConditionExpression": "job_name = :job_name",
+            "ExpressionAttributeValues": {":job_name": {"S": job_name}},
+            "ConsistentRead": consistent
+        }
+        if snapshot_date:
+            params["KeyConditionExpression"] += " AND begins_with(snapshot_date, :snapshot_date)"
+            params["ExpressionAttributeValues"][":snapshot_date"] = {"S": snapshot_date + ":"}
+        elif not include_pointers:
+            params["FilterExpression"] = POINTER_FILTER
+        if attributes:
+            params["ProjectionExpression"], params["ExpressionAttributeNames"] = projection_expression(attributes)
+        if page_size:
+            params["Limit"] = page_size
+        return self._iter_query(params, deserialize)
+
+    def _iter_query(self, params, deserialize=True):
+        while True:
+            response = self.call("query", **params)
+            for item in response["Items"]:
+                yield from_item(item) if deserialize else item
+            if "LastEvaluatedKey" not in response:
+                return
+            params["ExclusiveStartKey"] = response["LastEvaluatedKey"]
+
+    def get_jobs_by_status(self, job_status, since=None, until=None, deserialize=True):
+        # since/until are datetimes or status_tm strings; either bound may be left open
+        since = status_time(since) if isinstance(since, datetime) else since
+        until = status_time(until) if isinstance(until, datetime) else until
+        condition = "job_status = :job_status"
+        values = {":job_status": {"S": job_status}}
+        if since and until:
+            condition += " AND status_tm BETWEEN :since AND :until"
+            values.update({":since": {"S": since}, ":until": {"S": until}})
+        elif since:
+            condition += " AND status_tm >= :since"
+            values[":since"] = {"S": since}
+        elif until:
+            condition += " AND status_tm <= :until"
+            values[":until"] = {"S": until}
+        return self._iter_query({
+            "TableName": self.table_name,
+            "IndexName": STATUS_DATE_INDEX,
+            "KeyConditionExpression": condition,
+            "ExpressionAttributeValues": values
+        }, deserialize)
+
+    def get_stuck_jobs(self, hours, job_status="WAITING"):
+        return self.get_jobs_by_status(job_status, until=datetime.now(timezone.utc) - timedelta(hours=hours))
+
+    def get_latest_versions(self, snapshot_date):
+        items = self._iter_query({
+            "TableName": self.table_name,
+            "IndexName": SNAPSHOT_LATEST_INDEX,
+            "KeyConditionExpression": "snapshot_day = :snapshot_day",
+            "ExpressionAttributeValues": {":snapshot_day": {"S": snapshot_date}}
+        }, deserialize=False)
+        return {item["job_name"]["S"]: int(item["latest_version"]["N"]) for item in items}
+
+    def get_latest_records(self, snapshot_date, attributes=None):
+        keys = [
+            {"job_name": {"S": job_name}, "snapshot_date": {"S": version_key(snapshot_date, version)}}
+            for job_name, version in self.get_latest_versions(snapshot_date).items()
+        ]
+        records = []
+        for i in range(0, len(keys), BATCH_GET_MAX_KEYS):
+            request = {"Keys": keys[i:i + BATCH_GET_MAX_KEYS]}
+            if attributes:
+                request["ProjectionExpression"], request["ExpressionAttributeNames"] = projection_expression(attributes)
+            for response in self.call_batch("batch_get_item", {self.table_name: request}, "UnprocessedKeys"):
+                records.extend(from_item(item) for item in response["Responses"].get(self.table_name, []))
+        return records
+
+    def scan_audit_records(self, attributes=None, segments=SCAN_SEGMENTS, deserialize=True, page_size=None, max_pending_pages=None, include_pointers=False):
+        # Parallel Scan: one worker per segment pushes pages into a bounded queue and the caller
+        # consumes items lazily, so memory stays at a few pages however large the table is.
+        # Version pointers are filtered out unless include_pointers is set.
+        pages = queue.Queue(maxsize=max_pending_pages or segments * 2)
+        stop = threading.Event()
+        done = object()
+
+        def put(page):
+            while not stop.is_set():
+                try:
+                    pages.put(page, timeout=0.1)
+                    return True
+                except queue.Full:
+                    pass
+            return False
+
+        def scan_segment(segment):
+            params = {"TableName": self.table_name, "Segment": segment, "TotalSegments": segments}
+            if not include_pointers:
+                params["FilterExpression"] = POINTER_FILTER
+            if attributes:
+                params["ProjectionExpression"], params["ExpressionAttributeNames"] = projection_expression(attributes)
+            if page_size:
+                params["Limit"] = page_size
+            try:
+                while not stop.is_set():
+                    response = self.call("scan", **params)
+                    if not put(response["Items"]):
+                        return
+                    if "LastEvaluatedKey" not in response:
+                        break
+                    params["ExclusiveStartKey"] = response["LastEvaluatedKey"]
+            except Exception as e:
+                put(e)
+            finally:
+                put(done)
+
+        executor = ThreadPoolExecutor(max_workers=segments)
+        try:
+            for segment in range(segments):
+                executor.submit(scan_segment, segment)
+            remaining = segments
+            while remaining:
+                page = pages.get()
+                if page is done:
+                    remaining -= 1
+                elif isinstance(page, Exception):
+                    raise page
+                else:
+                    for item in page:
+                        yield from_item(item) if deserialize else item
+        finally:
+            # Also runs when the caller stops iterating early
+            stop.set()
+            executor.shutdown(wait=True)
+
+    def get_audit_record_by_version(self, job_name, snapshot_date, version, attributes=None):
+        return self.get_audit_record_by_key(job_name, version_key(snapshot_date, version), attributes)
+
+    def get_audit_record_by_key(self, job_name, key, attributes=None):
+        params = {
+            "TableName": self.table_name,
+            "Key": {"job_name": {"S": job_name}, "snapshot_date": {"S": key}},
+            "ConsistentRead": True
+        }
+        if attributes:
+            params["ProjectionExpression"], params["ExpressionAttributeNames"] = projection_expression(attributes)
+        response = self.call("get_item", **params)
+        return from_item(response["Item"]) if "Item" in response else None
+
+    def get_version_pointer(self, job_name, snapshot_date):
+        # The "<date>#latest" item names the newest version, so it is read with one GetItem.
+        # Returns None for snapshots written before the pointer existed.
+        response = self.call("get_item",
+            TableName=self.table_name,
+            Key={"job_name": {"S": job_name}, "snapshot_date": {"S": version_pointer_key(snapshot_date)}},
+            ProjectionExpression="latest_version",
+            ConsistentRead=True
+        )
+        item = response.get("Item", {})
+        return int(item["latest_version"]["N"]) if "latest_version" in item else None
+
+    def query_latest_record(self, job_name, snapshot_date, attributes=None):
+        # Fallback for snapshots without a pointer: reads every "<date>" row and picks the newest
+        params = {
+            "TableName": self.table_name,
+            "KeyConditionExpression": "job_name = :job_name AND begins_with(snapshot_date, :snapshot_date)",
+            "ExpressionAttributeValues": {":job_name": {"S": job_name}, ":snapshot_date": {"S": snapshot_date}},
+            "ConsistentRead": True
+        }
+        if attributes:
+            params["ProjectionExpression"], params["ExpressionAttributeNames"] = projection_expression(attributes)
+        latest = None
+        for item in self._iter_query(params):
+            if item["snapshot_date"] == version_pointer_key(snapshot_date):
+                continue
+            # Sort keys order "10" before "9", so the newest version is picked numerically
+            if latest is None or record_version(item) > record_version(latest):
+                latest = item
+        return latest
+
+    def get_latest_state(self, job_name, snapshot_date, attributes=None, with_record=True):
+        # Returns (pointer version or 0, newest record or None). With a pointer this is one GetItem
+        # for the pointer plus one for the record it names (none when with_record is False);
+        # without one, a keys-only query finds the newest record.
+        if attributes and "snapshot_date" not in attributes:
+            attributes = ["snapshot_date"] + list(attributes)
+        pointer = self.get_version_pointer(job_name, snapshot_date)
+        if pointer is None:
+            latest = self.query_latest_record(job_name, snapshot_date, ["snapshot_date"])
+            if latest is not None and with_record:
+                # Legacy rows hold dependencies as a string, which nested projections cannot address
+                latest = self.get_audit_record_by_key(job_name, latest["snapshot_date"], None if is_legacy_record(latest) else attributes)
+            return 0, latest
+        if not with_record:
+            return pointer, None
+        return pointer, self.get_audit_record_by_version(job_name, snapshot_date, pointer, attributes)
+
+    def create_version(self, job_name, snapshot_date, version, expected, attributes):
+        # Every version is allocated here: the record is put and the pointer moved to it in one
+        # transaction, with a compare-and-swap on the pointer still holding `expected` (0 when it
+        # does not exist yet). A writer that lost the race gets None and re-reads.
+        record = dict(attributes, job_name=job_name, snapshot_date=version_key(snapshot_date, version))
+        try:
+            self.call("transact_write_items", TransactItems=[
+                {"Update": {
+                    "TableName": self.table_name,
+                    "Key": {"job_name": {"S": job_name}, "snapshot_date": {"S": version_pointer_key(snapshot_date)}},
+                    "UpdateExpression": "SET latest_version = :next, snapshot_day = :snapshot_day",
+                    "ConditionExpression": "attribute_not_exists(latest_version) OR latest_version = :expected",
+                    "ExpressionAttributeValues": {":next": {"N": str(version)}, ":expected": {"N": str(expected)}, ":snapshot_day": {"S": snapshot_date}}
+                }},
+                {"Put": {
+                    "TableName": self.table_name,
+                    "Item": to_item(record),
+                    "ConditionExpression": "attribute_not_exists(snapshot_date)"
+                }}
+            ])
+        except ClientError as e:
+            if is_lost_race(e):
+                return None
+            raise
+        return record
+
+    def migrate_legacy_record(self, record):
+        # Moves one legacy row to its "<date>:<version>" key in a single transaction, so readers
+        # see it under exactly one key. Returns the upgraded record, or None when another writer
+        # moved it first.
+        upgraded = upgrade_legacy_record(record)
+        try:
+            self.call("transact_write_items", TransactItems=[
+                {"Put": {
+                    "TableName": self.table_name,
+                    "Item": to_item(upgraded),
+                    "ConditionExpression": "attribute_not_exists(snapshot_date)"
+                }},
+                {"Delete": {
+                    "TableName": self.table_name,
+                    "Key": {"job_name": {"S": record["job_name"]}, "snapshot_date": {"S": record["snapshot_date"]}},
+                    "ConditionExpression": "attribute_exists(snapshot_date)"
+                }}
+            ])
+        except ClientError as e:
+            if is_lost_race(e):
+                return None
+            raise
+        return upgraded
+
+    def advance_version_pointer(self, job_name, snapshot_date, version):
+        # Only ever moves the pointer forward; a newer version allocated meanwhile wins
+        try:
+            self.call("update_item",
+                TableName=self.table_name,
+                Key={"job_name": {"S": job_name}, "snapshot_date": {"S": version_pointer_key(snapshot_date)}},
+                UpdateExpression="SET latest_version = :version, snapshot_day = :snapshot_day",
+                ConditionExpression="attribute_not_exists(latest_version) OR latest_version < :version",
+                ExpressionAttributeValues={":version": {"N": str(version)}, ":snapshot_day": {"S": snapshot_date}}
+            )
+        except ClientError as e:
+            if not is_conditional_check_failure(e):
+                raise
+
+    def migrate_legacy_records(self):
+        # One-off sweep for rows the earlier Lambda wrote as "<date>: <version>". Run it once
+        # after deploying: in-flight executions update their rows under the new key, and
+        # UpdateItem would otherwise create a stray item there. Safe to run again.
+        latest = {}
+        migrated = 0
+        for record in self.scan_audit_records():
+            if not is_legacy_record(record):
+                continue
+            if self.migrate_legacy_record(record) is not None:
+                migrated += 1
+            key = (record["job_name"], record["snapshot_date"].split(LEGACY_VERSION_SEPARATOR)[0])
+            latest[key] = max(latest.get(key, 0), record_version(record))
+        for (job_name, snapshot_date), version in latest.items():
+            self.advance_version_pointer(job_name, snapshot_date, version)
+        return migrated
+
+    def next_version(self, job_name, snapshot_date, attributes=None, with_record=True):
+        # Snapshots written before the pointer existed have records but no pointer, so the next
+        # version follows whichever of the two is ahead
+        pointer, latest = self.get_latest_state(job_name, snapshot_date, attributes, with_record)
+        current = 0 if latest is None else record_version(latest)
+        return pointer, latest, max(pointer, current) + 1
+
+    def insert_audit_record(self, job_name, snapshot_date, attributes=None, max_attempts=5):
+        for _ in range(max_attempts):
+            pointer, _, version = self.next_version(job_name, snapshot_date, ["snapshot_date"], with_record=False)
+            if self.create_version(job_name, snapshot_date, version, pointer, with_status_time(attributes or {})) is not None:
+                return str(version)
+        raise RuntimeError(f"Could not allocate a version for {job_name} {snapshot_date} after {max_attempts} attempts")
+
+    def get_latest_audit_record(self, job_name, snapshot_date, attributes=None):
+        return self.get_latest_state(job_name, snapshot_date, attributes)[1]
+
+    def resolve_dependency(self, job_name, snapshot_date, version, dependency, value, last=False):
+        # Fills one slot and, when it is the last empty one, flips job_status to DEPS_COMPLETE in
+        # the same conditional write. Returns (record, applied); on a failed condition the record
+        # is the item as it was, so the caller can tell a stale guess from an already-filled slot.
+        update = "SET dependencies.#dep = :value ADD pending_dependencies :minus_one"
+        condition = "job_status = :waiting AND attribute_type(dependencies.#dep, :null) AND pending_dependencies > :one"
+        values = {":value": value, ":null": "NULL", ":waiting": "WAITING", ":one": 1, ":minus_one": -1}
+        if last:
+            update = "SET dependencies.#dep = :value, pending_dependencies = :zero, job_status = :complete, status_tm = :status_tm"
+            condition = "job_status = :waiting AND attribute_type(dependencies.#dep, :null) AND pending_dependencies = :one"
+            values = {":value": value, ":null": "NULL", ":waiting": "WAITING", ":one": 1, ":zero": 0, ":complete": "DEPS_COMPLETE", ":status_tm": status_time()}
+        try:
+            response = self.call("update_item",
+                TableName=self.table_name,
+                Key={"job_name": {"S": job_name}, "snapshot_date": {"S": version_key(snapshot_date, version)}},
+                UpdateExpression=update,
+                ConditionExpression=condition,
+                ExpressionAttributeNames={"#dep": dependency},
+                ExpressionAttributeValues=to_item(values),
+                ReturnValues="ALL_NEW",
+                ReturnValuesOnConditionCheckFailure="ALL_OLD"
+            )
+            return from_item(response["Attributes"]), True
+        except ClientError as e:
+            if is_conditional_check_failure(e):
+                return from_item(e.response.get("Item", {})), False
+            raise
+
+    def resolve_dependencies(self, job_name, snapshot_date, dep_dict, max_attempts=5):
+        resolved = {dep: value for dep, value in dep_dict.items() if value is not None}
+        # Only the slots this call fills are read; the whole map is fetched just to seed a new version
+        attributes = ["snapshot_date", "job_status", "pending_dependencies"] + [("dependencies", dep) for dep in resolved]
+        for _ in range(max_attempts):
+            pointer, latest, next_version = self.next_version(job_name, snapshot_date, attributes)
+            if latest is not None and is_legacy_record(latest):
+                # Written by the earlier Lambda: move it to the current key format, then read again
+                legacy = self.get_audit_record_by_key(job_name, latest["snapshot_date"])
+                if legacy is not None and self.migrate_legacy_record(legacy) is not None:
+                    self.advance_version_pointer(job_name, snapshot_date, record_version(legacy))
+                continue
+            if latest is not None and latest["job_status"] in CONSUMED_STATUSES and holds_runs(latest, resolved):
+                # A redelivery of upstream runs this version already took: opening another
+                # version would launch the job a second time
+                return self.get_audit_record_by_version(job_name, snapshot_date, record_version(latest))
+            if latest is None or latest["job_status"] != "WAITING":
+                # First run for the snapshot, or a rerun after the previous version finished:
+                # start a new version seeded with everything already known.
+                dependencies = {dep: None for dep in dep_dict}
+                if latest is not None:
+                    latest = self.get_audit_record_by_version(job_name, snapshot_date, record_version(latest))
+                    dependencies.update(latest.get("dependencies", {}))
+                dependencies.update(resolved)
+                # If another writer created the next version first we go round again and resolve into that one instead
+                record = self.create_version(job_name, snapshot_date, next_version, pointer, dependency_record(dependencies))
+                if record is not None:
+                    return record
+                continue
+
+            version = latest["snapshot_date"].split(":")[1]
+            record = latest
+            for dep, value in resolved.items():
+                # A failed write hands back the current item, so a wrong guess about being the
+                # last slot costs one retry and a slot someone else already filled costs nothing
+                for attempt in range(max_attempts):
+                    slots = record.get("dependencies", {})
+                    if record.get("job_status") != "WAITING" or dep not in slots or slots[dep] is not None:
+                        break
+                    last = record["pending_dependencies"] == 1
+                    record, applied = self.resolve_dependency(job_name, snapshot_date, version, dep, value, last)
+                    if applied:
+                        break
+            if record is latest:
+                # Every slot was already filled (a redelivery); callers expect the full record
+                record = self.get_audit_record_by_version(job_name, snapshot_date, version)
+            return record
+        raise RuntimeError(f"Could not resolve dependencies for {job_name} {snapshot_date} after {max_attempts} attempts")
+
+
+class AuditWriteBatcher:
+    # Coalesces full-item puts across many records into BatchWriteItem calls and retries
+    # UnprocessedItems with exponential backoff.
+    def __init__(self, audit_table, max_retries=BATCH_MAX_RETRIES, base_delay=BATCH_BASE_DELAY):
+        self.audit_table = audit_table
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.pending = {}
+
+    def put(self, record):
+        # A later put for the same key replaces the pending one; BatchWriteItem rejects duplicates
+        self.pending[(record["job_name"], record["snapshot_date"])] = record
+        if len(self.pending) >= BATCH_WRITE_MAX_ITEMS:
+            self.flush()
+
+    def flush(self):
+        # Records leave `pending` only once their batch is fully written, so a failed flush loses
+        # nothing and can be retried; rewriting an already accepted put is harmless
+        keys = list(self.pending)
+        for i in range(0, len(keys), BATCH_WRITE_MAX_ITEMS):
+            chunk = keys[i:i + BATCH_WRITE_MAX_ITEMS]
+            self._write([{"PutRequest": {"Item": to_item(self.pending[key])}} for key in chunk])
+            for key in chunk:
+                del self.pending[key]
+
+    def _write(self, requests):
+        for _ in self.audit_table.call_batch("batch_write_item", {self.audit_table.table_name: requests}, "UnprocessedItems", self.max_retries, self.base_delay):
+            pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        # Records put before an error are still written; a failed flush raises, chained to that error
+        self.flush()
+
+
 class JobAuditRecord:
-    def __init__(self, run_id, job_id, dependency_job_ids=None):
+    __slots__ = ("run_id", "job_id", "dependency_job_ids", "all_dependencies_completed", "attributes")
+
+    def __init__(self, run_id, job_id, dependency_job_ids=None, attributes=None):
         self.run_id = run_id
-        self.job_id = job_id
+        self.job_id = sys.intern(job_id)
         self.dependency_job_ids = dependency_job_ids if dependency_job_ids else {}
         self.all_dependencies_completed = False
+        # Any further attributes the row carries (status_tm, description, ...), written as given
+        self.attributes = attributes if attributes else {}
 
     def to_dynamodb_item(self):
-        return {
+        return dict(to_item(self.attributes), **{
             'run_id': {'S': self.run_id},
             'job_id': {'S': self.job_id},
             'dependency_job_ids': {'L': [{'M': {'dependency_job': {'S': dep_job}, 'job_id': {'S': job}}} for dep_job, job in self.dependency_job_ids.items()]},
             'all_dependencies_completed': {'BOOL': self.all_dependencies_completed}
-        }
+        })
+
+
+# Audit row attributes AuditRecord and AuditRecordBatch hold as typed fields; any other attribute
+# is kept as the raw DynamoDB value, so writing a record back never drops what was read
+AUDIT_RECORD_FIELDS = ("job_status", "step_id", "status_tm", "description", "pending_dependencies", "dependencies")
+
+
+def split_audit_item(item):
+    snapshot_date, version = item["snapshot_date"]["S"].split(":")
+    fields = {name: unmarshal(item[name]) if name in item else None for name in AUDIT_RECORD_FIELDS}
+    extra = {name: value for name, value in item.items() if name not in AUDIT_RECORD_FIELDS and name not in ("job_name", "snapshot_date")}
+    return snapshot_date, version, fields, extra or None
+
+
+def join_audit_item(job_name, snapshot_date, version, fields, extra):
+    item = {"job_name": {"S": job_name}, "snapshot_date": {"S": version_key(decode_snapshot_date(snapshot_date), version)}}
+    item.update((name, marshal(value)) for name, value in fields.items() if value is not None)
+    if extra:
+        item.update(extra)
+    return item
+
+
+class AuditRecord:
+    # One job x snapshot x version row, with the snapshot date and version stored as ints
+    __slots__ = ("job_name", "snapshot_date", "version") + AUDIT_RECORD_FIELDS + ("extra",)
+
+    def __init__(self, job_name, snapshot_date, version, job_status=None, step_id=None, status_tm=None, description=None, pending_dependencies=None, dependencies=None, extra=None):
+        self.job_name = sys.intern(job_name)
+        self.snapshot_date = snapshot_date if isinstance(snapshot_date, int) else encode_snapshot_date(snapshot_date)
+        self.version = int(version)
+        self.job_status = sys.intern(job_status) if job_status else None
+        self.step_id = step_id
+        self.status_tm = status_tm
+        self.description = description
+        self.pending_dependencies = pending_dependencies
+        self.dependencies = dependencies
+        self.extra = extra
+
+    @classmethod
+    def from_dynamodb_item(cls, item):
+        snapshot_date, version, fields, extra = split_audit_item(item)
+        return cls(item["job_name"]["S"], snapshot_date, version, extra=extra, **fields)
+
+    def to_dynamodb_item(self):
+        fields = {name: getattr(self, name) for name in AUDIT_RECORD_FIELDS}
+        return join_audit_item(self.job_name, self.snapshot_date, self.version, fields, self.extra)
+
+
+class AuditRecordBatch:
+    # Struct-of-arrays container for bulk analysis of audit rows. Job names and statuses are
+    # dictionary-encoded, dates and versions live in typed arrays, and rows are appended straight
+    # from DynamoDB items without building a per-row object. The remaining attributes are kept
+    # in plain columns (None where a row lacks them) so rows convert back without loss.
+    def __init__(self):
+        self.job_names = []
+        self.job_name_codes = {}
+        self.statuses = [None]
+        self.status_codes = {None: 0}
+        self.job_name_column = array("I")
+        self.snapshot_date_column = array("I")
+        self.version_column = array("I")
+        self.status_column = array("B")
+        self.field_columns = {name: [] for name in AUDIT_RECORD_FIELDS if name != "job_status"}
+        self.extra_column = []
+
+    @classmethod
+    def from_dynamodb_items(cls, items):
+        batch = cls()
+        for item in items:
+            batch.append_item(item)
+        return batch
+
+    def _encode(self, values, codes, value):
+        code = codes.get(value)
+        if code is None:
+            code = codes[value] = len(values)
+            values.append(sys.intern(value))
+        return code
+
+    def append_item(self, item):
+        snapshot_date, version, fields, extra = split_audit_item(item)
+        self.job_name_column.append(self._encode(self.job_names, self.job_name_codes, item["job_name"]["S"]))
+        self.snapshot_date_column.append(encode_snapshot_date(snapshot_date))
+        self.version_column.append(int(version))
+        self.status_column.append(self._encode(self.statuses, self.status_codes, fields["job_status"]))
+        for name, column in self.field_columns.items():
+            column.append(fields[name])
+        self.extra_column.append(extra)
+
+    def __len__(self):
+        return len(self.version_column)
+
+    def _fields(self, index):
+        fields = {name: column[index] for name, column in self.field_columns.items()}
+        fields["job_status"] = self.statuses[self.status_column[index]]
+        return fields
+
+    def __getitem__(self, index):
+        return AuditRecord(
+            self.job_names[self.job_name_column[index]],
+            self.snapshot_date_column[index],
+            self.version_column[index],
+            extra=self.extra_column[index],
+            **self._fields(index)
+        )
+
+    def to_dynamodb_items(self):
+        for index in range(len(self)):
+            yield join_audit_item(
+                self.job_names[self.job_name_column[index]],
+                self.snapshot_date_column[index],
+                self.version_column[index],
+                self._fields(index),
+                self.extra_column[index]
+            )
+
+    def count_by_status(self):
+        counts = [0] * len(self.statuses)
+        for code in self.status_column:
+            counts[code] += 1
+        return {status: count for status, count in zip(self.statuses, counts) if count}
+
+    def latest_versions(self):
+        latest = {}
+        for key, version in zip(zip(self.job_name_column, self.snapshot_date_column), self.version_column):
+            if version > latest.get(key, 0):
+                latest[key] = version
+        return {(self.job_names[job_code], decode_snapshot_date(snapshot_date)): version for (job_code, snapshot_date), version in latest.items()}
+
 
-# Example usage:
-job_audit_table = JobAuditTable('job_audit')
+if __name__ == "__main__":
+    # Example usage:
+    job_audit_table = JobAuditTable('job_audit')
 
-# Insert record for job1
-job1_record = JobAuditRecord(run_id='run123', job_id='job123', dependency_job_ids={'dependency1': 'job123'})
-job_audit_table.insert_record(run_id=job1_record.run_id, job_id=job1_record.job_id, dependency_job_ids=job1_record.dependency_job_ids)
+    # Insert record for job1
+    job1_record = JobAuditRecord(run_id='run123', job_id='job123', dependency_job_ids={'dependency1': 'job123'})
+    job_audit_table.insert_record(run_id=job1_record.run_id, job_id=job1_record.job_id, dependency_job_ids=job1_record.dependency_job_ids)
 
-# Update record for job2
-job2_record = JobAuditRecord(run_id='run123', job_id='job123')
-job2_record.dependency_job_ids['dependency2'] = 'job124'
-job2_record.all_dependencies_completed = True
-job_audit_table.insert_record(run_id=job2_record.run_id, job_id=job2_record.job_id, dependency_job_ids=job2_record.dependency_job_ids)
+    # Update record for job2
+    job2_record = JobAuditRecord(run_id='run123', job_id='job123')
+    job2_record.dependency_job_ids['dependency2'] = 'job124'
+    job2_record.all_dependencies_completed = True
+    job_audit_table.insert_record(run_id=job2_record.run_id, job_id=job2_record.job_id, dependency_job_ids=job2_record.dependency_job_ids)
@@ -0,0 +1,157 @@
+import bisect
+import json
+import threading
+import time
+from collections import defaultdict
+
+NAMESPACE = "ViewOrchestration"
+# Upper bounds (ms) of the latency histogram buckets; the last bucket is open-ended
+LATENCY_BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+
+def capacity_units(consumed_capacity):
+    # DynamoDB returns one ConsumedCapacity dict, or a list of them for batch/transact calls
+    if not consumed_capacity:
+        return 0.0
+    if isinstance(consumed_capacity, dict):
+        consumed_capacity = [consumed_capacity]
+    return sum(entry.get("CapacityUnits", 0.0) for entry in consumed_capacity)
+
+
+class OperationMetrics:
+    __slots__ = ("calls", "errors", "retries", "capacity_units", "total_ms", "buckets")
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.retries = 0
+        self.capacity_units = 0.0
+        self.total_ms = 0.0
+        self.buckets = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+
+    def add(self, elapsed_ms, retries, capacity, error):
+        self.calls += 1
+        self.errors += int(error)
+        self.retries += retries
+        self.capacity_units += capacity
+        self.total_ms += elapsed_ms
+        self.buckets[bisect.bisect_left(LATENCY_BUCKETS_MS, elapsed_ms)] += 1
+
+    def histogram(self):
+        # EMF values/counts pair; the open-ended bucket is reported at twice the last bound
+        bounds = LATENCY_BUCKETS_MS + (LATENCY_BUCKETS_MS[-1] * 2,)
+        pairs = [(bound, count) for bound, count in zip(bounds, self.buckets) if count]
+        return {"Values": [bound for bound, _ in pairs], "Counts": [count for _, count in pairs]}
+
+
+class InvocationMetrics:
+    # Collects every AWS API call made through an instrumented session or client, keyed by the
+    # handler branch and the job/snapshot being worked on when the call was made. The branch is
+    # per invocation; job attribution is per thread so fan-out workers account separately.
+    def __init__(self, namespace=NAMESPACE, emit=print):
+        self.namespace = namespace
+        self.emit = emit
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        self.branch = "unknown"
+        self.operations = defaultdict(OperationMetrics)
+
+    def instrument(self, target):
+        # A boto3 Session (covers clients and resources created from it later) or a single client
+        events = target.events if hasattr(target, "events") else target.meta.events
+        events.register("before-call", self.before_call, unique_id="invocation-metrics-before")
+        events.register("after-call", self.after_call, unique_id="invocation-metrics-after")
+
+    def start(self, branch):
+        with self.lock:
+            self.branch = branch
+            self.operations.clear()
+
+    def attribute(self, job_name=None, snapshot_date=None):
+        return Attribution(self.local, job_name, snapshot_date)
+
+    def before_call(self, context=None, **kwargs):
+        if context is not None:
+            context["metrics_start"] = time.perf_counter()
+
+    def after_call(self, model, parsed=None, context=None, **kwargs):
+        started = (context or {}).get("metrics_start")
+        elapsed_ms = (time.perf_counter() - started) * 1000 if started is not None else 0.0
+        parsed = parsed or {}
+        retries = parsed.get("ResponseMetadata", {}).get("RetryAttempts", 0)
+        error = "Error" in parsed
+        key = (
+            self.branch,
+            getattr(self.local, "job_name", None),
+            getattr(self.local, "snapshot_date", None),
+            model.service_model.service_name,
+            model.name
+        )
+        with self.lock:
+            self.operations[key].add(elapsed_ms, retries, capacity_units(parsed.get("ConsumedCapacity")), error)
+
+    def summary(self, service=None):
+        # Per-operation totals so far this invocation, summed over branches and jobs
+        totals = {}
+        with self.lock:
+            for (_, _, _, service_name, operation), metrics in self.operations.items():
+                if service is not None and service_name != service:
+                    continue
+                entry = totals.setdefault(operation, {"calls": 0, "errors": 0, "retries": 0, "capacity_units": 0.0, "total_ms": 0.0})
+                for name in entry:
+                    entry[name] += getattr(metrics, name)
+        return totals
+
+    def flush(self):
+        # One EMF line per (branch, job, snapshot, operation); job and snapshot are properties, not
+        # dimensions, so they stay searchable in Logs Insights without creating metric series
+        with self.lock:
+            operations = list(self.operations.items())
+            self.operations.clear()
+        timestamp = int(time.time() * 1000)
+        for (branch, job_name, snapshot_date, service, operation), metrics in operations:
+            line = {
+                "_aws": {
+                    "Timestamp": timestamp,
+                    "CloudWatchMetrics": [{
+                        "Namespace": self.namespace,
+                        "Dimensions": [["Branch", "Service", "Operation"], ["Service", "Operation"]],
+                        "Metrics": [
+                            {"Name": "ApiCalls", "Unit": "Count"},
+                            {"Name": "ApiErrors", "Unit": "Count"},
+                            {"Name": "ApiRetries", "Unit": "Count"},
+                            {"Name": "ApiLatency", "Unit": "Milliseconds"},
+                            {"Name": "ConsumedCapacity", "Unit": "Count"}
+                        ]
+                    }]
+                },
+                "Branch": branch,
+                "Service": service,
+                "Operation": operation,
+                "ApiCalls": metrics.calls,
+                "ApiErrors": metrics.errors,
+                "ApiRetries": metrics.retries,
+                "ApiLatency": metrics.histogram(),
+                "ConsumedCapacity": metrics.capacity_units,
+                "TotalLatencyMs": round(metrics.total_ms, 3),
+                "job_name": job_name,
+                "snapshot_date": snapshot_date
+            }
+            self.emit(json.dumps(line))
+        return len(operations)
+
+
+class Attribution:
+    def __init__(self, local, job_name, snapshot_date):
+        self.local = local
+        self.values = {"job_name": job_name, "snapshot_date": snapshot_date}
+
+    def __enter__(self):
+        self.previous = {name: getattr(self.local, name, None) for name in self.values}
+        for name, value in self.values.items():
+            setattr(self.local, name, value)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        for name, value in self.previous.items():
+            setattr(self.local, name, value)
@@ -0,0 +1,145 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from types import MappingProxyType
+
+import boto3
+from botocore.exceptions import ClientError
+
+from job_graph import JobGraph
+
+
+def validate_config(config):
+    if not isinstance(config, dict):
+        raise ValueError("Job config must be an object keyed by job name")
+    for job_name, conf in config.items():
+        if not isinstance(conf, dict):
+            raise ValueError(f"Config for {job_name} must be an object")
+        dependencies = conf.get("job_dependencies", [])
+        if not isinstance(dependencies, list) or not all(isinstance(dep, str) for dep in dependencies):
+            raise ValueError(f"job_dependencies of {job_name} must be a list of names")
+        if job_name in dependencies:
+            raise ValueError(f"{job_name} depends on itself")
+        if not isinstance(conf.get("active", False), bool):
+            raise ValueError(f"active of {job_name} must be true or false")
+
+
+class ConfigSnapshot:
+    # One parsed, validated version of the views config, compiled into read-only lookup tables.
+    # Building the JobGraph also rejects cyclic configs before they reach the orchestrator.
+    def __init__(self, config, etag=None):
+        validate_config(config)
+        self.etag = etag
+        self.graph = JobGraph({job: conf.get("job_dependencies", []) for job, conf in config.items()})
+        self.config = MappingProxyType({job: MappingProxyType(dict(conf)) for job, conf in config.items()})
+        self.dependents = MappingProxyType({name: tuple(jobs) for name, jobs in self.graph.dependents.items()})
+        # Inactive jobs resolve to no dependencies, so the orchestrator records them as disabled
+        self.dependencies = MappingProxyType({
+            job: self.graph.dependencies[job] for job, conf in config.items() if conf.get("active")
+        })
+
+    def getJobsByDependency(self, dependency):
+        return list(self.dependents.get(dependency, ()))
+
+    def getDependenciesByJob(self, job_name):
+        return list(self.dependencies.get(job_name, ()))
+
+
+class JobConfigs3(ConfigSnapshot):
+    def __init__(self, bucket, key):
+        self.bucket = bucket
+        self.key = key
+        s3 = boto3.resource('s3')
+        response = s3.Object(bucket, key).get()
+        content = response['Body'].read().decode('utf-8')
+        super().__init__(json.loads(content), response.get('ETag'))
+
+
+class JobConfigStore:
+    # Serves one S3 config object from memory. Once `ttl` seconds have passed the next read
+    # revalidates with a conditional GET: a 304 keeps the compiled snapshot, a new ETag swaps in
+    # a freshly compiled one. With `cache_dir`, the last body is also kept on disk so a restarted
+    # process in the same sandbox starts from it and only revalidates.
+    def __init__(self, bucket, key, ttl=300, cache_dir=None, s3_client=None, stats=None):
+        self.bucket = bucket
+        self.key = key
+        self.ttl = ttl
+        self.s3_client = s3_client
+        self.stats = stats if stats is not None else {"hits": 0, "misses": 0, "revalidations": 0}
+        self.cache_path = None
+        if cache_dir:
+            digest = hashlib.sha1(f"{bucket}/{key}".encode("utf-8")).hexdigest()
+            self.cache_path = os.path.join(cache_dir, f"{digest}.json")
+        self.lock = threading.Lock()
+        self.snapshot = None
+        self.expires_at = 0.0
+
+    def get(self):
+        snapshot = self.snapshot
+        if snapshot is not None and time.monotonic() < self.expires_at:
+            self.stats["hits"] += 1
+            return snapshot
+        with self.lock:
+            # Another thread may have refreshed while this one waited
+            if self.snapshot is not None and time.monotonic() < self.expires_at:
+                self.stats["hits"] += 1
+                return self.snapshot
+            if self.snapshot is None:
+                self.snapshot = self._read_cache_file()
+            self._refresh()
+            return self.snapshot
+
+    def _refresh(self):
+        if self.s3_client is None:
+            self.s3_client = boto3.client('s3')
+        params = {"Bucket": self.bucket, "Key": self.key}
+        if self.snapshot is not None and self.snapshot.etag:
+            params["IfNoneMatch"] = self.snapshot.etag
+        try:
+            response = self.s3_client.get_object(**params)
+        except ClientError as e:
+            if self.snapshot is not None and e.response["Error"]["Code"] in ("304", "NotModified"):
+                self.stats["revalidations"] += 1
+                self.expires_at = time.monotonic() + self.ttl
+                return
+            raise
+        body = response['Body'].read().decode('utf-8')
+        config = json.loads(body)
+        self.snapshot = ConfigSnapshot(config, response.get('ETag'))
+        self.stats["misses"] += 1
+        self.expires_at = time.monotonic() + self.ttl
+        self._write_cache_file(config, self.snapshot.etag)
+
+    def _read_cache_file(self):
+        if not self.cache_path or not os.path.exists(self.cache_path):
+            return None
+        try:
+            with open(self.cache_path, "r") as cache_file:
+                cached = json.load(cache_file)
+            return ConfigSnapshot(cached["config"], cached["etag"])
+        except (ValueError, KeyError):
+            # Unreadable cache; fall back to a full download
+            return None
+
+    def _write_cache_file(self, config, etag):
+        if not self.cache_path:
+            return
+        os.makedirs(os.path.dirname(self.cache_path), exist_ok=True)
+        tmp_path = self.cache_path + ".tmp"
+        with open(tmp_path, "w") as cache_file:
+            json.dump({"etag": etag, "config": config}, cache_file)
+        os.replace(tmp_path, self.cache_path)
+
+
+config_stores = {}
+config_stores_lock = threading.Lock()
+
+
+def get_config_store(bucket, key, **kwargs):
+    with config_stores_lock:
+        store = config_stores.get((bucket, key))
+        if store is None:
+            store = config_stores[(bucket, key)] = JobConfigStore(bucket, key, **kwargs)
+        return store
@@ -0,0 +1,61 @@
+from collections import deque
+
+
+class JobGraph:
+    def __init__(self, dependencies):
+        # dependencies: job name -> iterable of upstream names. Upstream names that are not
+        # jobs themselves (e.g. refined datasets) are kept as external nodes in the reverse index.
+        self.dependencies = {name: tuple(deps) for name, deps in dependencies.items()}
+        self.dependents = {name: [] for name in self.dependencies}
+        for name, deps in self.dependencies.items():
+            for dep in deps:
+                self.dependents.setdefault(dep, []).append(name)
+        self.order = self._topological_order()
+        self.descendants = self._transitive_closure()
+
+    @classmethod
+    def from_jobs(cls, all_jobs):
+        return cls({name: job.dependencies for name, job in all_jobs.items()})
+
+    def _topological_order(self):
+        pending = {name: sum(1 for dep in deps if dep in self.dependencies) for name, deps in self.dependencies.items()}
+        ready = deque(name for name, count in pending.items() if count == 0)
+        order = []
+        while ready:
+            name = ready.popleft()
+            order.append(name)
+            for dependent in self.dependents[name]:
+                pending[dependent] -= 1
+                if pending[dependent] == 0:
+                    ready.append(dependent)
+
+        if len(order) != len(self.dependencies):
+            cyclic = sorted(name for name, count in pending.items() if count > 0)
+            raise ValueError(f"Cycle detected in job dependencies: {', '.join(cyclic)}")
+        return tuple(order)
+
+    def _transitive_closure(self):
+        descendants = {}
+        for name in reversed(self.order):
+            reachable = set()
+            for dependent in self.dependents[name]:
+                reachable.add(dependent)
+                reachable.update(descendants[dependent])
+            descendants[name] = frozenset(reachable)
+        # External nodes only feed jobs, so their closure is the union of their direct dependents'
+        for name, direct in self.dependents.items():
+            if name not in descendants:
+                reachable = set(direct)
+                for dependent in direct:
+                    reachable.update(descendants[dependent])
+                descendants[name] = frozenset(reachable)
+        return descendants
+
+    def get_dependencies(self, name):
+        return list(self.dependencies.get(name, ()))
+
+    def get_dependents(self, name):
+        return list(self.dependents.get(name, ()))
+
+    def get_descendants(self, name):
+        return self.descendants.get(name, frozenset())
@@ -1,6 +1,6 @@
 import unittest
-from unittest.mock import MagicMock
-from main import execute, JobAuditTable, get_src_run_id_for_dependency, submit_new_step_to_cluster, check_emr_step_status
+from unittest.mock import MagicMock, patch
+from main import execute, JobAuditTable, submit_new_step_to_cluster, check_emr_step_status
 
 class TestExecuteFunction(unittest.TestCase):
     
@@ -8,45 +8,6 @@ class TestExecuteFunction(unittest.TestCase):
         # Set up any necessary mock objects or test data
         self.mock_job_audit_table = MagicMock(JobAuditTable)
     
-    def test_process_records_event_job_disabled(self):
-        # Test scenario where job is disabled
-        event = {
-            'Records': [
-                {'body': '{"Message": {"task_configuration": {"job_params": {"output_datasets": ["dataset1"]}, "job_info": {"SNAPSHOT_DATE": "2024-06-27"}}}}'}
-            ],
-            'job_name': 'job1',
-            'snapshot_date': '2024-06-27',
-            'job_version': '1'
-        }
-        
-        self.mock_job_audit_table.update_audit_record.return_value = {"snapshot_date": "2024-06-27:1"}
-        get_src_run_id_for_dependency.return_value = {'job1': {'job_status': {'S': 'DISABLED'}}}
-        
-        result = execute(event, None)
-        
-        self.assertEqual(result, {"status": 200, "message": "Job disabled job1"})
-    
-    def test_process_records_event_deps_complete(self):
-        # Test scenario where dependencies are complete
-        event = {
-            'Records': [
-                {'body': '{"Message": {"task_configuration": {"job_params": {"output_datasets": ["dataset1"], "job_params": {"edp_run_id": "123"}}, "parsed_datasets": [{"refined_dataset_path": "path"}], "job_info": {"SNAPSHOT_DATE": "2024-06-27"}, "job_info": {"SNAPSHOT_DATE": "2024-06-27"}}}}'}
-            ],
-            'job_name': 'job1',
-            'snapshot_date': '2024-06-27',
-            'job_version': '1'
-        }
-        
-        self.mock_job_audit_table.update_audit_record.return_value = {"snapshot_date": "2024-06-27:1"}
-        get_src_run_id_for_dependency.return_value = {'job1': {'job_status': {'S': 'DEPS_COMPLETE'}, 'dependencies': json.dumps({'dep1': {'runId': '123', 's3Path': 's3://path'}}), 'job_version': '1'}}
-        
-        result = execute(event, None)
-        
-        self.assertEqual(result['next_step'], "check_job_status")
-        self.assertEqual(result['job_name'], 'job1')
-        self.assertEqual(result['snapshot_date'], '2024-06-27')
-        self.assertEqual(result['job_version'], '1')
-    
     def test_process_records_event_no_records(self):
         # Test scenario where 'Records' key is not present in event
         event = {'no_records_key': 'test'}
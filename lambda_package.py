@@ -0,0 +1,39 @@
+import importlib.machinery
+import importlib.util
+import os
+import sys
+import types
+
+import insert_update
+import instrumentation
+import job_config
+
+LAMBDA_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "lambda_code")
+
+# lambda_code is deployed as one module of a package laid out as
+#   <package>/lambda_code.py
+#   <package>/instrumentation.py      <- instrumentation.py
+#   <package>/audit/dynamoDE.py       <- insert_update.py
+#   <package>/jobconfig/Config53.py   <- job_config.py
+# so its relative imports use the deployed names. Loading it from this tree maps them back.
+DEPLOYED_MODULES = {
+    "audit.dynamoDE": insert_update,
+    "jobconfig.Config53": job_config,
+    "instrumentation": instrumentation
+}
+
+
+def load_lambda_module(package="lambda_pkg"):
+    for name in (package, f"{package}.audit", f"{package}.jobconfig"):
+        module = types.ModuleType(name)
+        module.__path__ = []
+        sys.modules[name] = module
+    for name, module in DEPLOYED_MODULES.items():
+        sys.modules[f"{package}.{name}"] = module
+
+    loader = importlib.machinery.SourceFileLoader(f"{package}.lambda_code", LAMBDA_PATH)
+    spec = importlib.util.spec_from_loader(loader.name, loader)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[loader.name] = module
+    loader.exec_module(module)
+    return module
@@ -0,0 +1,17 @@
+import argparse
+
+from insert_update import JobAuditTable, get_dynamodb_client
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Move audit rows written as '<date>: <version>' to the '<date>:<version>' key format")
+    parser.add_argument("--table", required=True)
+    parser.add_argument("--region", default=None)
+    args = parser.parse_args()
+
+    audit_table = JobAuditTable(args.table, get_dynamodb_client(args.region))
+    print(f"Migrated {audit_table.migrate_legacy_records()} legacy audit records in {args.table}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,185 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+
+
+class StateStore(ABC):
+    @abstractmethod
+    def record(self, job_name, snapshot_date, completed):
+        pass
+
+    @abstractmethod
+    def load(self):
+        pass
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.flush()
+
+
+class JournalStateStore(StateStore):
+    # Append-only journal of (job, snapshot_date, completed) transitions. Each record is one
+    # line, fsync'd in batches, and the journal is folded into a snapshot file in the background.
+    # A timer syncs the tail of a burst within sync_interval even if no further record arrives.
+    def __init__(self, path, batch_size=32, sync_interval=1.0, compact_every=1000):
+        self.path = path
+        self.snapshot_path = path + ".snapshot"
+        self.compacting_path = path + ".compacting"
+        self.batch_size = batch_size
+        self.sync_interval = sync_interval
+        self.compact_every = compact_every
+        self.lock = threading.Lock()
+        self.state = self._read_state()
+        if os.path.exists(self.compacting_path):
+            # Finish the interrupted compaction before appending to a fresh journal
+            self._write_snapshot(self.state)
+            os.remove(self.compacting_path)
+            open(self.path, "w").close()
+        self.journal = open(self.path, "a")
+        self.unsynced = 0
+        self.last_sync = time.monotonic()
+        self.entries = 0
+        self.compaction = None
+        self.sync_timer = None
+
+    def _read_state(self):
+        state = {}
+        if os.path.exists(self.snapshot_path):
+            with open(self.snapshot_path, "r") as snapshot_file:
+                state = json.load(snapshot_file)
+        # A leftover .compacting journal means a compaction was interrupted before finishing
+        for path in (self.compacting_path, self.path):
+            if not os.path.exists(path):
+                continue
+            valid = 0
+            with open(path, "rb") as journal_file:
+                for line in journal_file:
+                    try:
+                        if not line.endswith(b"\n"):
+                            raise ValueError("unterminated entry")
+                        entry = json.loads(line)
+                    except ValueError:
+                        # Torn write from a crash; everything before it is intact
+                        break
+                    state[entry["name"]] = {"snapshot_date": entry["snapshot_date"], "completed": entry["completed"]}
+                    valid += len(line)
+            if path == self.path and valid < os.path.getsize(path):
+                # Drop the torn tail so new entries start on a clean line instead of being
+                # glued onto it and lost on the next load
+                with open(path, "r+b") as journal_file:
+                    journal_file.truncate(valid)
+        return state
+
+    def load(self):
+        with self.lock:
+            return {name: dict(value) for name, value in self.state.items()}
+
+    def record(self, job_name, snapshot_date, completed):
+        entry = {"name": job_name, "snapshot_date": snapshot_date, "completed": completed}
+        with self.lock:
+            self.state[job_name] = {"snapshot_date": snapshot_date, "completed": completed}
+            self.journal.write(json.dumps(entry) + "\n")
+            self.unsynced += 1
+            self.entries += 1
+            if self.unsynced >= self.batch_size or time.monotonic() - self.last_sync >= self.sync_interval:
+                self._sync()
+            elif self.sync_timer is None:
+                self.sync_timer = threading.Timer(self.sync_interval, self._timed_sync)
+                self.sync_timer.daemon = True
+                self.sync_timer.start()
+            start_compaction = self.entries >= self.compact_every and self.compaction is None
+            if start_compaction:
+                self.compaction = threading.Thread(target=self.compact, daemon=True)
+        if start_compaction:
+            self.compaction.start()
+
+    def _timed_sync(self):
+        with self.lock:
+            self.sync_timer = None
+            if self.unsynced and not self.journal.closed:
+                self._sync()
+
+    def _sync(self):
+        self.journal.flush()
+        os.fsync(self.journal.fileno())
+        self.unsynced = 0
+        self.last_sync = time.monotonic()
+
+    def flush(self):
+        with self.lock:
+            self._sync()
+
+    def compact(self):
+        try:
+            with self.lock:
+                self._sync()
+                self.journal.close()
+                os.replace(self.path, self.compacting_path)
+                self.journal = open(self.path, "a")
+                self.entries = 0
+                state = {name: dict(value) for name, value in self.state.items()}
+
+            self._write_snapshot(state)
+            os.remove(self.compacting_path)
+        finally:
+            self.compaction = None
+
+    def _write_snapshot(self, state):
+        tmp_path = self.snapshot_path + ".tmp"
+        with open(tmp_path, "w") as snapshot_file:
+            json.dump(state, snapshot_file)
+            snapshot_file.flush()
+            os.fsync(snapshot_file.fileno())
+        os.replace(tmp_path, self.snapshot_path)
+
+    def close(self):
+        compaction = self.compaction
+        if compaction is not None:
+            compaction.join()
+        with self.lock:
+            if self.sync_timer is not None:
+                self.sync_timer.cancel()
+                self.sync_timer = None
+            self._sync()
+            self.journal.close()
+
+
+class SqliteStateStore(StateStore):
+    def __init__(self, path, batch_size=32):
+        self.batch_size = batch_size
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS job_state (name TEXT PRIMARY KEY, snapshot_date TEXT, completed INTEGER)")
+        self.pending = 0
+
+    def load(self):
+        with self.lock:
+            rows = self.conn.execute("SELECT name, snapshot_date, completed FROM job_state").fetchall()
+        return {name: {"snapshot_date": snapshot_date, "completed": bool(completed)} for name, snapshot_date, completed in rows}
+
+    def record(self, job_name, snapshot_date, completed):
+        with self.lock:
+            self.conn.execute(
+                "INSERT INTO job_state (name, snapshot_date, completed) VALUES (?, ?, ?) "
+                "ON CONFLICT(name) DO UPDATE SET snapshot_date = excluded.snapshot_date, completed = excluded.completed",
+                (job_name, snapshot_date, int(completed))
+            )
+            self.pending += 1
+            if self.pending >= self.batch_size:
+                self.conn.commit()
+                self.pending = 0
+
+    def flush(self):
+        with self.lock:
+            self.conn.commit()
+            self.pending = 0
+
+    def close(self):
+        self.flush()
+        self.conn.close()
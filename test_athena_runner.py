@@ -0,0 +1,128 @@
+import unittest
+from unittest.mock import MagicMock
+
+from botocore.exceptions import ClientError
+
+from athena_runner import run_queries
+
+
+def execution(query_execution_id, state, scanned=0):
+    return {
+        'QueryExecutionId': query_execution_id,
+        'Status': {'State': state},
+        'Statistics': {'DataScannedInBytes': scanned, 'EngineExecutionTimeInMillis': 120, 'TotalExecutionTimeInMillis': 150}
+    }
+
+
+class FakeAthena:
+    # Each query runs for `polls` status checks, then succeeds
+    def __init__(self, polls=1, throttle_first=0):
+        self.polls = polls
+        self.throttle_first = throttle_first
+        self.started = []
+        self.checks = {}
+        self.max_in_flight = 0
+        self.batch_sizes = []
+        self.client = MagicMock()
+        self.client.start_query_execution.side_effect = self.start
+        self.client.batch_get_query_execution.side_effect = self.batch_get
+
+    def start(self, QueryString, **kwargs):
+        if self.throttle_first:
+            self.throttle_first -= 1
+            raise ClientError({'Error': {'Code': 'TooManyRequestsException', 'Message': 'Rate exceeded'}}, 'StartQueryExecution')
+        query_execution_id = f'q{len(self.started)}'
+        self.started.append(QueryString)
+        self.checks[query_execution_id] = 0
+        self.max_in_flight = max(self.max_in_flight, len(self.checks))
+        return {'QueryExecutionId': query_execution_id}
+
+    def batch_get(self, QueryExecutionIds):
+        self.batch_sizes.append(len(QueryExecutionIds))
+        executions = []
+        for query_execution_id in QueryExecutionIds:
+            self.checks[query_execution_id] += 1
+            if self.checks[query_execution_id] > self.polls:
+                del self.checks[query_execution_id]
+                executions.append(execution(query_execution_id, 'SUCCEEDED', scanned=10))
+            else:
+                executions.append(execution(query_execution_id, 'RUNNING'))
+        return {'QueryExecutions': executions}
+
+
+class TestRunQueries(unittest.TestCase):
+    def test_runs_within_concurrency_limit_and_keeps_order(self):
+        athena = FakeAthena(polls=2)
+        queries = [f"ALTER TABLE view ADD IF NOT EXISTS PARTITION (snapshot_date='2024-06-{day:02d}')" for day in range(1, 31)]
+
+        results = run_queries(queries, 'glue_db', 'workgroup', athena_client=athena.client, max_concurrency=8, sleep=lambda delay: None)
+
+        self.assertEqual([result['query'] for result in results], queries)
+        self.assertTrue(all(result['state'] == 'SUCCEEDED' for result in results))
+        self.assertEqual(results[0]['scanned_bytes'], 10)
+        self.assertEqual(results[0]['engine_ms'], 120)
+        self.assertEqual(athena.max_in_flight, 8)
+        athena.client.start_query_execution.assert_any_call(
+            QueryString=queries[0], QueryExecutionContext={'Database': 'glue_db'}, WorkGroup='workgroup'
+        )
+
+    def test_polls_in_batches_of_fifty(self):
+        athena = FakeAthena(polls=1)
+
+        run_queries(['MSCK REPAIR TABLE view'] * 120, 'glue_db', 'workgroup', athena_client=athena.client, max_concurrency=120, sleep=lambda delay: None)
+
+        self.assertEqual(athena.batch_sizes[:3], [50, 50, 20])
+
+    def test_backs_off_while_nothing_finishes(self):
+        athena = FakeAthena(polls=4)
+        delays = []
+
+        run_queries(['MSCK REPAIR TABLE view'], 'glue_db', 'workgroup', athena_client=athena.client, sleep=delays.append)
+
+        self.assertEqual(delays, [0.5, 1.0, 2.0, 4.0])
+
+    def test_throttled_submission_is_retried(self):
+        athena = FakeAthena(polls=0, throttle_first=2)
+
+        results = run_queries(['MSCK REPAIR TABLE a', 'MSCK REPAIR TABLE b'], 'glue_db', 'workgroup', athena_client=athena.client, sleep=lambda delay: None)
+
+        self.assertEqual([result['state'] for result in results], ['SUCCEEDED', 'SUCCEEDED'])
+        self.assertEqual(sorted(athena.started), ['MSCK REPAIR TABLE a', 'MSCK REPAIR TABLE b'])
+
+    def test_timeout_stops_running_queries(self):
+        athena = FakeAthena(polls=100)
+
+        results = run_queries(['MSCK REPAIR TABLE view'], 'glue_db', 'workgroup', athena_client=athena.client, timeout=0, sleep=lambda delay: None)
+
+        self.assertEqual(results[0]['state'], 'CANCELLED')
+        athena.client.stop_query_execution.assert_called_once_with(QueryExecutionId='q0')
+
+    def test_rejected_statement_fails_alone(self):
+        athena = FakeAthena(polls=0)
+        start = athena.start
+
+        def reject_bad_sql(QueryString, **kwargs):
+            if QueryString == 'bad':
+                raise ClientError({'Error': {'Code': 'InvalidRequestException', 'Message': 'line 1:1: mismatched input'}}, 'StartQueryExecution')
+            return start(QueryString, **kwargs)
+
+        athena.client.start_query_execution.side_effect = reject_bad_sql
+
+        results = run_queries(['MSCK REPAIR TABLE a', 'bad', 'MSCK REPAIR TABLE b'], 'glue_db', 'workgroup', athena_client=athena.client, sleep=lambda delay: None)
+
+        self.assertEqual([result['state'] for result in results], ['SUCCEEDED', 'FAILED', 'SUCCEEDED'])
+        self.assertIn('mismatched input', results[1]['error'])
+
+    def test_unexpected_error_stops_in_flight_queries(self):
+        athena = FakeAthena(polls=100)
+        athena.client.batch_get_query_execution.side_effect = RuntimeError('connection reset')
+
+        with self.assertRaises(RuntimeError):
+            run_queries(['MSCK REPAIR TABLE a', 'MSCK REPAIR TABLE b'], 'glue_db', 'workgroup', athena_client=athena.client, sleep=lambda delay: None)
+
+        stopped = sorted(call.kwargs['QueryExecutionId'] for call in athena.client.stop_query_execution.call_args_list)
+        self.assertEqual(stopped, ['q0', 'q1'])
+
+
+if __name__ == '__main__':
+    unittest.main()
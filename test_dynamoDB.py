@@ -1,51 +1,72 @@
+import json
 import unittest
 from unittest.mock import patch, MagicMock
 import boto3
-import datetime
-from your_module import JobAuditTable  # Replace 'your_module' with the actual module name
+from decimal import Decimal
+from boto3.dynamodb.types import TypeSerializer
+from botocore.exceptions import ClientError
+from botocore.stub import Stubber
+from moto import mock_aws
+from insert_update import AUDIT_TABLE_DEFINITION, JobAuditTable, AuditWriteBatcher, AuditRecordBatch, to_item, from_item
+from instrumentation import InvocationMetrics
 
 class TestJobAuditTable(unittest.TestCase):
     def setUp(self):
         self.table_name = "test_audit_table"
         self.job_audit_table = JobAuditTable(self.table_name)
 
-    @patch('boto3.client')
-    @patch('boto3.resource')
-    def test_insert_audit_record(self, mock_resource, mock_client):
+    def test_insert_audit_record(self):
         mock_dynamodb_client = MagicMock()
-        mock_client.return_value = mock_dynamodb_client
+        self.job_audit_table.dynamodb = mock_dynamodb_client
+        mock_dynamodb_client.get_item.return_value = {'Item': {'latest_version': {'N': '1'}}}
 
-        mock_table = MagicMock()
-        mock_resource.return_value.Table.return_value = mock_table
-
-        mock_table.query.return_value = {'Items': []}
-        
         job_name = "test_job"
         snapshot_date = "2024-06-25"
 
         job_version = self.job_audit_table.insert_audit_record(job_name, snapshot_date)
 
-        self.assertEqual(job_version, '1')
-        mock_dynamodb_client.put_item.assert_called_once()
-        args, kwargs = mock_dynamodb_client.put_item.call_args
-        self.assertEqual(kwargs['TableName'], self.table_name)
-        self.assertEqual(kwargs['Item']['job_name']['S'], job_name)
-        self.assertEqual(kwargs['Item']['snapshot_date']['S'], f"{snapshot_date}:1")
+        self.assertEqual(job_version, '2')
+        # The pointer alone decides the version: one GetItem and no query
+        mock_dynamodb_client.get_item.assert_called_once()
+        mock_dynamodb_client.query.assert_not_called()
+        args, kwargs = mock_dynamodb_client.get_item.call_args
+        self.assertEqual(kwargs['Key']['snapshot_date']['S'], f"{snapshot_date}#latest")
+        mock_dynamodb_client.update_item.assert_not_called()
+        mock_dynamodb_client.put_item.assert_not_called()
+        args, kwargs = mock_dynamodb_client.transact_write_items.call_args
+        pointer, put = kwargs['TransactItems'][0]['Update'], kwargs['TransactItems'][1]['Put']
+        self.assertEqual(pointer['Key']['snapshot_date']['S'], f"{snapshot_date}#latest")
+        self.assertEqual(pointer['ExpressionAttributeValues'][':expected'], {'N': '1'})
+        self.assertEqual(pointer['ExpressionAttributeValues'][':next'], {'N': '2'})
+        self.assertEqual(put['TableName'], self.table_name)
+        self.assertEqual(put['Item']['job_name']['S'], job_name)
+        self.assertEqual(put['Item']['snapshot_date']['S'], f"{snapshot_date}:2")
+        self.assertEqual(put['ConditionExpression'], "attribute_not_exists(snapshot_date)")
+
+    def test_insert_audit_record_retries_lost_race(self):
+        mock_dynamodb_client = MagicMock()
+        self.job_audit_table.dynamodb = mock_dynamodb_client
+        mock_dynamodb_client.get_item.side_effect = [{}, {'Item': {'latest_version': {'N': '1'}}}]
+        mock_dynamodb_client.query.return_value = {'Items': []}
+        lost = ClientError({
+            'Error': {'Code': 'TransactionCanceledException'},
+            'CancellationReasons': [{'Code': 'ConditionalCheckFailed'}, {'Code': 'None'}]
+        }, 'TransactWriteItems')
+        mock_dynamodb_client.transact_write_items.side_effect = [lost, {}]
 
-    @patch('boto3.resource')
-    def test_get_audit_record_by_version(self, mock_resource):
-        mock_dynamodb_resource = MagicMock()
-        mock_resource.return_value = mock_dynamodb_resource
+        self.assertEqual(self.job_audit_table.insert_audit_record("test_job", "2024-06-25"), '2')
+        self.assertEqual(mock_dynamodb_client.transact_write_items.call_count, 2)
 
-        mock_table = MagicMock()
-        mock_dynamodb_resource.Table.return_value = mock_table
+    def test_get_audit_record_by_version(self):
+        mock_dynamodb_client = MagicMock()
+        self.job_audit_table.dynamodb = mock_dynamodb_client
 
         job_name = "test_job"
         snapshot_date = "2024-06-25"
         version = "1"
 
-        mock_table.query.return_value = {
-            'Items': [{'job_name': job_name, 'snapshot_date': f"{snapshot_date}:{version}", 'run_start_tm': '2024-06-25T12:00:00Z'}]
+        mock_dynamodb_client.get_item.return_value = {
+            'Item': {'job_name': {'S': job_name}, 'snapshot_date': {'S': f"{snapshot_date}:{version}"}, 'run_start_tm': {'S': '2024-06-25T12:00:00Z'}}
         }
 
         record = self.job_audit_table.get_audit_record_by_version(job_name, snapshot_date, version)
@@ -54,19 +75,51 @@ class TestJobAuditTable(unittest.TestCase):
         self.assertEqual(record['job_name'], job_name)
         self.assertEqual(record['snapshot_date'], f"{snapshot_date}:{version}")
 
-    @patch('boto3.resource')
-    def test_get_audit_record(self, mock_resource):
-        mock_dynamodb_resource = MagicMock()
-        mock_resource.return_value = mock_dynamodb_resource
+    def test_get_latest_audit_record_reads_pointer(self):
+        mock_dynamodb_client = MagicMock()
+        self.job_audit_table.dynamodb = mock_dynamodb_client
+        mock_dynamodb_client.get_item.side_effect = [
+            {'Item': {'latest_version': {'N': '10'}}},
+            {'Item': {'job_name': {'S': 'test_job'}, 'snapshot_date': {'S': '2024-06-25:10'}}}
+        ]
+
+        record = self.job_audit_table.get_latest_audit_record("test_job", "2024-06-25")
+
+        self.assertEqual(record['snapshot_date'], '2024-06-25:10')
+        mock_dynamodb_client.query.assert_not_called()
+        keys = [kwargs['Key']['snapshot_date']['S'] for args, kwargs in mock_dynamodb_client.get_item.call_args_list]
+        self.assertEqual(keys, ['2024-06-25#latest', '2024-06-25:10'])
+        self.assertTrue(all(kwargs['ConsistentRead'] for args, kwargs in mock_dynamodb_client.get_item.call_args_list))
 
-        mock_table = MagicMock()
-        mock_dynamodb_resource.Table.return_value = mock_table
+    def test_get_latest_audit_record_without_pointer_queries(self):
+        mock_dynamodb_client = MagicMock()
+        self.job_audit_table.dynamodb = mock_dynamodb_client
+        mock_dynamodb_client.get_item.side_effect = [{}, {'Item': {'job_name': {'S': 'test_job'}, 'snapshot_date': {'S': '2024-06-25:10'}}}]
+        mock_dynamodb_client.query.return_value = {'Items': [
+            {'job_name': {'S': 'test_job'}, 'snapshot_date': {'S': '2024-06-25:1'}},
+            {'job_name': {'S': 'test_job'}, 'snapshot_date': {'S': '2024-06-25:10'}},
+            {'job_name': {'S': 'test_job'}, 'snapshot_date': {'S': '2024-06-25:9'}}
+        ]}
+
+        record = self.job_audit_table.get_latest_audit_record("test_job", "2024-06-25")
+
+        self.assertEqual(record['snapshot_date'], '2024-06-25:10')
+        mock_dynamodb_client.query.assert_called_once()
+        args, kwargs = mock_dynamodb_client.query.call_args
+        self.assertTrue(kwargs['ConsistentRead'])
+        self.assertEqual(kwargs['ProjectionExpression'], '#p0')
+        args, kwargs = mock_dynamodb_client.get_item.call_args
+        self.assertEqual(kwargs['Key']['snapshot_date']['S'], '2024-06-25:10')
+
+    def test_get_audit_record(self):
+        mock_dynamodb_client = MagicMock()
+        self.job_audit_table.dynamodb = mock_dynamodb_client
 
         job_name = "test_job"
         snapshot_date = "2024-06-25"
 
-        mock_table.query.return_value = {
-            'Items': [{'job_name': job_name, 'snapshot_date': f"{snapshot_date}:1", 'run_start_tm': '2024-06-25T12:00:00Z'}]
+        mock_dynamodb_client.query.return_value = {
+            'Items': [{'job_name': {'S': job_name}, 'snapshot_date': {'S': f"{snapshot_date}:1"}, 'run_start_tm': {'S': '2024-06-25T12:00:00Z'}}]
         }
 
         records = self.job_audit_table.get_audit_record(job_name, snapshot_date)
@@ -75,10 +128,9 @@ class TestJobAuditTable(unittest.TestCase):
         self.assertEqual(records[0]['job_name'], job_name)
         self.assertEqual(records[0]['snapshot_date'], f"{snapshot_date}:1")
 
-    @patch('boto3.client')
-    def test_update_audit_record(self, mock_client):
+    def test_update_audit_record(self):
         mock_dynamodb_client = MagicMock()
-        mock_client.return_value = mock_dynamodb_client
+        self.job_audit_table.dynamodb = mock_dynamodb_client
 
         job_name = "test_job"
         snapshot_date = "2024-06-25:1"
@@ -86,7 +138,7 @@ class TestJobAuditTable(unittest.TestCase):
         attribute_value = "completed"
 
         mock_dynamodb_client.update_item.return_value = {
-            'Attributes': {'job_status': attribute_value, 'run_end_tm': '2024-06-25T12:00:00Z'}
+            'Attributes': {'job_status': {'S': attribute_value}, 'run_end_tm': {'S': '2024-06-25T12:00:00Z'}}
         }
 
         updated_item = self.job_audit_table.update_audit_record(job_name, snapshot_date, attribute_name, attribute_value)
@@ -98,7 +150,444 @@ class TestJobAuditTable(unittest.TestCase):
         self.assertEqual(kwargs['TableName'], self.table_name)
         self.assertEqual(kwargs['Key']['job_name']['S'], job_name)
         self.assertEqual(kwargs['Key']['snapshot_date']['S'], snapshot_date)
-        self.assertEqual(kwargs['ExpressionAttributeValues'][':value']['S'], attribute_value)
+        self.assertEqual(kwargs['ExpressionAttributeNames'], {'#a0': attribute_name, '#a1': 'status_tm'})
+        self.assertEqual(kwargs['ExpressionAttributeValues'][':v0']['S'], attribute_value)
+
+    def test_update_audit_record_attributes(self):
+        mock_dynamodb_client = MagicMock()
+        self.job_audit_table.dynamodb = mock_dynamodb_client
+        mock_dynamodb_client.update_item.return_value = {
+            'Attributes': {'job_status': {'S': 'RUNNING'}, 'step_id': {'S': 's-123'}}
+        }
+
+        updated_item = self.job_audit_table.update_audit_record_attributes("test_job", "2024-06-25:1", {"job_status": "RUNNING", "step_id": "s-123"})
+
+        self.assertEqual(updated_item, {'job_status': 'RUNNING', 'step_id': 's-123'})
+        mock_dynamodb_client.update_item.assert_called_once()
+        args, kwargs = mock_dynamodb_client.update_item.call_args
+        self.assertEqual(kwargs['UpdateExpression'], 'SET #a0 = :v0, #a1 = :v1, #a2 = :v2')
+        self.assertEqual(kwargs['ExpressionAttributeNames']['#a2'], 'status_tm')
+
+    def test_update_audit_records_parallel(self):
+        mock_dynamodb_client = MagicMock()
+        mock_dynamodb_client.update_item.return_value = {'Attributes': {}}
+        self.job_audit_table.dynamodb = mock_dynamodb_client
+
+        self.job_audit_table.update_audit_records([
+            ("job1", "2024-06-25:1", {"job_status": "COMPLETED"}),
+            ("job2", "2024-06-25:1", {"job_status": "FAILED"}),
+            ("job1", "2024-06-25:1", {"step_id": "s-1"})
+        ])
+
+        mock_dynamodb_client.transact_write_items.assert_not_called()
+        self.assertEqual(mock_dynamodb_client.update_item.call_count, 2)
+        names = {
+            kwargs['Key']['job_name']['S']: set(kwargs['ExpressionAttributeNames'].values())
+            for args, kwargs in mock_dynamodb_client.update_item.call_args_list
+        }
+        self.assertEqual(names['job1'], {'job_status', 'step_id', 'status_tm'})
+
+    @patch('insert_update.time.sleep')
+    def test_update_audit_records_atomic_retries_conflict(self, mock_sleep):
+        mock_dynamodb_client = MagicMock()
+        self.job_audit_table.dynamodb = mock_dynamodb_client
+        conflict = ClientError({
+            'Error': {'Code': 'TransactionCanceledException'},
+            'CancellationReasons': [{'Code': 'None'}, {'Code': 'TransactionConflict'}]
+        }, 'TransactWriteItems')
+        mock_dynamodb_client.transact_write_items.side_effect = [conflict, {}]
+
+        self.job_audit_table.update_audit_records([
+            ("job1", "2024-06-25:1", {"job_status": "COMPLETED"}),
+            ("job2", "2024-06-25:1", {"job_status": "FAILED"})
+        ], atomic=True)
+
+        self.assertEqual(mock_dynamodb_client.transact_write_items.call_count, 2)
+        args, kwargs = mock_dynamodb_client.transact_write_items.call_args
+        self.assertEqual(len(kwargs['TransactItems']), 2)
+
+    @patch('insert_update.time.sleep')
+    def test_update_audit_records_atomic_without_reasons_not_retried(self, mock_sleep):
+        mock_dynamodb_client = MagicMock()
+        self.job_audit_table.dynamodb = mock_dynamodb_client
+        mock_dynamodb_client.transact_write_items.side_effect = ClientError({'Error': {'Code': 'TransactionCanceledException'}}, 'TransactWriteItems')
+
+        with self.assertRaises(ClientError):
+            self.job_audit_table.update_audit_records([("job1", "2024-06-25:1", {"job_status": "COMPLETED"})], atomic=True)
+
+        self.assertEqual(mock_dynamodb_client.transact_write_items.call_count, 1)
+        mock_sleep.assert_not_called()
+
+    @patch('insert_update.time.sleep')
+    def test_audit_write_batcher_retries_unprocessed(self, mock_sleep):
+        mock_dynamodb_client = MagicMock()
+        self.job_audit_table.dynamodb = mock_dynamodb_client
+        record = {"job_name": "job1", "snapshot_date": "2024-06-25:1", "job_status": "WAITING"}
+        mock_dynamodb_client.batch_write_item.side_effect = [
+            {'UnprocessedItems': {self.table_name: [{'PutRequest': {'Item': {'job_name': {'S': 'job1'}}}}]}},
+            {'UnprocessedItems': {}}
+        ]
+
+        with AuditWriteBatcher(self.job_audit_table) as batcher:
+            batcher.put(record)
+            batcher.put(record)
+
+        self.assertEqual(mock_dynamodb_client.batch_write_item.call_count, 2)
+        args, kwargs = mock_dynamodb_client.batch_write_item.call_args_list[0]
+        self.assertEqual(len(kwargs['RequestItems'][self.table_name]), 1)
+
+    @patch('insert_update.time.sleep')
+    def test_audit_write_batcher_keeps_unsent_records(self, mock_sleep):
+        mock_dynamodb_client = MagicMock()
+        self.job_audit_table.dynamodb = mock_dynamodb_client
+        unprocessed = {'UnprocessedItems': {self.table_name: [{'PutRequest': {'Item': {'job_name': {'S': 'job1'}}}}]}}
+        mock_dynamodb_client.batch_write_item.return_value = unprocessed
+        batcher = AuditWriteBatcher(self.job_audit_table, max_retries=1)
+
+        with self.assertRaises(RuntimeError):
+            with batcher:
+                batcher.put({"job_name": "job1", "snapshot_date": "2024-06-25:1", "job_status": "WAITING"})
+                raise RuntimeError("caller failed")
+
+        self.assertEqual(list(batcher.pending), [("job1", "2024-06-25:1")])
+        mock_dynamodb_client.batch_write_item.return_value = {'UnprocessedItems': {}}
+        batcher.flush()
+        self.assertEqual(batcher.pending, {})
+
+    def test_resolve_dependency_last_slot(self):
+        mock_dynamodb_client = MagicMock()
+        self.job_audit_table.dynamodb = mock_dynamodb_client
+        mock_dynamodb_client.update_item.return_value = {
+            'Attributes': {
+                'job_name': {'S': 'test_job'},
+                'snapshot_date': {'S': '2024-06-25:1'},
+                'job_status': {'S': 'DEPS_COMPLETE'},
+                'pending_dependencies': {'N': '0'},
+                'dependencies': {'M': {'dep1': {'M': {'runId': {'S': 'run1'}}}}}
+            }
+        }
+
+        record, applied = self.job_audit_table.resolve_dependency("test_job", "2024-06-25", "1", "dep1", {"runId": "run1"}, last=True)
+
+        self.assertTrue(applied)
+        self.assertEqual(record['job_status'], 'DEPS_COMPLETE')
+        mock_dynamodb_client.update_item.assert_called_once()
+        args, kwargs = mock_dynamodb_client.update_item.call_args
+        self.assertEqual(kwargs['Key']['snapshot_date']['S'], '2024-06-25:1')
+        self.assertEqual(kwargs['ExpressionAttributeNames'], {'#dep': 'dep1'})
+        self.assertIn('job_status = :complete', kwargs['UpdateExpression'])
+        self.assertEqual(kwargs['ReturnValues'], 'ALL_NEW')
+
+    def test_resolve_dependencies_projects_only_resolved_slot(self):
+        mock_dynamodb_client = MagicMock()
+        self.job_audit_table.dynamodb = mock_dynamodb_client
+        mock_dynamodb_client.get_item.side_effect = [
+            {'Item': {'latest_version': {'N': '1'}}},
+            {'Item': {
+                'snapshot_date': {'S': '2024-06-25:1'},
+                'job_status': {'S': 'WAITING'},
+                'pending_dependencies': {'N': '2'},
+                'dependencies': {'M': {'dep1': {'NULL': True}}}
+            }}
+        ]
+        mock_dynamodb_client.update_item.return_value = {
+            'Attributes': {
+                'snapshot_date': {'S': '2024-06-25:1'},
+                'job_status': {'S': 'WAITING'},
+                'pending_dependencies': {'N': '1'},
+                'dependencies': {'M': {'dep1': {'M': {'runId': {'S': 'run1'}}}, 'dep2': {'NULL': True}}}
+            }
+        }
+
+        record = self.job_audit_table.resolve_dependencies("test_job", "2024-06-25", {"dep1": {"runId": "run1"}, "dep2": None})
+
+        self.assertEqual(record['dependencies'], {'dep1': {'runId': 'run1'}, 'dep2': None})
+        mock_dynamodb_client.query.assert_not_called()
+        args, kwargs = mock_dynamodb_client.get_item.call_args
+        self.assertEqual(kwargs['ProjectionExpression'], '#p0, #p1, #p2, #p3.#p4')
+        self.assertEqual(kwargs['ExpressionAttributeNames']['#p3'], 'dependencies')
+        self.assertEqual(kwargs['ExpressionAttributeNames']['#p4'], 'dep1')
+        args, kwargs = mock_dynamodb_client.update_item.call_args
+        self.assertTrue(kwargs['UpdateExpression'].startswith('SET dependencies.#dep = :value'))
+
+    def test_resolve_dependencies_redelivery_reuses_launched_version(self):
+        mock_dynamodb_client = MagicMock()
+        self.job_audit_table.dynamodb = mock_dynamodb_client
+        latest = {
+            'job_name': {'S': 'test_job'},
+            'snapshot_date': {'S': '2024-06-25:1'},
+            'job_status': {'S': 'DEPS_COMPLETE'},
+            'pending_dependencies': {'N': '0'},
+            'dependencies': {'M': {'dep1': {'M': {'runId': {'S': 'run1'}}}, 'dep2': {'M': {'runId': {'S': 'run2'}}}}}
+        }
+        pointer = {'Item': {'latest_version': {'N': '1'}}}
+        mock_dynamodb_client.get_item.side_effect = [pointer, {'Item': latest}, {'Item': latest}, pointer, {'Item': latest}, {'Item': latest}]
+
+        record = self.job_audit_table.resolve_dependencies("test_job", "2024-06-25", {"dep1": {"runId": "run1"}, "dep2": None})
+
+        self.assertEqual(record['snapshot_date'], '2024-06-25:1')
+        mock_dynamodb_client.transact_write_items.assert_not_called()
+
+        # A new upstream run opens the next version
+        self.job_audit_table.resolve_dependencies("test_job", "2024-06-25", {"dep1": {"runId": "run3"}, "dep2": None})
+        args, kwargs = mock_dynamodb_client.transact_write_items.call_args
+        self.assertEqual(kwargs['TransactItems'][1]['Put']['Item']['snapshot_date']['S'], '2024-06-25:2')
+
+    def test_to_item_matches_type_serializer(self):
+        record = {
+            "job_name": "job1",
+            "pending_dependencies": 2,
+            "active": True,
+            "step_id": None,
+            "dependencies": {"dep1": {"runId": "run1", "attempts": [1, 2]}, "dep2": None},
+            "tags": {"a", "b"},
+            "ratio": Decimal("0.5")
+        }
+        serializer = TypeSerializer()
+
+        self.assertEqual(to_item(record), {name: serializer.serialize(value) for name, value in record.items()})
+        self.assertEqual(from_item(to_item(record)), record)
+        self.assertIsInstance(from_item({"n": {"N": "3"}})["n"], int)
+
+    def test_resolve_dependencies_creates_first_version(self):
+        mock_dynamodb_client = MagicMock()
+        self.job_audit_table.dynamodb = mock_dynamodb_client
+        mock_dynamodb_client.get_item.return_value = {}
+        mock_dynamodb_client.query.return_value = {'Items': []}
+
+        record = self.job_audit_table.resolve_dependencies("test_job", "2024-06-25", {"dep1": {"runId": "run1"}, "dep2": None})
+
+        self.assertEqual(record['snapshot_date'], '2024-06-25:1')
+        self.assertEqual(record['job_status'], 'WAITING')
+        self.assertEqual(record['pending_dependencies'], 1)
+        # The record and the version pointer are written in one transaction
+        mock_dynamodb_client.update_item.assert_not_called()
+        args, kwargs = mock_dynamodb_client.transact_write_items.call_args
+        pointer, put = kwargs['TransactItems'][0]['Update'], kwargs['TransactItems'][1]['Put']
+        self.assertEqual(pointer['Key']['snapshot_date']['S'], '2024-06-25#latest')
+        self.assertEqual(pointer['ExpressionAttributeValues'][':expected'], {'N': '0'})
+        self.assertEqual(put['ConditionExpression'], 'attribute_not_exists(snapshot_date)')
+        self.assertEqual(put['Item']['dependencies']['M']['dep2'], {'NULL': True})
+
+    def test_iter_audit_records_pages_with_projection(self):
+        mock_dynamodb_client = MagicMock()
+        self.job_audit_table.dynamodb = mock_dynamodb_client
+        mock_dynamodb_client.query.side_effect = [
+            {'Items': [{'snapshot_date': {'S': '2024-06-25:1'}}], 'LastEvaluatedKey': {'job_name': {'S': 'test_job'}, 'snapshot_date': {'S': '2024-06-25:1'}}},
+            {'Items': [{'snapshot_date': {'S': '2024-06-25:2'}}]}
+        ]
+
+        records = list(self.job_audit_table.iter_audit_records("test_job", "2024-06-25", attributes=["snapshot_date", "job_status"]))
+
+        self.assertEqual([record['snapshot_date'] for record in records], ['2024-06-25:1', '2024-06-25:2'])
+        self.assertEqual(mock_dynamodb_client.query.call_count, 2)
+        args, kwargs = mock_dynamodb_client.query.call_args
+        self.assertEqual(kwargs['ProjectionExpression'], '#p0, #p1')
+        self.assertEqual(kwargs['ExpressionAttributeNames'], {'#p0': 'snapshot_date', '#p1': 'job_status'})
+        self.assertEqual(kwargs['ExclusiveStartKey']['snapshot_date']['S'], '2024-06-25:1')
+
+    def test_scan_audit_records_segments(self):
+        mock_dynamodb_client = MagicMock()
+        self.job_audit_table.dynamodb = mock_dynamodb_client
+        mock_dynamodb_client.scan.side_effect = lambda **kwargs: {'Items': [{'job_name': {'S': f"job{kwargs['Segment']}"}}]}
+
+        records = list(self.job_audit_table.scan_audit_records(segments=3))
+
+        self.assertEqual(sorted(record['job_name'] for record in records), ['job0', 'job1', 'job2'])
+        self.assertEqual(mock_dynamodb_client.scan.call_count, 3)
+        args, kwargs = mock_dynamodb_client.scan.call_args
+        self.assertEqual(kwargs['FilterExpression'], 'attribute_not_exists(snapshot_day)')
+
+    def test_iter_audit_records_skips_pointers(self):
+        mock_dynamodb_client = MagicMock()
+        self.job_audit_table.dynamodb = mock_dynamodb_client
+        mock_dynamodb_client.query.return_value = {'Items': [{'snapshot_date': {'S': '2024-06-25:1'}}]}
+
+        list(self.job_audit_table.iter_audit_records("test_job"))
+        args, kwargs = mock_dynamodb_client.query.call_args
+        self.assertEqual(kwargs['FilterExpression'], 'attribute_not_exists(snapshot_day)')
+
+        list(self.job_audit_table.iter_audit_records("test_job", include_pointers=True))
+        args, kwargs = mock_dynamodb_client.query.call_args
+        self.assertNotIn('FilterExpression', kwargs)
+
+    def test_get_jobs_by_status_uses_index(self):
+        mock_dynamodb_client = MagicMock()
+        self.job_audit_table.dynamodb = mock_dynamodb_client
+        mock_dynamodb_client.query.return_value = {
+            'Items': [{'job_name': {'S': 'test_job'}, 'snapshot_date': {'S': '2024-06-25:1'}, 'job_status': {'S': 'WAITING'}}]
+        }
+
+        records = list(self.job_audit_table.get_jobs_by_status("WAITING", since="2024-06-24T00:00:00Z"))
+
+        self.assertEqual(records[0]['job_name'], 'test_job')
+        args, kwargs = mock_dynamodb_client.query.call_args
+        self.assertEqual(kwargs['IndexName'], 'StatusDateIndex')
+        self.assertEqual(kwargs['KeyConditionExpression'], 'job_status = :job_status AND status_tm >= :since')
+        mock_dynamodb_client.scan.assert_not_called()
+
+    def test_get_latest_versions(self):
+        mock_dynamodb_client = MagicMock()
+        self.job_audit_table.dynamodb = mock_dynamodb_client
+        mock_dynamodb_client.query.return_value = {
+            'Items': [
+                {'job_name': {'S': 'job1'}, 'snapshot_day': {'S': '2024-06-25'}, 'latest_version': {'N': '2'}},
+                {'job_name': {'S': 'job2'}, 'snapshot_day': {'S': '2024-06-25'}, 'latest_version': {'N': '1'}}
+            ]
+        }
+
+        self.assertEqual(self.job_audit_table.get_latest_versions("2024-06-25"), {'job1': 2, 'job2': 1})
+        args, kwargs = mock_dynamodb_client.query.call_args
+        self.assertEqual(kwargs['IndexName'], 'SnapshotLatestIndex')
+
+    @patch('insert_update.time.sleep')
+    def test_get_latest_records_backs_off_unprocessed_keys(self, mock_sleep):
+        mock_dynamodb_client = MagicMock()
+        self.job_audit_table.dynamodb = mock_dynamodb_client
+        mock_dynamodb_client.query.return_value = {'Items': [{'job_name': {'S': 'job1'}, 'latest_version': {'N': '2'}}]}
+        key = {'job_name': {'S': 'job1'}, 'snapshot_date': {'S': '2024-06-25:2'}}
+        mock_dynamodb_client.batch_get_item.return_value = {'Responses': {}, 'UnprocessedKeys': {self.table_name: {'Keys': [key]}}}
+
+        with self.assertRaises(RuntimeError):
+            self.job_audit_table.get_latest_records("2024-06-25")
+
+        self.assertEqual(mock_dynamodb_client.batch_get_item.call_count, 6)
+        self.assertEqual([args[0] for args, kwargs in mock_sleep.call_args_list], [0.05, 0.1, 0.2, 0.4, 0.8])
+
+    @patch('insert_update.boto3.client')
+    def test_tables_share_client(self, mock_client):
+        self.assertIs(JobAuditTable("other_table").dynamodb, self.job_audit_table.dynamodb)
+        self.assertLessEqual(mock_client.call_count, 1)
+
+    def test_operation_stats(self):
+        client = boto3.session.Session().client('dynamodb', region_name='us-east-1', aws_access_key_id='x', aws_secret_access_key='x')
+        metrics = InvocationMetrics(emit=lambda line: None)
+        metrics.instrument(client)
+        self.job_audit_table.dynamodb = client
+
+        with Stubber(client) as stubber:
+            for version in ("1", "2"):
+                expected = {
+                    'TableName': self.table_name,
+                    'Key': {'job_name': {'S': 'test_job'}, 'snapshot_date': {'S': f'2024-06-25:{version}'}},
+                    'ConsistentRead': True,
+                    'ReturnConsumedCapacity': 'TOTAL'
+                }
+                stubber.add_response('get_item', {'ConsumedCapacity': {'TableName': self.table_name, 'CapacityUnits': 0.5}}, expected)
+            self.job_audit_table.get_audit_record_by_version("test_job", "2024-06-25", "1")
+            self.job_audit_table.get_audit_record_by_version("test_job", "2024-06-25", "2")
+
+        stats = metrics.summary("dynamodb")['GetItem']
+        self.assertEqual(stats['calls'], 2)
+        self.assertEqual(stats['capacity_units'], 1.0)
+
+    def test_table_stats_without_instrumentation(self):
+        mock_dynamodb_client = MagicMock()
+        self.job_audit_table.dynamodb = mock_dynamodb_client
+        mock_dynamodb_client.get_item.return_value = {'ConsumedCapacity': {'CapacityUnits': 0.5}, 'ResponseMetadata': {'RetryAttempts': 2}}
+        mock_dynamodb_client.transact_write_items.side_effect = ClientError({'Error': {'Code': 'ValidationException'}}, 'TransactWriteItems')
+
+        self.job_audit_table.get_audit_record_by_version("test_job", "2024-06-25", "1")
+        with self.assertRaises(ClientError):
+            self.job_audit_table.create_version("test_job", "2024-06-25", 1, 0, {})
+
+        stats = self.job_audit_table.get_stats()
+        self.assertEqual({name: stats['get_item'][name] for name in ('calls', 'errors', 'retries', 'capacity_units')}, {'calls': 1, 'errors': 0, 'retries': 2, 'capacity_units': 0.5})
+        self.assertEqual((stats['transact_write_items']['calls'], stats['transact_write_items']['errors']), (1, 1))
+        self.job_audit_table.reset_stats()
+        self.assertEqual(self.job_audit_table.get_stats(), {})
+
+
+class TestAuditRecordBatch(unittest.TestCase):
+    def setUp(self):
+        self.items = [
+            {'job_name': {'S': 'view1'}, 'snapshot_date': {'S': '2024-06-25:1'}, 'job_status': {'S': 'FAILED'}},
+            {'job_name': {'S': 'view1'}, 'snapshot_date': {'S': '2024-06-25:2'}, 'job_status': {'S': 'COMPLETED'}, 'step_id': {'S': 's-123'}},
+            {'job_name': {'S': 'view2'}, 'snapshot_date': {'S': '2024-06-25:1'}, 'job_status': {'S': 'COMPLETED'}},
+            {
+                'job_name': {'S': 'view3'}, 'snapshot_date': {'S': '2024-06-25:1'}, 'job_status': {'S': 'WAITING'},
+                'status_tm': {'S': '2024-06-25T01:00:00Z'}, 'description': {'S': 'waiting on dep2'},
+                'pending_dependencies': {'N': '1'},
+                'dependencies': {'M': {'dep1': {'M': {'runId': {'S': 'run1'}}}, 'dep2': {'NULL': True}}},
+                'run_start_tm': {'S': '2024-06-25T00:00:00Z'}
+            }
+        ]
+        self.batch = AuditRecordBatch.from_dynamodb_items(self.items)
+
+    def test_round_trip(self):
+        self.assertEqual(len(self.batch), 4)
+        self.assertEqual(list(self.batch.to_dynamodb_items()), self.items)
+        self.assertEqual(self.batch[1].to_dynamodb_item(), self.items[1])
+        self.assertEqual(self.batch[3].to_dynamodb_item(), self.items[3])
+        self.assertEqual(self.batch[3].dependencies, {'dep1': {'runId': 'run1'}, 'dep2': None})
+
+    def test_encoded_columns(self):
+        record = self.batch[1]
+        self.assertEqual(record.snapshot_date, 20240625)
+        self.assertEqual(record.version, 2)
+        self.assertEqual(self.batch.job_names, ['view1', 'view2', 'view3'])
+
+    def test_aggregations(self):
+        self.assertEqual(self.batch.count_by_status(), {'FAILED': 1, 'COMPLETED': 2, 'WAITING': 1})
+        self.assertEqual(self.batch.latest_versions(), {('view1', '2024-06-25'): 2, ('view2', '2024-06-25'): 1, ('view3', '2024-06-25'): 1})
+
+
+@mock_aws
+class TestLegacyVersionKeys(unittest.TestCase):
+    # Rows the earlier Lambda wrote: "<date>: <version>" keys and dependencies as a JSON string
+    def setUp(self):
+        self.dynamodb = boto3.client('dynamodb', region_name='us-east-1')
+        self.dynamodb.create_table(TableName='audit', **AUDIT_TABLE_DEFINITION)
+        self.job_audit_table = JobAuditTable('audit', self.dynamodb)
+
+    def put_legacy(self, job_name, version, job_status, dependencies):
+        self.dynamodb.put_item(TableName='audit', Item=to_item({
+            'job_name': job_name,
+            'snapshot_date': f'2024-06-25: {version}',
+            'job_status': job_status,
+            'dependencies': json.dumps(dependencies)
+        }))
+
+    def keys(self, job_name):
+        response = self.dynamodb.query(
+            TableName='audit', KeyConditionExpression='job_name = :job_name',
+            ExpressionAttributeValues={':job_name': {'S': job_name}}
+        )
+        return sorted(item['snapshot_date']['S'] for item in response['Items'])
+
+    def test_insert_continues_after_legacy_versions(self):
+        self.put_legacy('job1', 1, 'FAILED', {'active': True, 'dep1': {'runId': 'run1'}})
+        self.put_legacy('job1', 2, 'COMPLETED', {'active': True, 'dep1': {'runId': 'run2'}})
+
+        self.assertEqual(self.job_audit_table.insert_audit_record('job1', '2024-06-25'), '3')
+        self.assertEqual(self.job_audit_table.insert_audit_record('job1', '2024-06-25'), '4')
+
+    def test_resolve_dependencies_moves_legacy_waiting_record(self):
+        self.put_legacy('job1', 2, 'WAITING', {'active': True, 'dep1': None, 'dep2': {'runId': 'run2'}})
+
+        record = self.job_audit_table.resolve_dependencies('job1', '2024-06-25', {'dep1': {'runId': 'run1'}, 'dep2': None})
+
+        self.assertEqual(record['snapshot_date'], '2024-06-25:2')
+        self.assertEqual(record['job_status'], 'DEPS_COMPLETE')
+        self.assertEqual(record['dependencies'], {'dep1': {'runId': 'run1'}, 'dep2': {'runId': 'run2'}})
+        self.assertEqual(self.keys('job1'), ['2024-06-25#latest', '2024-06-25:2'])
+
+    def test_migrate_legacy_records(self):
+        self.put_legacy('job1', 1, 'COMPLETED', {'active': True, 'dep1': {'runId': 'run1'}})
+        self.put_legacy('job1', 2, 'WAITING', {'active': True, 'dep1': None})
+        self.job_audit_table.insert_audit_record('job2', '2024-06-25')
+
+        self.assertEqual(self.job_audit_table.migrate_legacy_records(), 2)
+        self.assertEqual(self.job_audit_table.migrate_legacy_records(), 0)
+
+        self.assertEqual(self.keys('job1'), ['2024-06-25#latest', '2024-06-25:1', '2024-06-25:2'])
+        self.assertEqual(self.keys('job2'), ['2024-06-25#latest', '2024-06-25:1'])
+        latest = self.job_audit_table.get_latest_audit_record('job1', '2024-06-25')
+        self.assertEqual(latest['snapshot_date'], '2024-06-25:2')
+        self.assertEqual(latest['dependencies'], {'dep1': None})
+        self.assertEqual(latest['pending_dependencies'], 1)
+        self.assertEqual(self.job_audit_table.insert_audit_record('job1', '2024-06-25'), '3')
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,131 @@
+import unittest
+from unittest.mock import MagicMock, patch
+
+from botocore.exceptions import ClientError
+
+from glue_catalog_sync import add_partition_statements, sync_partitions
+
+
+def glue_client_with(existing):
+    glue_client = MagicMock()
+    glue_client.get_table.return_value = {
+        'Table': {
+            'PartitionKeys': [{'Name': 'snapshot_date', 'Type': 'string'}, {'Name': 'region', 'Type': 'string'}],
+            'StorageDescriptor': {
+                'Columns': [{'Name': 'id', 'Type': 'bigint'}],
+                'InputFormat': 'org.apache.hadoop.hive.ql.io.parquet.MapredParquetInputFormat',
+                'SerdeInfo': {'SerializationLibrary': 'org.apache.hadoop.hive.ql.io.parquet.serde.ParquetHiveSerDe'},
+                'Location': 's3://refined/orders'
+            }
+        }
+    }
+    glue_client.get_paginator.return_value.paginate.return_value = [{'Partitions': [
+        {'Values': list(values), 'StorageDescriptor': {'Location': location}} for values, location in existing.items()
+    ]}]
+    glue_client.batch_create_partition.return_value = {}
+    glue_client.batch_update_partition.return_value = {}
+    return glue_client
+
+
+def location(region):
+    return f's3://refined/orders/snapshot_date=2024-06-27/region={region}'
+
+
+class TestSyncPartitions(unittest.TestCase):
+    def test_only_new_and_moved_partitions_are_sent(self):
+        glue_client = glue_client_with({
+            ('2024-06-27', 'r0'): location('r0') + '/',
+            ('2024-06-27', 'r1'): 's3://refined/old/r1'
+        })
+        partitions = [({'snapshot_date': '2024-06-27', 'region': f'r{i}'}, location(f'r{i}')) for i in range(250)]
+
+        summary = sync_partitions(glue_client, 'glue_db', 'orders', partitions, expression="snapshot_date = '2024-06-27'")
+
+        self.assertEqual(summary, {'created': 248, 'updated': 1, 'unchanged': 1, 'failed': [], 'athena_queries': 0})
+        sizes = sorted(len(call.kwargs['PartitionInputList']) for call in glue_client.batch_create_partition.call_args_list)
+        self.assertEqual(sizes, [48, 100, 100])
+        entry = glue_client.batch_update_partition.call_args.kwargs['Entries'][0]
+        self.assertEqual(entry['PartitionValueList'], ['2024-06-27', 'r1'])
+        self.assertEqual(entry['PartitionInput']['StorageDescriptor']['Location'], location('r1'))
+        self.assertEqual(entry['PartitionInput']['StorageDescriptor']['SerdeInfo']['SerializationLibrary'], 'org.apache.hadoop.hive.ql.io.parquet.serde.ParquetHiveSerDe')
+        glue_client.get_paginator.return_value.paginate.assert_called_once_with(
+            DatabaseName='glue_db', TableName='orders', ExcludeColumnSchema=True, Expression="snapshot_date = '2024-06-27'"
+        )
+
+    def test_nothing_to_do_makes_no_writes(self):
+        glue_client = glue_client_with({('2024-06-27', 'r0'): location('r0')})
+
+        summary = sync_partitions(glue_client, 'glue_db', 'orders', [(('2024-06-27', 'r0'), location('r0'))])
+
+        self.assertEqual(summary['unchanged'], 1)
+        glue_client.batch_create_partition.assert_not_called()
+        glue_client.batch_update_partition.assert_not_called()
+
+    def test_concurrent_registration_is_not_a_failure(self):
+        glue_client = glue_client_with({})
+        glue_client.batch_create_partition.return_value = {'Errors': [
+            {'PartitionValues': ['2024-06-27', 'r0'], 'ErrorDetail': {'ErrorCode': 'AlreadyExistsException'}},
+            {'PartitionValues': ['2024-06-27', 'r1'], 'ErrorDetail': {'ErrorCode': 'InternalServiceException'}}
+        ]}
+
+        summary = sync_partitions(glue_client, 'glue_db', 'orders', [(('2024-06-27', f'r{i}'), location(f'r{i}')) for i in range(2)])
+
+        self.assertEqual(summary['created'], 1)
+        self.assertEqual(summary['failed'], [(('2024-06-27', 'r1'), 'InternalServiceException')])
+
+    @patch('glue_catalog_sync.run_queries')
+    def test_falls_back_to_athena_when_glue_denies_writes(self, mock_run_queries):
+        glue_client = glue_client_with({})
+        glue_client.batch_create_partition.side_effect = ClientError({'Error': {'Code': 'AccessDeniedException', 'Message': 'denied'}}, 'BatchCreatePartition')
+        mock_run_queries.return_value = [{'state': 'SUCCEEDED'}]
+
+        summary = sync_partitions(glue_client, 'glue_db', 'orders', [(('2024-06-27', 'r0'), location('r0'))], athena_workgroup='workgroup')
+
+        self.assertEqual(summary['created'], 1)
+        self.assertEqual(summary['athena_queries'], 1)
+        statements, database, workgroup = mock_run_queries.call_args.args
+        self.assertEqual(statements, [f"ALTER TABLE orders ADD IF NOT EXISTS PARTITION (snapshot_date = '2024-06-27', region = 'r0') LOCATION '{location('r0')}'"])
+        self.assertEqual((database, workgroup), ('glue_db', 'workgroup'))
+
+    @patch('glue_catalog_sync.run_queries')
+    def test_only_denied_batches_fall_back(self, mock_run_queries):
+        glue_client = glue_client_with({('2024-06-27', 'moved'): 's3://refined/old/moved'})
+
+        def create(PartitionInputList, **kwargs):
+            if PartitionInputList[0]['Values'] == ['2024-06-27', 'r0']:
+                raise ClientError({'Error': {'Code': 'AccessDeniedException', 'Message': 'denied'}}, 'BatchCreatePartition')
+            return {}
+
+        glue_client.batch_create_partition.side_effect = create
+        mock_run_queries.return_value = [{'state': 'FAILED'}]
+        partitions = [({'snapshot_date': '2024-06-27', 'region': f'r{i}'}, location(f'r{i}')) for i in range(150)]
+        partitions.append(({'snapshot_date': '2024-06-27', 'region': 'moved'}, location('moved')))
+
+        summary = sync_partitions(glue_client, 'glue_db', 'orders', partitions, athena_workgroup='workgroup')
+
+        # Only the denied batch of 100 went to Athena; the other 50 and the update stand
+        statements = mock_run_queries.call_args.args[0]
+        self.assertEqual(len(statements), 1)
+        self.assertEqual(statements[0].count('PARTITION ('), 100)
+        self.assertEqual(summary['created'], 50)
+        self.assertEqual(summary['updated'], 1)
+        self.assertEqual(len(summary['failed']), 100)
+
+    def test_access_denied_without_workgroup_raises(self):
+        glue_client = glue_client_with({})
+        glue_client.batch_create_partition.side_effect = ClientError({'Error': {'Code': 'AccessDeniedException', 'Message': 'denied'}}, 'BatchCreatePartition')
+
+        with self.assertRaises(ClientError):
+            sync_partitions(glue_client, 'glue_db', 'orders', [(('2024-06-27', 'r0'), location('r0'))])
+
+    def test_statements_group_partitions(self):
+        partitions = {('2024-06-27', f'r{i}'): location(f'r{i}') for i in range(3)}
+
+        statements = add_partition_statements('orders', ['snapshot_date', 'region'], partitions, per_statement=2)
+
+        self.assertEqual(len(statements), 2)
+        self.assertEqual(statements[0].count('PARTITION ('), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
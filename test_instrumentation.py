@@ -0,0 +1,85 @@
+import json
+import threading
+import unittest
+from unittest.mock import MagicMock
+
+from instrumentation import InvocationMetrics, capacity_units
+
+
+def operation_model(service_name, operation_name):
+    model = MagicMock()
+    model.service_model.service_name = service_name
+    model.name = operation_name
+    return model
+
+
+class TestInvocationMetrics(unittest.TestCase):
+    def setUp(self):
+        self.lines = []
+        self.metrics = InvocationMetrics(emit=self.lines.append)
+        self.metrics.start("invoke_step_function")
+
+    def call(self, service_name, operation_name, parsed=None):
+        context = {}
+        self.metrics.before_call(context=context)
+        self.metrics.after_call(operation_model(service_name, operation_name), parsed=parsed or {}, context=context)
+
+    def test_flush_emits_emf_per_operation(self):
+        self.call("dynamodb", "UpdateItem", {"ConsumedCapacity": {"CapacityUnits": 1.0}, "ResponseMetadata": {"RetryAttempts": 2}})
+        self.call("dynamodb", "UpdateItem", {"ConsumedCapacity": {"CapacityUnits": 1.0}})
+        self.call("stepfunctions", "StartExecution", {"Error": {"Code": "ExecutionAlreadyExists"}})
+
+        self.assertEqual(self.metrics.flush(), 2)
+
+        lines = {line["Operation"]: line for line in map(json.loads, self.lines)}
+        update = lines["UpdateItem"]
+        self.assertEqual(update["Branch"], "invoke_step_function")
+        self.assertEqual(update["ApiCalls"], 2)
+        self.assertEqual(update["ApiRetries"], 2)
+        self.assertEqual(update["ConsumedCapacity"], 2.0)
+        self.assertEqual(sum(update["ApiLatency"]["Counts"]), 2)
+        self.assertEqual(update["_aws"]["CloudWatchMetrics"][0]["Namespace"], "ViewOrchestration")
+        self.assertEqual(lines["StartExecution"]["ApiErrors"], 1)
+        # Flushing resets the invocation
+        self.assertEqual(self.metrics.flush(), 0)
+
+    def test_attribution_is_per_thread(self):
+        def worker(job_name):
+            with self.metrics.attribute(job_name, "2024-06-27"):
+                self.call("dynamodb", "GetItem")
+
+        with self.metrics.attribute("upstream", "2024-06-27"):
+            threads = [threading.Thread(target=worker, args=(f"job{i}",)) for i in range(3)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            self.call("s3", "GetObject")
+        self.call("emr", "ListSteps")
+
+        self.metrics.flush()
+
+        jobs = sorted((line["job_name"] or "", line["Operation"]) for line in map(json.loads, self.lines))
+        self.assertEqual(jobs, [("", "ListSteps"), ("job0", "GetItem"), ("job1", "GetItem"), ("job2", "GetItem"), ("upstream", "GetObject")])
+
+    def test_summary_sums_over_branches_and_jobs(self):
+        with self.metrics.attribute("job1", "2024-06-27"):
+            self.call("dynamodb", "GetItem", {"ConsumedCapacity": {"CapacityUnits": 0.5}})
+        self.call("dynamodb", "GetItem", {"ConsumedCapacity": {"CapacityUnits": 0.5}, "Error": {"Code": "ThrottlingException"}})
+        self.call("s3", "GetObject")
+
+        summary = self.metrics.summary("dynamodb")
+
+        self.assertEqual(list(summary), ["GetItem"])
+        self.assertEqual(summary["GetItem"]["calls"], 2)
+        self.assertEqual(summary["GetItem"]["errors"], 1)
+        self.assertEqual(summary["GetItem"]["capacity_units"], 1.0)
+        self.assertEqual(set(self.metrics.summary()), {"GetItem", "GetObject"})
+
+    def test_capacity_units_accepts_batch_responses(self):
+        self.assertEqual(capacity_units([{"CapacityUnits": 2.0}, {"CapacityUnits": 0.5}]), 2.5)
+        self.assertEqual(capacity_units(None), 0.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,118 @@
+import unittest
+from unittest.mock import patch, MagicMock
+import json
+import shutil
+import tempfile
+from botocore.exceptions import ClientError
+from job_config import JobConfigs3, JobConfigStore, ConfigSnapshot
+
+class TestJobConfigs3(unittest.TestCase):
+    @patch('boto3.resource')
+    def setUp(self, mock_s3_resource):
+        # Mock S3 Object and its data
+        self.mock_s3_resource = mock_s3_resource
+        self.mock_s3_object = MagicMock()
+        self.mock_s3_resource.return_value.Object.return_value = self.mock_s3_object
+        
+        # Mock content
+        self.mock_content = {
+            "job1": {"job_dependencies": ["dep1"], "active": True},
+            "job2": {"job_dependencies": ["dep2"], "active": False},
+            "job3": {"job_dependencies": ["dep1", "dep3"], "active": True}
+        }
+        self.mock_s3_object.get.return_value = {
+            'Body': MagicMock(read=MagicMock(return_value=json.dumps(self.mock_content).encode('utf-8')))
+        }
+        
+        self.bucket = 'test-bucket'
+        self.key = 'test-key'
+        self.job_configs = JobConfigs3(self.bucket, self.key)
+
+    def test_get_jobs_by_dependency(self):
+        result = self.job_configs.getJobsByDependency('dep1')
+        expected = ['job1', 'job3']
+        self.assertEqual(result, expected)
+
+    def test_get_jobs_by_dependency_no_dependents(self):
+        result = self.job_configs.getJobsByDependency('job3')
+        self.assertEqual(result, [])
+
+    def test_get_dependencies_by_job_active(self):
+        result = self.job_configs.getDependenciesByJob('job1')
+        expected = ['dep1']
+        self.assertEqual(result, expected)
+
+    def test_get_dependencies_by_job_inactive(self):
+        result = self.job_configs.getDependenciesByJob('job2')
+        expected = []
+        self.assertEqual(result, expected)
+
+    def test_get_dependencies_by_job_non_existent(self):
+        result = self.job_configs.getDependenciesByJob('non_existent_job')
+        self.assertEqual(result, [])
+
+    def test_config_tables_are_read_only(self):
+        with self.assertRaises(TypeError):
+            self.job_configs.dependents['dep1'] = ('job2',)
+
+    def test_cyclic_config_rejected(self):
+        with self.assertRaises(ValueError):
+            ConfigSnapshot({"job1": {"job_dependencies": ["job2"], "active": True}, "job2": {"job_dependencies": ["job1"], "active": True}})
+
+    def test_invalid_dependencies_rejected(self):
+        with self.assertRaises(ValueError):
+            ConfigSnapshot({"job1": {"job_dependencies": "dep1", "active": True}})
+
+
+class TestJobConfigStore(unittest.TestCase):
+    def setUp(self):
+        self.s3_client = MagicMock()
+        self.content = {"job1": {"job_dependencies": ["dep1"], "active": True}}
+        self.s3_client.get_object.return_value = self.response(self.content, '"etag-1"')
+        self.cache_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.cache_dir)
+
+    def response(self, content, etag):
+        return {'Body': MagicMock(read=MagicMock(return_value=json.dumps(content).encode('utf-8'))), 'ETag': etag}
+
+    def not_modified(self):
+        return ClientError({'Error': {'Code': '304', 'Message': 'Not Modified'}}, 'GetObject')
+
+    def test_get_serves_from_memory_within_ttl(self):
+        store = JobConfigStore('test-bucket', 'test-key', ttl=300, s3_client=self.s3_client)
+
+        self.assertIs(store.get(), store.get())
+        self.s3_client.get_object.assert_called_once_with(Bucket='test-bucket', Key='test-key')
+        self.assertEqual(store.stats, {"hits": 1, "misses": 1, "revalidations": 0})
+
+    def test_expired_snapshot_revalidated_with_etag(self):
+        store = JobConfigStore('test-bucket', 'test-key', ttl=0, s3_client=self.s3_client)
+        snapshot = store.get()
+        self.s3_client.get_object.side_effect = self.not_modified()
+
+        self.assertIs(store.get(), snapshot)
+        self.s3_client.get_object.assert_called_with(Bucket='test-bucket', Key='test-key', IfNoneMatch='"etag-1"')
+        self.assertEqual(store.stats["revalidations"], 1)
+
+    def test_changed_config_replaces_snapshot(self):
+        store = JobConfigStore('test-bucket', 'test-key', ttl=0, s3_client=self.s3_client)
+        store.get()
+        self.s3_client.get_object.return_value = self.response({"job2": {"job_dependencies": ["dep1"], "active": True}}, '"etag-2"')
+
+        snapshot = store.get()
+
+        self.assertEqual(snapshot.etag, '"etag-2"')
+        self.assertEqual(snapshot.getJobsByDependency('dep1'), ['job2'])
+
+    def test_new_store_starts_from_cache_dir(self):
+        JobConfigStore('test-bucket', 'test-key', cache_dir=self.cache_dir, s3_client=self.s3_client).get()
+        self.s3_client.get_object.side_effect = self.not_modified()
+
+        snapshot = JobConfigStore('test-bucket', 'test-key', cache_dir=self.cache_dir, s3_client=self.s3_client).get()
+
+        self.assertEqual(snapshot.getDependenciesByJob('job1'), ['dep1'])
+        self.s3_client.get_object.assert_called_with(Bucket='test-bucket', Key='test-key', IfNoneMatch='"etag-1"')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,37 @@
+import unittest
+
+from job_graph import JobGraph
+
+
+class TestJobGraph(unittest.TestCase):
+
+    def setUp(self):
+        self.graph = JobGraph({
+            "view1": ["dataset1"],
+            "view2": ["dataset1", "dataset2"],
+            "view3": ["view1", "view2"],
+        })
+
+    def test_dependents(self):
+        self.assertEqual(self.graph.get_dependents("dataset1"), ["view1", "view2"])
+        self.assertEqual(self.graph.get_dependents("view3"), [])
+        self.assertEqual(self.graph.get_dependents("missing"), [])
+
+    def test_dependencies(self):
+        self.assertEqual(self.graph.get_dependencies("view2"), ["dataset1", "dataset2"])
+        self.assertEqual(self.graph.get_dependencies("missing"), [])
+
+    def test_descendants(self):
+        self.assertEqual(self.graph.get_descendants("dataset2"), {"view2", "view3"})
+        self.assertEqual(self.graph.get_descendants("view3"), frozenset())
+
+    def test_topological_order(self):
+        self.assertEqual(self.graph.order[-1], "view3")
+
+    def test_cycle(self):
+        with self.assertRaises(ValueError):
+            JobGraph({"view1": ["view2"], "view2": ["view1"]})
+
+
+if __name__ == '__main__':
+    unittest.main()
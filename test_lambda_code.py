@@ -0,0 +1,311 @@
+import io
+import json
+import os
+import unittest
+from unittest.mock import MagicMock, patch
+
+import boto3
+from botocore.exceptions import ClientError
+from botocore.response import StreamingBody
+from botocore.stub import Stubber
+from moto import mock_aws
+
+from insert_update import AUDIT_TABLE_DEFINITION, JobAuditTable
+from lambda_package import load_lambda_module
+
+os.environ.setdefault("AWS_DEFAULT_REGION", "us-east-1")
+lambda_code = load_lambda_module()
+MODULE = "lambda_pkg.lambda_code"
+
+
+def sqs_record(message_id, dataset_name, snapshot_date="2024-06-27", edp_run_id="123", refined_dataset_path="path", encode_message=False):
+    message = {"task_configuration": {
+        "job_params": {"output_datasets": [dataset_name], "job_params": {"edp_run_id": edp_run_id}},
+        "parsed_datasets": [{"refined_dataset_path": refined_dataset_path}],
+        "job_info": {"SNAPSHOT_DATE": snapshot_date}
+    }}
+    return {"messageId": message_id, "body": json.dumps({"Message": json.dumps(message) if encode_message else message})}
+
+
+class TestProcessRecords(unittest.TestCase):
+    def setUp(self):
+        lambda_code.api_metrics.emit = lambda line: None
+
+    @patch(f'{MODULE}.get_dependencies_from_dynamo')
+    @patch(f'{MODULE}.get_dependency_slots')
+    def test_job_disabled(self, mock_get_dependency_slots, mock_get_dependencies_from_dynamo):
+        mock_get_dependency_slots.return_value = {'job1': {}}
+        mock_get_dependencies_from_dynamo.return_value = {'job_status': 'DISABLED', 'dependencies': {}, 'job_version': '1', 'active': False}
+
+        result = lambda_code.execute({'Records': [sqs_record('m1', 'dataset1')]}, None)
+
+        self.assertEqual(result['batchItemFailures'], [])
+        self.assertEqual(result['results']['dataset1:2024-06-27']['launched'], [])
+        self.assertEqual(result['results']['dataset1:2024-06-27']['jobs']['job1']['action'], 'disabled')
+
+    @patch(f'{MODULE}.invoke_step_function')
+    @patch(f'{MODULE}.get_dependencies_from_dynamo')
+    @patch(f'{MODULE}.get_dependency_slots')
+    def test_deps_complete(self, mock_get_dependency_slots, mock_get_dependencies_from_dynamo, mock_invoke_step_function):
+        mock_get_dependency_slots.return_value = {'job1': {'dataset1': {'runId': '123', 's3Path': 'path'}}}
+        mock_get_dependencies_from_dynamo.return_value = {'job_status': 'DEPS_COMPLETE', 'dependencies': {'dataset1': {'runId': '123', 's3Path': 'path'}}, 'job_version': '1', 'active': True}
+
+        result = lambda_code.execute({'Records': [sqs_record('m1', 'dataset1')]}, None)
+
+        self.assertEqual(result['batchItemFailures'], [])
+        self.assertEqual(result['results']['dataset1:2024-06-27']['launched'], ['job1'])
+        mock_get_dependency_slots.assert_called_once_with('dataset1', '123', 'path')
+        sf_input = json.loads(mock_invoke_step_function.call_args[0][1])
+        self.assertEqual(sf_input['next_step'], 'emr_job')
+        self.assertEqual(sf_input['job_version'], '1')
+
+    @patch(f'{MODULE}.launch_dependent_jobs')
+    def test_dedupes_redeliveries(self, mock_launch_dependent_jobs):
+        # The same upstream run delivered twice in one batch, once with a JSON-encoded Message
+        mock_launch_dependent_jobs.return_value = {"status": 200, "launched": []}
+
+        result = lambda_code.execute({'Records': [sqs_record('m1', 'dataset1'), sqs_record('m2', 'dataset1', encode_message=True)]}, None)
+
+        self.assertEqual(result['batchItemFailures'], [])
+        mock_launch_dependent_jobs.assert_called_once_with('dataset1', '2024-06-27', '123', 'path')
+
+    @patch(f'{MODULE}.launch_dependent_jobs')
+    def test_partial_failure(self, mock_launch_dependent_jobs):
+        # One record fails and one cannot be decoded; only those are retried
+        def launch(dataset_name, snapshot_date, edp_run_id, refined_dataset_path):
+            if dataset_name == 'dataset2':
+                raise Exception("Throttled")
+            return {"status": 200, "launched": []}
+
+        mock_launch_dependent_jobs.side_effect = launch
+        records = [sqs_record('m1', 'dataset1'), sqs_record('m2', 'dataset2'), {'messageId': 'm3', 'body': 'not json'}]
+
+        result = lambda_code.execute({'Records': records}, None)
+
+        self.assertEqual(sorted(f['itemIdentifier'] for f in result['batchItemFailures']), ['m2', 'm3'])
+        self.assertIn('dataset1:2024-06-27', result['results'])
+
+    @patch(f'{MODULE}.invoke_step_function')
+    @patch(f'{MODULE}.get_dependencies_from_dynamo')
+    @patch(f'{MODULE}.get_dependency_slots')
+    def test_fans_out_all_dependents(self, mock_get_dependency_slots, mock_get_dependencies_from_dynamo, mock_invoke_step_function):
+        # One dependent is still waiting and one fails; the rest are still launched
+        def resolve(job_name, snapshot_date, audit_table, dep_dict):
+            if job_name == 'job2':
+                return {'job_status': 'WAITING', 'dependencies': {'dataset1': {'runId': '123'}, 'dataset2': None}, 'job_version': '1', 'active': True}
+            if job_name == 'job3':
+                raise Exception("Throttled")
+            return {'job_status': 'DEPS_COMPLETE', 'dependencies': {'dataset1': {'runId': '123'}}, 'job_version': '1', 'active': True}
+
+        mock_get_dependency_slots.return_value = {name: {'dataset1': {'runId': '123'}} for name in ('job1', 'job2', 'job3', 'job4')}
+        mock_get_dependencies_from_dynamo.side_effect = resolve
+
+        result = lambda_code.execute({'Records': [sqs_record('m1', 'dataset1')]}, None)
+
+        report = result['results']['dataset1:2024-06-27']
+        self.assertEqual(sorted(report['launched']), ['job1', 'job4'])
+        self.assertEqual(report['failed'], ['job3'])
+        self.assertEqual(report['jobs']['job2']['pending'], ['dataset2'])
+        self.assertEqual(mock_invoke_step_function.call_count, 2)
+        self.assertEqual(result['batchItemFailures'], [{'itemIdentifier': 'm1'}])
+
+
+@mock_aws
+class TestRedelivery(unittest.TestCase):
+    def setUp(self):
+        lambda_code.api_metrics.emit = lambda line: None
+        dynamodb = boto3.client('dynamodb', region_name='us-east-1')
+        dynamodb.create_table(TableName='audit', **AUDIT_TABLE_DEFINITION)
+        self.audit_table = JobAuditTable('audit', dynamodb)
+
+    @patch(f'{MODULE}.invoke_step_function')
+    @patch(f'{MODULE}.get_dependency_slots')
+    def test_handler_twice_on_same_record(self, mock_get_dependency_slots, mock_invoke_step_function):
+        # job2 fails to launch, so the message is redelivered; job1 must not get a second version
+        mock_get_dependency_slots.return_value = {name: {'dataset1': {'runId': '123', 's3Path': 'path'}} for name in ('job1', 'job2')}
+        launches = []
+        throttled = ['job2']
+
+        def invoke(arn, sf_input):
+            sf_input = json.loads(sf_input)
+            launches.append((sf_input['job_name'], sf_input['job_version']))
+            if sf_input['job_name'] in throttled:
+                throttled.remove(sf_input['job_name'])
+                raise Exception("Throttled")
+            return {"executionArn": f"arn:{sf_input['job_name']}:{sf_input['job_version']}"}
+
+        mock_invoke_step_function.side_effect = invoke
+        with patch(f'{MODULE}.job_audit_table', self.audit_table):
+            first = lambda_code.execute({'Records': [sqs_record('m1', 'dataset1')]}, None)
+            second = lambda_code.execute({'Records': [sqs_record('m1', 'dataset1')]}, None)
+
+        self.assertEqual(first['batchItemFailures'], [{'itemIdentifier': 'm1'}])
+        self.assertEqual(second['batchItemFailures'], [])
+        self.assertEqual({version for job_name, version in launches}, {'1'})
+        for job_name in ('job1', 'job2'):
+            self.assertEqual(self.audit_table.get_latest_versions('2024-06-27')[job_name], 1)
+
+    @patch(f'{MODULE}.invoke_step_function')
+    @patch(f'{MODULE}.get_dependency_slots')
+    def test_redelivery_skips_started_executions(self, mock_get_dependency_slots, mock_invoke_step_function):
+        # Step Functions refuses a second execution with the same name once the first has closed
+        mock_get_dependency_slots.return_value = {'job1': {'dataset1': {'runId': '123', 's3Path': 'path'}}}
+        started = set()
+
+        def invoke(arn, sf_input):
+            sf_input = json.loads(sf_input)
+            name = f"{sf_input['job_name']}_{sf_input['snapshot_date']}_{sf_input['job_version']}"
+            if name in started:
+                raise ClientError({'Error': {'Code': 'ExecutionAlreadyExists'}}, 'StartExecution')
+            started.add(name)
+            return {"executionArn": f"arn:{name}"}
+
+        mock_invoke_step_function.side_effect = invoke
+        with patch(f'{MODULE}.job_audit_table', self.audit_table):
+            lambda_code.execute({'Records': [sqs_record('m1', 'dataset1')]}, None)
+            result = lambda_code.execute({'Records': [sqs_record('m1', 'dataset1')]}, None)
+
+        self.assertEqual(result['batchItemFailures'], [])
+        self.assertEqual(result['results']['dataset1:2024-06-27']['jobs']['job1']['action'], 'already_launched')
+        self.assertEqual(started, {'job1_2024-06-27_1'})
+
+
+class TestGetDependenciesFromDynamo(unittest.TestCase):
+    def setUp(self):
+        self.audit_table = MagicMock()
+
+    def test_non_empty_dep_dict_resolves_in_table(self):
+        # The audit table fills the slot and flips the status in one conditional write
+        self.audit_table.resolve_dependencies.return_value = {
+            "snapshot_date": "2024-07-19:1",
+            "job_status": "DEPS_COMPLETE",
+            "dependencies": {"dep1": "value1"},
+            "pending_dependencies": 0
+        }
+
+        result = lambda_code.get_dependencies_from_dynamo("test_dataset", "2024-07-19", self.audit_table, {"dep1": "value1"})
+
+        self.audit_table.resolve_dependencies.assert_called_once_with("test_dataset", "2024-07-19", {"dep1": "value1"})
+        self.audit_table.update_audit_record.assert_not_called()
+        self.assertEqual(result, {"job_status": "DEPS_COMPLETE", "dependencies": {"dep1": "value1"}, "job_version": "1", "active": True})
+
+    def test_empty_dep_dict_disabled(self):
+        self.audit_table.insert_audit_record.return_value = '1'
+
+        result = lambda_code.get_dependencies_from_dynamo("test_dataset", "2024-07-19", self.audit_table, {})
+
+        self.audit_table.insert_audit_record.assert_called_once_with("test_dataset", "2024-07-19", {"job_status": "DISABLED"})
+        self.assertEqual(result, {"job_status": "DISABLED", "dependencies": {}, "job_version": "1", "active": False})
+
+
+class TestClusterCalls(unittest.TestCase):
+    def setUp(self):
+        lambda_code.boto_clients.clear()
+        lambda_code.cluster_id_cache.clear()
+        lambda_code.spark_conf_cache.clear()
+
+    def test_get_step_states(self):
+        cluster_id = 'j-12345'
+
+        emr_client = lambda_code.get_boto_clients("emr_client")
+        with Stubber(emr_client) as stubber:
+            stubber.add_response(
+                'list_steps',
+                {'Steps': [{'Id': 'step-1', 'Status': {'State': 'RUNNING'}}, {'Id': 'step-other', 'Status': {'State': 'PENDING'}}]},
+                {'ClusterId': cluster_id, 'StepStates': ['PENDING', 'RUNNING', 'CANCEL_PENDING']}
+            )
+            stubber.add_response(
+                'list_steps',
+                {'Steps': [{'Id': 'step-2', 'Status': {'State': 'COMPLETED'}}, {'Id': 'step-3', 'Status': {'State': 'FAILED'}}]},
+                {'ClusterId': cluster_id, 'StepIds': ['step-2', 'step-3']}
+            )
+
+            response = lambda_code.get_step_states(cluster_id, ['step-1', 'step-2', 'step-3'])
+            self.assertEqual(response, {'step-1': 'RUNNING', 'step-2': 'COMPLETED', 'step-3': 'FAILED'})
+
+    def test_get_cluster_id_cached(self):
+        cluster_name = 'test-cluster'
+
+        emr_client = lambda_code.get_boto_clients("emr_client")
+        with Stubber(emr_client) as stubber:
+            expected_params = {'ClusterStates': ['STARTING', 'BOOTSTRAPPING', 'RUNNING', 'WAITING']}
+            stubber.add_response('list_clusters', {'Clusters': [{'Id': 'j-12345', 'Name': cluster_name}]}, expected_params)
+
+            hits = lambda_code.cache_stats["cluster_id"]["hits"]
+            self.assertEqual(lambda_code.get_cluster_id(cluster_name), 'j-12345')
+            self.assertEqual(lambda_code.get_cluster_id(cluster_name), 'j-12345')
+            self.assertEqual(lambda_code.cache_stats["cluster_id"]["hits"], hits + 1)
+            stubber.assert_no_pending_responses()
+
+    def test_get_cluster_id_revalidation_error_falls_back_to_list(self):
+        cluster_name = 'test-cluster'
+        lambda_code.cluster_id_cache[cluster_name] = {"cluster_id": 'j-old', "expires_at": 0}
+
+        emr_client = lambda_code.get_boto_clients("emr_client")
+        with Stubber(emr_client) as stubber:
+            stubber.add_client_error('describe_cluster', service_error_code='InvalidRequestException', expected_params={'ClusterId': 'j-old'})
+            expected_params = {'ClusterStates': ['STARTING', 'BOOTSTRAPPING', 'RUNNING', 'WAITING']}
+            stubber.add_response('list_clusters', {'Clusters': [{'Id': 'j-new', 'Name': cluster_name}]}, expected_params)
+
+            self.assertEqual(lambda_code.get_cluster_id(cluster_name), 'j-new')
+            self.assertEqual(lambda_code.cluster_id_cache[cluster_name]["cluster_id"], 'j-new')
+            stubber.assert_no_pending_responses()
+
+    def test_get_spark_conf_cached_per_location(self):
+        bucket = 'test-bucket'
+        lambda_code.spark_conf_cache[(bucket, 'old-key')] = {"etag": '"etag-1"', "spark_conf": ['old'], "expires_at": float('inf')}
+
+        s3_client = lambda_code.get_boto_clients("s3_client")
+        with Stubber(s3_client) as stubber:
+            body = StreamingBody(io.BytesIO(b'{"spark_conf": ["new"]}'), len(b'{"spark_conf": ["new"]}'))
+            stubber.add_response('get_object', {'Body': body, 'ETag': '"etag-2"'}, {'Bucket': bucket, 'Key': 'new-key'})
+
+            self.assertEqual(lambda_code.get_spark_conf('dataset_name', bucket, 'new-key'), ['new'])
+            stubber.assert_no_pending_responses()
+
+    def test_get_spark_conf_not_modified(self):
+        bucket = 'test-bucket'
+        key = 'test-key'
+        lambda_code.spark_conf_cache[(bucket, key)] = {"etag": '"etag-1"', "spark_conf": ['conf1'], "expires_at": 0}
+
+        s3_client = lambda_code.get_boto_clients("s3_client")
+        with Stubber(s3_client) as stubber:
+            expected_params = {'Bucket': bucket, 'Key': key, 'IfNoneMatch': '"etag-1"'}
+            stubber.add_client_error('get_object', service_error_code='304', http_status_code=304, expected_params=expected_params)
+
+            response = lambda_code.get_spark_conf('dataset_name', bucket, key)
+            self.assertEqual(response, ['conf1'])
+
+    @patch(f'{MODULE}.get_spark_conf')
+    def test_build_step_bootstrap_keyed_on_etag(self, mock_get_spark_conf):
+        mock_get_spark_conf.return_value = ['--conf1']
+
+        command = lambda_code.build_step('view1', '2022-01-01', '3', {}, 'bucket')["HadoopJarStep"]["Args"][2]
+        self.assertIn("aws s3api head-object", command)
+        self.assertIn("bootstrap_dir=/mnt/tmp/ais_bootstrap/$etag", command)
+        self.assertIn("trap 'cd /; sudo rm -rf /mnt/tmp/ais_code_temp/view1_2022-01-01_3' EXIT", command)
+
+    @patch(f'{MODULE}.ADD_JOB_FLOW_STEPS_MAX_STEPS', 1)
+    @patch(f'{MODULE}.get_spark_conf')
+    @patch(f'{MODULE}.get_cluster_id')
+    def test_submit_steps_to_cluster(self, mock_get_cluster_id, mock_get_spark_conf):
+        mock_get_cluster_id.return_value = 'j-12345'
+        mock_get_spark_conf.return_value = ['--conf1', '--conf2']
+        jobs = [
+            {'job_name': 'view1', 'snapshot_date': '2022-01-01', 'job_version': '1', 'dependencies': {}},
+            {'job_name': 'view2', 'snapshot_date': '2022-01-01', 'job_version': '2', 'dependencies': {}}
+        ]
+
+        emr_client = lambda_code.get_boto_clients("emr_client")
+        with Stubber(emr_client) as stubber:
+            stubber.add_response('add_job_flow_steps', {'StepIds': ['step-1']})
+            stubber.add_response('add_job_flow_steps', {'StepIds': ['step-2']})
+
+            response = lambda_code.submit_steps_to_cluster(jobs, 'test-cluster')
+            self.assertEqual([job['StepIds'] for job in response], [['step-1'], ['step-2']])
+            self.assertEqual(response[1]['job_name'], 'view2')
+            stubber.assert_no_pending_responses()
+
+
+if __name__ == '__main__':
+    unittest.main()
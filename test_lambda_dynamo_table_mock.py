@@ -10,13 +10,14 @@ from your_module import (
     get_boto_clients, invoke_step_function, check_emr_step_status,
     get_spark_conf, get_cluster_id, get_cluster_status,
     submit_new_step_to_cluster, get_dependencies_from_dynamo,
-    get_src_run_id_for_dependency, execute
+    get_src_run_id_for_dependency, execute, boto_clients
 )
 
 @mock_dynamodb2
 class TestYourModule(unittest.TestCase):
 
     def setUp(self):
+        boto_clients.clear()
         # Set up the DynamoDB table
         self.dynamodb = boto3.resource('dynamodb', region_name='us-east-1')
         self.table_name = 'data_dstr_job_audit'
@@ -103,7 +104,7 @@ class TestYourModule(unittest.TestCase):
         s3_client = get_boto_clients("s3_client")
         with Stubber(s3_client) as stubber:
             expected_params = {'Bucket': bucket, 'Key': key}
-            response_body = {'Body': MagicMock(read=MagicMock(return_value=json.dumps({'spark_conf': ['conf1', 'conf2']})))}
+            response_body = {'Body': MagicMock(read=MagicMock(return_value=json.dumps({'spark_conf': ['conf1', 'conf2']}))), 'ETag': '"etag-1"'}
             stubber.add_response('get_object', response_body, expected_params)
 
             response = get_spark_conf('dataset_name', bucket, key)
@@ -114,7 +115,7 @@ class TestYourModule(unittest.TestCase):
         
         emr_client = get_boto_clients("emr_client")
         with Stubber(emr_client) as stubber:
-            expected_params = {}
+            expected_params = {'ClusterStates': ['STARTING', 'BOOTSTRAPPING', 'RUNNING', 'WAITING']}
             response_body = {'Clusters': [{'Id': 'j-12345', 'Name': cluster_name}]}
             stubber.add_response('list_clusters', response_body, expected_params)
 
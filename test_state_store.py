@@ -0,0 +1,98 @@
+import os
+import shutil
+import tempfile
+import time
+import unittest
+from unittest.mock import patch
+
+from state_store import JournalStateStore, SqliteStateStore
+
+
+class TestJournalStateStore(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmp_dir, "jobs.journal")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_record_and_reload(self):
+        store = JournalStateStore(self.path)
+        store.record("Job1", "2024-01-05", True)
+        store.record("Job2", "2024-01-05", False)
+        store.record("Job2", "2024-01-05", True)
+        store.close()
+
+        state = JournalStateStore(self.path).load()
+        self.assertEqual(state["Job1"], {"snapshot_date": "2024-01-05", "completed": True})
+        self.assertTrue(state["Job2"]["completed"])
+
+    def test_torn_write_is_ignored(self):
+        store = JournalStateStore(self.path)
+        store.record("Job1", "2024-01-05", True)
+        store.close()
+        with open(self.path, "a") as journal_file:
+            journal_file.write('{"name": "Job2", "snaps')
+
+        state = JournalStateStore(self.path).load()
+        self.assertEqual(list(state), ["Job1"])
+
+    def test_records_after_torn_write_survive(self):
+        store = JournalStateStore(self.path)
+        store.record("Job1", "2024-01-05", True)
+        store.close()
+        with open(self.path, "a") as journal_file:
+            journal_file.write('{"name": "Job2", "snaps')
+
+        store = JournalStateStore(self.path)
+        store.record("Job3", "2024-01-05", True)
+        store.close()
+
+        state = JournalStateStore(self.path).load()
+        self.assertEqual(sorted(state), ["Job1", "Job3"])
+
+    @patch('state_store.os.fsync')
+    def test_burst_tail_synced_without_another_record(self, mock_fsync):
+        store = JournalStateStore(self.path, sync_interval=0.05)
+        store.record("Job1", "2024-01-05", True)
+        mock_fsync.assert_not_called()
+
+        deadline = time.monotonic() + 2
+        while not mock_fsync.called and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+        mock_fsync.assert_called_once()
+        self.assertEqual(store.unsynced, 0)
+        store.close()
+
+    def test_compaction(self):
+        store = JournalStateStore(self.path, compact_every=5)
+        for i in range(12):
+            store.record(f"Job{i % 3}", "2024-01-05", i % 2 == 0)
+        store.close()
+
+        self.assertTrue(os.path.exists(self.path + ".snapshot"))
+        self.assertFalse(os.path.exists(self.path + ".compacting"))
+        state = JournalStateStore(self.path).load()
+        self.assertEqual(len(state), 3)
+        self.assertFalse(state["Job2"]["completed"])
+
+
+class TestSqliteStateStore(unittest.TestCase):
+
+    def test_record_and_reload(self):
+        tmp_dir = tempfile.mkdtemp()
+        path = os.path.join(tmp_dir, "jobs.db")
+        try:
+            store = SqliteStateStore(path)
+            store.record("Job1", "2024-01-05", True)
+            store.close()
+
+            self.assertEqual(SqliteStateStore(path).load(), {"Job1": {"snapshot_date": "2024-01-05", "completed": True}})
+        finally:
+            shutil.rmtree(tmp_dir)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,77 @@
+import importlib.util
+import unittest
+from unittest.mock import MagicMock, patch
+
+from view_joins import join_frames, plan_joins, salted_join
+
+MB = 1024 * 1024
+
+
+class TestPlanJoins(unittest.TestCase):
+    def test_inner_joins_stream_largest_and_broadcast_small_sides(self):
+        # Config order: small dimension, fact, medium side, tiny dimension
+        steps = plan_joins([10 * MB, 50000 * MB, 2000 * MB, 1 * MB], broadcast_threshold=64 * MB)
+
+        self.assertEqual([step.index for step in steps], [1, 3, 0, 2])
+        self.assertEqual([step.strategy for step in steps], ["base", "broadcast", "broadcast", "shuffle"])
+
+    def test_outer_joins_keep_config_order(self):
+        steps = plan_joins([10 * MB, 50000 * MB, 1 * MB], how="left", broadcast_threshold=64 * MB)
+
+        self.assertEqual([step.index for step in steps], [0, 1, 2])
+        self.assertEqual([step.strategy for step in steps], ["base", "shuffle", "broadcast"])
+
+    def test_skewed_base_salts_shuffle_joins_only(self):
+        steps = plan_joins([50000 * MB, 2000 * MB, 1 * MB], broadcast_threshold=64 * MB, base_skewed=True)
+
+        self.assertEqual([step.strategy for step in steps], ["base", "broadcast", "salted"])
+
+    def test_skewed_base_not_salted_for_full_outer_join(self):
+        steps = plan_joins([50000 * MB, 2000 * MB], how="full", broadcast_threshold=64 * MB, base_skewed=True)
+
+        self.assertEqual(steps[1].strategy, "shuffle")
+
+
+@unittest.skipIf(importlib.util.find_spec("pyspark") is None, "pyspark is not installed")
+class TestJoinFrames(unittest.TestCase):
+    @patch('view_joins.skewed_keys')
+    def test_skew_sampling_is_opt_in(self, mock_skewed_keys):
+        frames = [MagicMock(), MagicMock()]
+        sizes = [50000 * MB, 2000 * MB]
+
+        join_frames(frames, "id", sizes=sizes)
+        mock_skewed_keys.assert_not_called()
+
+        # Known hot keys skip the sample too
+        with patch('view_joins.salted_join') as mock_salted_join:
+            join_frames(frames, "id", sizes=sizes, base_skewed=[("k1",)], detect_skew=True)
+        mock_skewed_keys.assert_not_called()
+        self.assertEqual(mock_salted_join.call_args[0][4], [("k1",)])
+
+        mock_skewed_keys.return_value = []
+        join_frames(frames, "id", sizes=sizes, detect_skew=True)
+        mock_skewed_keys.assert_called_once()
+
+    @patch('view_joins.skewed_keys')
+    def test_known_skew_samples_hot_keys_for_salting(self, mock_skewed_keys):
+        frames = [MagicMock(), MagicMock()]
+        mock_skewed_keys.return_value = [("k1",)]
+
+        with patch('view_joins.salted_join') as mock_salted_join:
+            join_frames(frames, "id", sizes=[50000 * MB, 2000 * MB], base_skewed=True)
+
+        mock_skewed_keys.assert_called_once_with(frames[0], ["id"])
+        self.assertEqual(mock_salted_join.call_args[0][4], [("k1",)])
+
+    def test_salted_join_without_hot_keys_joins_plainly(self):
+        left, right = MagicMock(), MagicMock()
+
+        result = salted_join(left, right, ["id"], "inner", [])
+
+        left.join.assert_called_once_with(right, ["id"], "inner")
+        right.withColumn.assert_not_called()
+        self.assertIs(result, left.join.return_value)
+
+
+if __name__ == '__main__':
+    unittest.main()
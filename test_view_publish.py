@@ -0,0 +1,141 @@
+import json
+import unittest
+from unittest.mock import MagicMock
+
+from view_publish import configure_direct_commit, delete_keys, direct_commit_builder, part_ranges, publish_output, write_output
+
+
+def s3_with_files(*files):
+    s3_client = MagicMock()
+    contents = [{'Key': 'staging/view/_SUCCESS', 'Size': 0}] + [{'Key': key, 'Size': size} for key, size in files]
+    s3_client.get_paginator.return_value.paginate.side_effect = lambda Bucket, Prefix: [{'Contents': [obj for obj in contents if obj['Key'].startswith(Prefix)]}]
+    s3_client.delete_objects.return_value = {}
+    return s3_client
+
+
+class TestViewPublish(unittest.TestCase):
+    def test_single_small_file_is_copied_and_staging_deleted(self):
+        s3_client = s3_with_files(('staging/view/part-00000.parquet', 1024))
+
+        result = publish_output(s3_client, 'refined', 'staging/view/', 'refined', 'views/view', 'parquet')
+
+        s3_client.copy_object.assert_called_once_with(
+            Bucket='refined', Key='views/view.parquet',
+            CopySource={'Bucket': 'refined', 'Key': 'staging/view/part-00000.parquet'}
+        )
+        s3_client.delete_objects.assert_called_once_with(
+            Bucket='refined', Delete={'Objects': [{'Key': 'staging/view/part-00000.parquet'}], 'Quiet': True}
+        )
+        s3_client.put_object.assert_not_called()
+        self.assertEqual(result['files'], ['s3://refined/views/view.parquet'])
+
+    def test_large_file_uses_parallel_part_copies(self):
+        s3_client = s3_with_files(('staging/view/part-00000.parquet', 250))
+        s3_client.create_multipart_upload.return_value = {'UploadId': 'upload-1'}
+        s3_client.upload_part_copy.side_effect = lambda **kwargs: {'CopyPartResult': {'ETag': f"etag-{kwargs['PartNumber']}"}}
+
+        result = publish_output(s3_client, 'refined', 'staging/view/', 'refined', 'views/view', 'parquet', threshold=100, part_size=100)
+
+        ranges = sorted(call.kwargs['CopySourceRange'] for call in s3_client.upload_part_copy.call_args_list)
+        self.assertEqual(ranges, ['bytes=0-99', 'bytes=100-199', 'bytes=200-249'])
+        parts = s3_client.complete_multipart_upload.call_args.kwargs['MultipartUpload']['Parts']
+        self.assertEqual([part['PartNumber'] for part in parts], [1, 2, 3])
+        s3_client.copy_object.assert_not_called()
+        self.assertEqual(result['multipart_copies'], 1)
+
+    def test_failed_part_aborts_upload_and_keeps_staging(self):
+        s3_client = s3_with_files(('staging/view/part-00000.parquet', 250))
+        s3_client.create_multipart_upload.return_value = {'UploadId': 'upload-1'}
+        s3_client.upload_part_copy.side_effect = RuntimeError('SlowDown')
+
+        with self.assertRaises(RuntimeError):
+            publish_output(s3_client, 'refined', 'staging/view/', 'refined', 'views/view', 'parquet', threshold=100, part_size=100)
+
+        s3_client.abort_multipart_upload.assert_called_once_with(Bucket='refined', Key='views/view.parquet', UploadId='upload-1')
+        s3_client.delete_objects.assert_not_called()
+
+    def test_multiple_parts_are_all_published_with_manifest(self):
+        s3_client = s3_with_files(('staging/view/part-00001.parquet', 20), ('staging/view/part-00000.parquet', 10))
+
+        result = publish_output(s3_client, 'refined', 'staging/view/', 'refined', 'views/view', 'parquet')
+
+        self.assertEqual(result['files'], ['s3://refined/views/view/part-00000.parquet', 's3://refined/views/view/part-00001.parquet'])
+        manifest = json.loads(s3_client.put_object.call_args.kwargs['Body'])
+        self.assertEqual(s3_client.put_object.call_args.kwargs['Key'], 'views/view/_manifest.json')
+        self.assertEqual(manifest['files'], result['files'])
+        self.assertEqual(manifest['total_bytes'], 30)
+
+    def test_stale_output_from_earlier_publish_is_deleted(self):
+        s3_client = s3_with_files(
+            ('staging/view/part-00000.parquet', 10), ('staging/view/part-00001.parquet', 20),
+            ('views/view/part-00000.parquet', 5), ('views/view/part-00002.parquet', 5)
+        )
+
+        publish_output(s3_client, 'refined', 'staging/view/', 'refined', 'views/view', 'parquet')
+
+        deleted = [[obj['Key'] for obj in call.kwargs['Delete']['Objects']] for call in s3_client.delete_objects.call_args_list]
+        self.assertEqual(deleted[0], ['views/view/part-00002.parquet', 'views/view.parquet'])
+        self.assertEqual(deleted[1], ['staging/view/part-00000.parquet', 'staging/view/part-00001.parquet'])
+
+    def test_switch_to_single_file_deletes_part_directory(self):
+        s3_client = s3_with_files(
+            ('staging/view/part-00000.parquet', 10),
+            ('views/view/part-00000.parquet', 5), ('views/view/part-00001.parquet', 5), ('views/view/_manifest.json', 1)
+        )
+
+        publish_output(s3_client, 'refined', 'staging/view/', 'refined', 'views/view', 'parquet')
+
+        deleted = [obj['Key'] for obj in s3_client.delete_objects.call_args_list[0].kwargs['Delete']['Objects']]
+        self.assertEqual(deleted, ['views/view/part-00000.parquet', 'views/view/part-00001.parquet', 'views/view/_manifest.json'])
+
+    def test_deletes_are_batched(self):
+        s3_client = MagicMock()
+        s3_client.delete_objects.return_value = {'Errors': [{'Key': 'k0', 'Code': 'AccessDenied'}]}
+
+        errors = delete_keys(s3_client, 'refined', [f'k{i}' for i in range(2500)])
+
+        self.assertEqual([len(call.kwargs['Delete']['Objects']) for call in s3_client.delete_objects.call_args_list], [1000, 1000, 500])
+        self.assertEqual(len(errors), 3)
+
+    def test_write_output_commits_in_place(self):
+        s3_client = s3_with_files(('views/view/part-00000.parquet', 10), ('views/view/part-00001.parquet', 20))
+        df = MagicMock()
+
+        result = write_output(df, s3_client, 'refined', 'views/view', 'parquet')
+
+        df.write.mode.return_value.format.return_value.save.assert_called_once_with('s3://refined/views/view')
+        s3_client.copy_object.assert_not_called()
+        s3_client.delete_objects.assert_not_called()
+        self.assertEqual(s3_client.put_object.call_args.kwargs['Key'], 'views/view/_manifest.json')
+        self.assertEqual(result['files'], ['s3://refined/views/view/part-00000.parquet', 's3://refined/views/view/part-00001.parquet'])
+        self.assertEqual(result['bytes'], 30)
+
+    def test_direct_commit_keeps_emrfs_committer(self):
+        builder = MagicMock()
+        builder.config.return_value = builder
+
+        direct_commit_builder(builder, "s3")
+
+        names = [call.args[0] for call in builder.config.call_args_list]
+        self.assertNotIn('spark.sql.sources.commitProtocolClass', names)
+        self.assertIn('spark.sql.parquet.fs.optimized.committer.optimization-enabled', names)
+
+    def test_direct_commit_sets_bare_hadoop_keys_at_runtime(self):
+        spark = MagicMock()
+        hadoop_conf = spark.sparkContext._jsc.hadoopConfiguration.return_value
+
+        configure_direct_commit(spark, "s3a")
+
+        hadoop_conf.set.assert_any_call('fs.s3a.committer.name', 'magic')
+        names = [call.args[0] for call in spark.conf.set.call_args_list]
+        self.assertIn('spark.sql.sources.commitProtocolClass', names)
+        self.assertFalse(any(name.startswith('spark.hadoop.') for name in names))
+
+    def test_part_ranges_respect_part_limit(self):
+        ranges = part_ranges(20000, part_size=1)
+        self.assertEqual(len(ranges), 10000)
+        self.assertEqual(ranges[-1], (19998, 19999))
+
+
+if __name__ == '__main__':
+    unittest.main()
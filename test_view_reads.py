@@ -0,0 +1,59 @@
+import unittest
+from unittest.mock import MagicMock
+
+import view_reads
+from view_reads import get_table_layout, hive_partition_paths, partition_expression, read_snapshot
+
+
+def glue_table():
+    return {
+        'Table': {
+            'StorageDescriptor': {
+                'Columns': [{'Name': 'id', 'Type': 'bigint'}, {'Name': 'attrs', 'Type': 'map<string,string>'}],
+                'Location': 's3://refined/orders/'
+            },
+            'PartitionKeys': [{'Name': 'snapshot_date', 'Type': 'string'}]
+        }
+    }
+
+
+class TestViewReads(unittest.TestCase):
+    def setUp(self):
+        view_reads.schema_cache.clear()
+        self.glue_client = MagicMock()
+        self.glue_client.get_table.return_value = glue_table()
+        self.glue_client.get_paginator.return_value.paginate.return_value = [
+            {'Partitions': [{'StorageDescriptor': {'Location': 's3://refined/orders/snapshot_date=2024-06-27'}}]}
+        ]
+
+    def test_table_layout_cached(self):
+        layout = get_table_layout(self.glue_client, 'glue_db', 'orders')
+
+        self.assertIs(get_table_layout(self.glue_client, 'glue_db', 'orders'), layout)
+        self.glue_client.get_table.assert_called_once_with(DatabaseName='glue_db', Name='orders')
+        self.assertEqual(layout.schema, '`id` bigint, `attrs` map<string,string>, `snapshot_date` string')
+        self.assertEqual(layout.location, 's3://refined/orders')
+
+    def test_partition_expression_escapes_values(self):
+        self.assertEqual(partition_expression({'snapshot_date': '2024-06-27', 'region': "o'hare"}), "snapshot_date = '2024-06-27' AND region = 'o''hare'")
+
+    def test_hive_paths_cover_leading_keys(self):
+        self.assertEqual(hive_partition_paths('s3://refined/orders/', ['snapshot_date', 'region'], {'snapshot_date': '2024-06-27'}), ['s3://refined/orders/snapshot_date=2024-06-27'])
+        with self.assertRaises(ValueError):
+            hive_partition_paths('s3://refined/orders', ['snapshot_date'], {'region': 'us'})
+
+    def test_read_snapshot_uses_catalog_schema_and_locations(self):
+        spark = MagicMock()
+        reader = spark.read.option.return_value.schema.return_value
+        df = reader.parquet.return_value
+
+        read_snapshot(spark, 's3://ignored', {'snapshot_date': '2024-06-27'}, columns=['id'], glue_client=self.glue_client, database='glue_db', table='orders')
+
+        spark.read.option.assert_called_once_with('basePath', 's3://refined/orders')
+        spark.read.option.return_value.schema.assert_called_once_with('`id` bigint, `attrs` map<string,string>, `snapshot_date` string')
+        reader.parquet.assert_called_once_with('s3://refined/orders/snapshot_date=2024-06-27')
+        df.where.return_value.select.assert_called_once_with('id')
+
+
+if __name__ == '__main__':
+    unittest.main()
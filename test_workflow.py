@@ -0,0 +1,68 @@
+import unittest
+from unittest.mock import patch
+
+from workflow import Job, run_jobs_in_waves, topological_sort
+
+
+class TestWorkflowScheduler(unittest.TestCase):
+
+    def setUp(self):
+        self.snapshot_date = "2024-01-05"
+        self.jobs = {
+            "Job1": Job("Job1", [], False, self.snapshot_date, "Daily", self.snapshot_date),
+            "Job2": Job("Job2", ["Job1"], False, self.snapshot_date, "Daily", self.snapshot_date),
+            "Job3": Job("Job3", ["Job1"], False, self.snapshot_date, "Daily", self.snapshot_date),
+            "Job4": Job("Job4", ["Job2", "Job3"], False, self.snapshot_date, None, self.snapshot_date),
+        }
+
+    def test_topological_sort(self):
+        order = topological_sort(self.jobs)
+        self.assertEqual(order[0], "Job1")
+        self.assertEqual(order[-1], "Job4")
+
+    def test_topological_sort_cycle(self):
+        self.jobs["Job1"].dependencies = ["Job4"]
+        with self.assertRaises(ValueError):
+            topological_sort(self.jobs)
+
+    @patch('workflow.time.sleep')
+    def test_run_jobs_in_waves(self, mock_sleep):
+        finished, blocked = run_jobs_in_waves("Job1", self.jobs, max_workers=2)
+
+        self.assertEqual(blocked, [])
+        self.assertEqual(finished[0], "Job1")
+        self.assertEqual(finished[-1], "Job4")
+        self.assertEqual(set(finished), set(self.jobs))
+        self.assertTrue(all(job.completed for job in self.jobs.values()))
+
+    @patch('workflow.time.sleep')
+    def test_run_jobs_in_waves_waiting_dependency(self, mock_sleep):
+        self.jobs["Job5"] = Job("Job5", [], False, "2024-01-01", None, self.snapshot_date)
+        self.jobs["Job4"].dependencies.append("Job5")
+
+        finished, blocked = run_jobs_in_waves("Job1", self.jobs)
+
+        self.assertTrue(self.jobs["Job3"].completed)
+        self.assertFalse(self.jobs["Job4"].completed)
+        self.assertEqual(blocked, ["Job4"])
+        self.assertNotIn("Job4", finished)
+
+    @patch('workflow.time.sleep')
+    def test_run_jobs_in_waves_blocked_job_holds_back_dependents(self, mock_sleep):
+        self.jobs["Job5"] = Job("Job5", [], False, "2024-01-01", None, self.snapshot_date)
+        self.jobs["Job2"].dependencies.append("Job5")
+        done = []
+
+        finished, blocked = run_jobs_in_waves("Job1", self.jobs, on_job_done=lambda job: done.append(job.name))
+
+        self.assertEqual(sorted(finished), ["Job1", "Job3"])
+        self.assertEqual(done, finished)
+        self.assertEqual(blocked, ["Job2", "Job4"])
+        self.assertFalse(self.jobs["Job4"].completed)
+
+    def test_run_jobs_in_waves_invalid_job(self):
+        self.assertEqual(run_jobs_in_waves("missing", self.jobs), ([], []))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,154 @@
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Spark's own default for spark.sql.autoBroadcastJoinThreshold is 10 MB; view dimensions are
+# routinely larger than that but still far cheaper to broadcast than to shuffle a fact table
+BROADCAST_THRESHOLD_BYTES = 64 * 1024 * 1024
+SKEW_RATIO = 8.0
+SALT_BUCKETS = 16
+SKEW_SAMPLE_FRACTION = 0.01
+# Hot keys are matched with one OR'ed condition per side, so keep the list short
+MAX_SKEWED_KEYS = 100
+
+
+class JoinStep:
+    __slots__ = ("index", "size_bytes", "strategy", "estimated_bytes")
+
+    def __init__(self, index, size_bytes, strategy, estimated_bytes):
+        self.index = index
+        self.size_bytes = size_bytes
+        self.strategy = strategy
+        self.estimated_bytes = estimated_bytes
+
+    def __repr__(self):
+        return f"JoinStep({self.index}, {self.strategy}, {self.size_bytes})"
+
+
+def plan_joins(sizes, how="inner", broadcast_threshold=BROADCAST_THRESHOLD_BYTES, base_skewed=False):
+    # sizes: estimated bytes per input, in config order. The largest input is the streamed base
+    # and is never shuffled for a broadcast. Inner joins are reordered so broadcastable sides go
+    # first (they never grow the shuffle) and the remaining sides join smallest first, keeping
+    # every intermediate as small as possible. Outer joins keep config order, since reordering
+    # them changes the result; they still broadcast small right-hand sides. A skewed base is
+    # salted for its shuffle joins, which only preserves results for inner and left joins.
+    indexes = list(range(len(sizes)))
+    if how == "inner":
+        base = max(indexes, key=lambda i: sizes[i])
+        rest = sorted((i for i in indexes if i != base), key=lambda i: sizes[i])
+    else:
+        base, rest = indexes[0], indexes[1:]
+
+    steps = [JoinStep(base, sizes[base], "base", sizes[base])]
+    estimated = sizes[base]
+    for index in rest:
+        if sizes[index] <= broadcast_threshold:
+            strategy = "broadcast"
+        elif base_skewed and how in ("inner", "left"):
+            strategy = "salted"
+        else:
+            strategy = "shuffle"
+        # Key joins against dimensions rarely grow the fact side; assume the larger input survives
+        estimated = max(estimated, sizes[index])
+        steps.append(JoinStep(index, sizes[index], strategy, estimated))
+    return steps
+
+
+def dataframe_size_bytes(df):
+    # Catalyst's size estimate for the optimized plan: file sizes for a plain read, or table
+    # statistics once ANALYZE has been run. Falls back to "too big to broadcast".
+    try:
+        return int(df._jdf.queryExecution().optimizedPlan().stats().sizeInBytes().toString())
+    except Exception as e:
+        logger.warning("No size estimate for join input: %s", e)
+        return float("inf")
+
+
+def s3_prefix_size_bytes(s3_client, bucket, prefix):
+    total = 0
+    paginator = s3_client.get_paginator("list_objects_v2")
+    for page in paginator.paginate(Bucket=bucket, Prefix=prefix):
+        total += sum(obj["Size"] for obj in page.get("Contents", []))
+    return total
+
+
+def skewed_keys(df, on, sample_fraction=SKEW_SAMPLE_FRACTION, skew_ratio=SKEW_RATIO, max_keys=MAX_SKEWED_KEYS):
+    # A key is hot when its sampled frequency is skew_ratio times the mean key frequency.
+    # Returns the hottest keys as tuples of `on` values, most frequent first.
+    from pyspark.sql import functions as F
+    counts = df.sample(fraction=sample_fraction, seed=17).groupBy(*on).count()
+    stats = counts.agg(F.avg("count").alias("avg")).first()
+    if stats is None or not stats["avg"]:
+        return []
+    hot = counts.where(F.col("count") >= skew_ratio * stats["avg"]).orderBy(F.desc("count")).limit(max_keys)
+    return [tuple(row[column] for column in on) for row in hot.collect()]
+
+
+def is_skewed(df, on, sample_fraction=SKEW_SAMPLE_FRACTION, skew_ratio=SKEW_RATIO):
+    return bool(skewed_keys(df, on, sample_fraction, skew_ratio))
+
+
+def hot_key_condition(on, keys):
+    from pyspark.sql import functions as F
+    condition = F.lit(False)
+    for key in keys:
+        match = F.lit(True)
+        for column, value in zip(on, key):
+            match = match & (F.col(column) == F.lit(value))
+        condition = condition | match
+    return condition
+
+
+def salted_join(left, right, on, how, keys, buckets=SALT_BUCKETS):
+    # Only rows with a hot key are salted: on the left they spread over `buckets` partitions,
+    # on the right they are replicated once per bucket so every salted row still meets its
+    # matches. All other rows keep salt 0 and join as usual, so the right side grows by the
+    # hot keys' rows only.
+    from pyspark.sql import functions as F
+    if not keys:
+        return left.join(right, on, how)
+    left = left.withColumn("_salt", F.when(hot_key_condition(on, keys), (F.rand(seed=17) * buckets).cast("int")).otherwise(F.lit(0)))
+    salts = F.when(hot_key_condition(on, keys), F.array(*[F.lit(i) for i in range(buckets)])).otherwise(F.array(F.lit(0)))
+    right = right.withColumn("_salt", F.explode(salts))
+    return left.join(right, list(on) + ["_salt"], how).drop("_salt")
+
+
+def configure_adaptive_joins(spark, broadcast_threshold=BROADCAST_THRESHOLD_BYTES):
+    # AQE re-plans with runtime sizes and splits skewed partitions it can see after the shuffle
+    spark.conf.set("spark.sql.adaptive.enabled", "true")
+    spark.conf.set("spark.sql.adaptive.skewJoin.enabled", "true")
+    spark.conf.set("spark.sql.autoBroadcastJoinThreshold", str(broadcast_threshold))
+
+
+def join_frames(frames, on, how="inner", sizes=None, broadcast_threshold=BROADCAST_THRESHOLD_BYTES, base_skewed=None, detect_skew=False):
+    # base_skewed is None when unknown, False, True, or the base's hot keys as tuples of `on` values
+    from pyspark.sql import functions as F
+    if len(frames) == 1:
+        return frames[0]
+    on = [on] if isinstance(on, str) else list(on)
+    if sizes is None:
+        sizes = [dataframe_size_bytes(df) for df in frames]
+    steps = plan_joins(sizes, how, broadcast_threshold, base_skewed=bool(base_skewed))
+    keys = list(base_skewed) if isinstance(base_skewed, (list, tuple)) else None
+    # AQE already splits skewed shuffle partitions, so salting is opt-in: pass base_skewed from
+    # known statistics, or set detect_skew to sample the base, which costs an extra Spark job.
+    # Only the streamed base can carry a hot key into a shuffle, and only if something is shuffled.
+    if base_skewed is None and detect_skew and any(step.strategy == "shuffle" for step in steps):
+        keys = skewed_keys(frames[steps[0].index], on)
+        if keys:
+            steps = plan_joins(sizes, how, broadcast_threshold, base_skewed=True)
+    if keys is None and any(step.strategy == "salted" for step in steps):
+        # Known to be skewed, but the hot keys still come from a sample
+        keys = skewed_keys(frames[steps[0].index], on)
+    logger.info("Join plan: %s", steps)
+
+    result = frames[steps[0].index]
+    for step in steps[1:]:
+        other = frames[step.index]
+        if step.strategy == "broadcast":
+            result = result.join(F.broadcast(other), on, how)
+        elif step.strategy == "salted":
+            result = salted_join(result, other, on, how, keys)
+        else:
+            result = result.join(other, on, how)
+    return result
@@ -0,0 +1,223 @@
+import json
+import logging
+import posixpath
+from concurrent.futures import ThreadPoolExecutor
+
+import boto3
+from botocore.config import Config
+
+logger = logging.getLogger(__name__)
+
+# copy_object handles up to 5 GB in one call, but a single call copies serially; above this
+# size the object is split into ranges copied in parallel with upload_part_copy
+MULTIPART_THRESHOLD_BYTES = 256 * 1024 * 1024
+PART_SIZE_BYTES = 128 * 1024 * 1024
+MAX_PARTS = 10000
+PUBLISH_MAX_WORKERS = 16
+DELETE_BATCH_SIZE = 1000
+MANIFEST_NAME = "_manifest.json"
+
+# Committer settings that write task output straight to the destination prefix, per filesystem.
+# EMRFS (s3:// on EMR) already commits Parquet in place with its S3-optimized committer, so it is
+# only switched on; replacing its commit protocol would drop it. On S3A the magic committer
+# uploads each task's file as a pending multipart upload that the job commit completes, which
+# needs the spark-hadoop-cloud jar for the commit protocol classes.
+DIRECT_COMMIT_CONF = {
+    "s3": {
+        "spark.sql.parquet.fs.optimized.committer.optimization-enabled": "true",
+    },
+    "s3a": {
+        "spark.hadoop.fs.s3a.committer.name": "magic",
+        "spark.hadoop.fs.s3a.committer.magic.enabled": "true",
+        "spark.sql.sources.commitProtocolClass": "org.apache.spark.internal.io.cloud.PathOutputCommitProtocol",
+        "spark.sql.parquet.output.committer.class": "org.apache.spark.internal.io.cloud.BindingParquetOutputCommitter",
+    },
+}
+HADOOP_CONF_PREFIX = "spark.hadoop."
+
+
+def get_s3_client(max_workers=PUBLISH_MAX_WORKERS):
+    # One pooled connection per copy worker, otherwise urllib3 discards connections under load
+    return boto3.client("s3", config=Config(max_pool_connections=max_workers))
+
+
+def direct_commit_builder(builder, scheme="s3"):
+    # spark.hadoop.* settings only reach the Hadoop configuration when the SparkContext is
+    # created, so they belong on the session builder rather than on spark.conf at runtime
+    for name, value in DIRECT_COMMIT_CONF[scheme].items():
+        builder = builder.config(name, value)
+    return builder
+
+
+def configure_direct_commit(spark, scheme="s3"):
+    # For a session that already exists: Hadoop keys go, without their spark.hadoop. prefix, on
+    # the live Hadoop configuration that new writes read; the rest are SQL settings
+    hadoop_conf = spark.sparkContext._jsc.hadoopConfiguration()
+    for name, value in DIRECT_COMMIT_CONF[scheme].items():
+        if name.startswith(HADOOP_CONF_PREFIX):
+            hadoop_conf.set(name[len(HADOOP_CONF_PREFIX):], value)
+        else:
+            spark.conf.set(name, value)
+
+
+def is_data_file(key):
+    # Skips _SUCCESS markers, committer metadata, CRCs and EMR folder placeholders
+    name = posixpath.basename(key)
+    return bool(name) and not name.startswith(("_", ".")) and not name.endswith("$folder$")
+
+
+def list_output_files(s3_client, bucket, prefix):
+    files = []
+    paginator = s3_client.get_paginator("list_objects_v2")
+    for page in paginator.paginate(Bucket=bucket, Prefix=prefix):
+        files.extend(
+            {"Key": obj["Key"], "Size": obj["Size"]} for obj in page.get("Contents", []) if is_data_file(obj["Key"])
+        )
+    return sorted(files, key=lambda obj: obj["Key"])
+
+
+def list_keys(s3_client, bucket, prefix):
+    keys = []
+    paginator = s3_client.get_paginator("list_objects_v2")
+    for page in paginator.paginate(Bucket=bucket, Prefix=prefix):
+        keys.extend(obj["Key"] for obj in page.get("Contents", []))
+    return keys
+
+
+def stale_output_keys(s3_client, bucket, dest_key, file_format, published):
+    # Output left by an earlier publish under the other layout, or with more part files, would
+    # otherwise be read alongside the new files. Deleting a key that does not exist is a no-op.
+    keep = set(published)
+    stale = [key for key in list_keys(s3_client, bucket, f"{dest_key}/") if key not in keep]
+    single = f"{dest_key}.{file_format}"
+    if single not in keep:
+        stale.append(single)
+    return stale
+
+
+def part_ranges(size, part_size=PART_SIZE_BYTES):
+    # S3 allows at most 10,000 parts, so very large objects get proportionally larger parts
+    part_size = max(part_size, -(-size // MAX_PARTS))
+    return [(start, min(start + part_size, size) - 1) for start in range(0, size, part_size)]
+
+
+def copy_file(s3_client, source_bucket, source_key, size, dest_bucket, dest_key, executor=None, threshold=MULTIPART_THRESHOLD_BYTES, part_size=PART_SIZE_BYTES):
+    # Server-side copy; the data never leaves S3
+    copy_source = {"Bucket": source_bucket, "Key": source_key}
+    if size <= threshold:
+        s3_client.copy_object(Bucket=dest_bucket, Key=dest_key, CopySource=copy_source)
+        return False
+
+    upload_id = s3_client.create_multipart_upload(Bucket=dest_bucket, Key=dest_key)["UploadId"]
+
+    def copy_part(part_number, first, last):
+        response = s3_client.upload_part_copy(
+            Bucket=dest_bucket, Key=dest_key, UploadId=upload_id, PartNumber=part_number,
+            CopySource=copy_source, CopySourceRange=f"bytes={first}-{last}"
+        )
+        return {"PartNumber": part_number, "ETag": response["CopyPartResult"]["ETag"]}
+
+    try:
+        ranges = list(enumerate(part_ranges(size, part_size), start=1))
+        if executor is None:
+            parts = [copy_part(number, first, last) for number, (first, last) in ranges]
+        else:
+            futures = [executor.submit(copy_part, number, first, last) for number, (first, last) in ranges]
+            parts = [future.result() for future in futures]
+        s3_client.complete_multipart_upload(
+            Bucket=dest_bucket, Key=dest_key, UploadId=upload_id, MultipartUpload={"Parts": parts}
+        )
+    except Exception:
+        # An incomplete upload is invisible but still billed; never leave one behind
+        s3_client.abort_multipart_upload(Bucket=dest_bucket, Key=dest_key, UploadId=upload_id)
+        raise
+    return True
+
+
+def delete_keys(s3_client, bucket, keys, batch_size=DELETE_BATCH_SIZE):
+    errors = []
+    for start in range(0, len(keys), batch_size):
+        batch = keys[start:start + batch_size]
+        response = s3_client.delete_objects(
+            Bucket=bucket, Delete={"Objects": [{"Key": key} for key in batch], "Quiet": True}
+        )
+        errors.extend(response.get("Errors", []))
+    if errors:
+        logger.warning("Failed to delete %d of %d objects in %s: %s", len(errors), len(keys), bucket, errors[:5])
+    return errors
+
+
+def write_manifest(s3_client, bucket, prefix, files):
+    manifest = {
+        "files": [f"s3://{bucket}/{obj['Key']}" for obj in files],
+        "sizes": [obj["Size"] for obj in files],
+        "total_bytes": sum(obj["Size"] for obj in files),
+    }
+    key = posixpath.join(prefix, MANIFEST_NAME)
+    s3_client.put_object(Bucket=bucket, Key=key, Body=json.dumps(manifest).encode("utf-8"), ContentType="application/json")
+    return key
+
+
+def commit_manifest(s3_client, bucket, prefix):
+    # For output written straight to its final prefix with a direct committer: records the
+    # committed part files so readers need no listing and nothing is copied
+    files = list_output_files(s3_client, bucket, prefix)
+    if not files:
+        raise ValueError(f"No output files under s3://{bucket}/{prefix}")
+    return write_manifest(s3_client, bucket, prefix, files)
+
+
+def write_output(df, s3_client, dest_bucket, dest_key, file_format, scheme="s3", mode="overwrite"):
+    # Publishes with no copy and no delete: Spark writes the part files under <dest_key>/ and the
+    # session's direct committer (see direct_commit_builder) completes them in place, then the
+    # manifest lists them. This replaces publish_output whenever the view can be written as a
+    # directory; publish_output remains for callers that need a single renamed file.
+    df.write.mode(mode).format(file_format).save(f"{scheme}://{dest_bucket}/{dest_key}")
+    files = list_output_files(s3_client, dest_bucket, dest_key.rstrip("/") + "/")
+    if not files:
+        raise ValueError(f"No output files under s3://{dest_bucket}/{dest_key}")
+    manifest = write_manifest(s3_client, dest_bucket, dest_key, files)
+    return {
+        "files": [f"s3://{dest_bucket}/{obj['Key']}" for obj in files],
+        "manifest": f"s3://{dest_bucket}/{manifest}",
+        "bytes": sum(obj["Size"] for obj in files),
+        "multipart_copies": 0,
+        "delete_errors": 0,
+    }
+
+
+def publish_output(s3_client, source_bucket, source_prefix, dest_bucket, dest_key, file_format, max_workers=PUBLISH_MAX_WORKERS, threshold=MULTIPART_THRESHOLD_BYTES, part_size=PART_SIZE_BYTES):
+    # Moves Spark output staged under source_prefix to its published name. A single part file
+    # becomes <dest_key>.<file_format>; several become <dest_key>/part-NNNNN.<file_format> with
+    # a manifest, instead of silently publishing only the first one. Once every copy has
+    # succeeded, output an earlier publish left under dest_key and the staged files are removed
+    # with batched deletes.
+    files = list_output_files(s3_client, source_bucket, source_prefix)
+    if not files:
+        raise ValueError(f"No output files under s3://{source_bucket}/{source_prefix}")
+    if len(files) == 1:
+        targets = [f"{dest_key}.{file_format}"]
+    else:
+        targets = [f"{dest_key}/part-{index:05d}.{file_format}" for index in range(len(files))]
+
+    # Parts are copied on their own pool so a file waiting on its parts never starves them
+    with ThreadPoolExecutor(max_workers=max_workers) as part_executor, \
+            ThreadPoolExecutor(max_workers=min(len(files), max_workers)) as file_executor:
+        futures = [
+            file_executor.submit(copy_file, s3_client, source_bucket, obj["Key"], obj["Size"], dest_bucket, target, part_executor, threshold, part_size)
+            for obj, target in zip(files, targets)
+        ]
+        multipart = sum(future.result() for future in futures)
+
+    published = [{"Key": target, "Size": obj["Size"]} for obj, target in zip(files, targets)]
+    manifest = write_manifest(s3_client, dest_bucket, dest_key, published) if len(files) > 1 else None
+    stale = stale_output_keys(s3_client, dest_bucket, dest_key, file_format, targets + [manifest] if manifest else targets)
+    errors = delete_keys(s3_client, dest_bucket, stale)
+    errors += delete_keys(s3_client, source_bucket, [obj["Key"] for obj in files])
+    return {
+        "files": [f"s3://{dest_bucket}/{target}" for target in targets],
+        "manifest": f"s3://{dest_bucket}/{manifest}" if manifest else None,
+        "bytes": sum(obj["Size"] for obj in files),
+        "multipart_copies": multipart,
+        "delete_errors": len(errors),
+    }
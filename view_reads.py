@@ -0,0 +1,104 @@
+import threading
+import time
+
+SCHEMA_TTL_SECONDS = 3600
+
+# Glue table schemas, keyed by (database, table); shared by every read in the process
+schema_cache = {}
+schema_cache_lock = threading.Lock()
+
+
+class TableLayout:
+    __slots__ = ("schema", "partition_keys", "location", "expires_at")
+
+    def __init__(self, schema, partition_keys, location, expires_at):
+        self.schema = schema
+        self.partition_keys = partition_keys
+        self.location = location
+        self.expires_at = expires_at
+
+
+def ddl_schema(columns):
+    # Glue column types are Hive DDL, which Spark's DDL schema parser accepts as-is
+    return ", ".join(f"`{column['Name']}` {column['Type']}" for column in columns)
+
+
+def get_table_layout(glue_client, database, table, ttl=SCHEMA_TTL_SECONDS):
+    # A user-supplied schema lets Spark skip footer sampling; the partition columns are part of
+    # it so values parsed from the partition paths keep their catalog types
+    key = (database, table)
+    with schema_cache_lock:
+        layout = schema_cache.get(key)
+        if layout is not None and layout.expires_at > time.monotonic():
+            return layout
+    descriptor = glue_client.get_table(DatabaseName=database, Name=table)["Table"]
+    partition_keys = descriptor.get("PartitionKeys", [])
+    layout = TableLayout(
+        ddl_schema(descriptor["StorageDescriptor"]["Columns"] + partition_keys),
+        [column["Name"] for column in partition_keys],
+        descriptor["StorageDescriptor"]["Location"].rstrip("/"),
+        time.monotonic() + ttl
+    )
+    with schema_cache_lock:
+        schema_cache[key] = layout
+    return layout
+
+
+def partition_expression(predicates):
+    # Glue GetPartitions filter, e.g. snapshot_date = '2024-06-27' AND region = 'us'
+    clauses = []
+    for name, value in predicates.items():
+        escaped = str(value).replace("'", "''")
+        clauses.append(f"{name} = '{escaped}'")
+    return " AND ".join(clauses)
+
+
+def glue_partition_locations(glue_client, database, table, predicates):
+    locations = []
+    paginator = glue_client.get_paginator("get_partitions")
+    params = {"DatabaseName": database, "TableName": table, "Expression": partition_expression(predicates)}
+    for page in paginator.paginate(**params):
+        locations.extend(partition["StorageDescriptor"]["Location"] for partition in page["Partitions"])
+    return locations
+
+
+def hive_partition_paths(base_path, partition_keys, predicates):
+    # Without a catalog, predicates on a leading run of partition keys name the directory directly
+    path = base_path.rstrip("/")
+    for name in partition_keys:
+        if name not in predicates:
+            break
+        path = f"{path}/{name}={predicates[name]}"
+    if path == base_path.rstrip("/"):
+        raise ValueError(f"Predicates {sorted(predicates)} do not cover the leading partition key of {base_path}")
+    return [path]
+
+
+def read_partitions(spark, paths, base_path, schema=None, columns=None, predicates=None):
+    reader = spark.read.option("basePath", base_path)
+    if schema:
+        reader = reader.schema(schema)
+    df = reader.parquet(*paths)
+    # Predicates on columns below the pruned directory level still apply as pushed-down filters
+    for name, value in (predicates or {}).items():
+        df = df.where(df[name] == value)
+    if columns:
+        df = df.select(*columns)
+    return df
+
+
+def read_snapshot(spark, base_path, predicates, columns=None, partition_keys=("snapshot_date",), glue_client=None, database=None, table=None):
+    # Reads only the partitions named by `predicates` and only `columns`. With a Glue table the
+    # schema and partition locations come from the catalog, so nothing under base_path is listed
+    # beyond the selected partitions and no footers are read for schema inference.
+    schema = None
+    if glue_client is not None and database and table:
+        layout = get_table_layout(glue_client, database, table)
+        schema = layout.schema
+        base_path = layout.location
+        paths = glue_partition_locations(glue_client, database, table, predicates)
+        if not paths:
+            raise ValueError(f"No partitions of {database}.{table} match {partition_expression(predicates)}")
+    else:
+        paths = hive_partition_paths(base_path, partition_keys, predicates)
+    return read_partitions(spark, paths, base_path, schema, columns, predicates)
@@ -1,11 +1,20 @@
 import json
+import os
+import sys
 import time
-from datetime import datetime
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+
+from job_graph import JobGraph
+from state_store import JournalStateStore
 
 class Job:
+    __slots__ = ("name", "dependencies", "completed", "snapshot_date", "job_frequency", "execution_snapshot_date")
+
     def __init__(self, name, dependencies=None, completed=False, snapshot_date=None, job_frequency=None,execution_snapshot_date=None):
-        self.name = name
-        self.dependencies = dependencies or []
+        # Names are interned so every dependency list shares one string per job
+        self.name = sys.intern(name)
+        self.dependencies = [sys.intern(dependency) for dependency in dependencies or []]
         self.completed = completed
         self.snapshot_date = snapshot_date
         self.job_frequency = job_frequency
@@ -23,11 +32,14 @@ class Job:
     def is_ready_to_run(self, all_jobs):
         return all(all_jobs[dependency].completed for dependency in self.dependencies)
 
+    def execute(self):
+        print(f"Running job: {self.name}")
+        # Simulate job execution
+        time.sleep(2)  # Simulating job runtime
+
     def run(self, all_jobs):
         if  not self.completed and self.is_ready_to_run(all_jobs):
-            print(f"Running job: {self.name}")
-            # Simulate job execution
-            time.sleep(2)  # Simulating job runtime
+            self.execute()
             self.mark_completed(self.execution_snapshot_date)
         elif not self.completed:
             waiting_dependencies = [dependency for dependency in self.dependencies if not (all_jobs[dependency].completed and all_jobs[dependency].snapshot_date==all_jobs[dependency].execution_snapshot_date)]
@@ -47,16 +59,16 @@ def create_jobs_from_json(jobs_data,execution_snapshot_date):
         jobs[job_data["name"]] = job
     return jobs
 
-def run_dependent_jobs(job_name, all_jobs):
-    if job_name not in all_jobs:
-        print("Invalid job name. Exiting.")
-        return
+def apply_job_state(all_jobs, state):
+    for name, job_state in state.items():
+        if name in all_jobs:
+            all_jobs[name].completed = job_state["completed"]
+            all_jobs[name].snapshot_date = job_state["snapshot_date"]
 
-    # Run the selected job
-    all_jobs[job_name].run(all_jobs)
-
-    # Update JSON file
-    with open("../resources/jobs.json", "w") as json_file:
+def save_jobs_to_json(all_jobs, path="../resources/jobs.json"):
+    # Written to a temp file first so a crash mid-write cannot truncate jobs.json
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as json_file:
         updated_json_data = {"jobs": []}
         for job in all_jobs.values():
             updated_json_data["jobs"].append({
@@ -67,11 +79,88 @@ def run_dependent_jobs(job_name, all_jobs):
                 "dependencies": job.dependencies
             })
         json.dump(updated_json_data, json_file, indent=2)
+    os.replace(tmp_path, path)
+
+def topological_sort(all_jobs):
+    return list(JobGraph.from_jobs(all_jobs).order)
+
+def _execute_job(job):
+    job.execute()
+    return job.name
+
+def run_jobs_in_waves(job_name, all_jobs, max_workers=4, use_processes=False, on_job_done=None, graph=None):
+    # Returns (finished, blocked): jobs that ran or were already completed, and jobs that could
+    # not run because a dependency is not completed, together with everything downstream of them
+    if job_name not in all_jobs:
+        print("Invalid job name. Exiting.")
+        return [], []
+
+    # Building the graph fails fast on cycles instead of recursing forever
+    graph = graph or JobGraph.from_jobs(all_jobs)
+
+    # Restrict the schedule to the selected job and everything downstream of it
+    selected = graph.get_descendants(job_name) | {job_name}
+    pending = {name: sum(1 for dep in graph.dependencies[name] if dep in selected) for name in selected}
+    dependents = graph.dependents
+
+    executor_cls = ProcessPoolExecutor if use_processes else ThreadPoolExecutor
+    ready = deque([job_name])
+    running = {}
+    finished = []
+
+    def release(name):
+        finished.append(name)
+        if on_job_done:
+            on_job_done(all_jobs[name])
+        # Each dependent becomes ready as soon as its last dependency finishes
+        for dependent in dependents[name]:
+            pending[dependent] -= 1
+            if pending[dependent] == 0:
+                ready.append(dependent)
+
+    with executor_cls(max_workers=max_workers) as executor:
+        while ready or running:
+            while ready:
+                name = ready.popleft()
+                job = all_jobs[name]
+                if job.completed:
+                    release(name)
+                elif job.is_ready_to_run(all_jobs):
+                    running[executor.submit(_execute_job, job)] = name
+                else:
+                    # Still waiting on a dependency outside the schedule; run() reports which.
+                    # Its dependents are never released, so nothing downstream runs either.
+                    job.run(all_jobs)
+            if running:
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = running.pop(future)
+                    future.result()
+                    all_jobs[name].mark_completed(all_jobs[name].execution_snapshot_date)
+                    release(name)
+    done = set(finished)
+    blocked = [name for name in graph.order if name in selected and name not in done]
+    return finished, blocked
+
+def run_dependent_jobs(job_name, all_jobs, graph=None, store=None):
+    if job_name not in all_jobs:
+        print("Invalid job name. Exiting.")
+        return
+
+    # Run the selected job
+    all_jobs[job_name].run(all_jobs)
+
+    # Record the transition, or rewrite the JSON file when no state store is used
+    if store:
+        job = all_jobs[job_name]
+        store.record(job.name, job.snapshot_date, job.completed)
+    else:
+        save_jobs_to_json(all_jobs)
 
     # Run dependent jobs recursively
-    for job in all_jobs.values():
-        if job_name in job.dependencies:
-            run_dependent_jobs(job.name, all_jobs)
+    graph = graph or JobGraph.from_jobs(all_jobs)
+    for dependent in graph.get_dependents(job_name):
+        run_dependent_jobs(dependent, all_jobs, graph, store)
 
 def main():
     with open("../resources/jobs.json", "r") as json_file:
@@ -83,12 +172,23 @@ def main():
     user_input_job_name = input("Enter the job name to run: ")
     user_input_snapshot_date = input("Enter the snapshot date (YYYY-MM-DD): ")
     jobs = create_jobs_from_json(workflow_data,user_input_snapshot_date)
+    graph = JobGraph.from_jobs(jobs)
+    store = JournalStateStore("../resources/jobs.journal")
+    apply_job_state(jobs, store.load())
     # Set snapshot_date for the selected job
     if user_input_job_name in jobs:
         pass
         #jobs[user_input_job_name].snapshot_date = user_input_snapshot_date
 
-    run_dependent_jobs(user_input_job_name, jobs)
+    try:
+        _, blocked = run_jobs_in_waves(user_input_job_name, jobs, graph=graph,
+                                       on_job_done=lambda job: store.record(job.name, job.snapshot_date, job.completed))
+    finally:
+        store.close()
+    if blocked:
+        print(f"Blocked by incomplete dependencies: {', '.join(blocked)}")
+    # Keep jobs.json in its existing format for other readers
+    save_jobs_to_json(jobs)
 
 if __name__ == "__main__":
     main()